@@ -2,11 +2,13 @@ import asyncio
 import locale
 import logging
 import os
+from datetime import datetime
 
 from aiogram import Bot, Dispatcher
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from config.database import create_database, db_pool
+from config.database import create_database, db_pool, maintain_database, is_production_sqlite, \
+    DB_MAINTENANCE_MINUTES
 from handlers import main_handlers, reservation_handlers, map_handlers, user_handlers, queue_handlers, admin_handlers, \
     game_tetris_handlers, commands_handlers, settings_handlers, game_parking_handlers, game_race_handlers, \
     achievements_handlers, shop_handlers, game_tic_tac_toe
@@ -18,10 +20,19 @@ from middlewares.logging_middleware import LoggingMiddleware
 from middlewares.long_operation import LongOperationMiddleware
 from middlewares.my_callback_check import MyCallbackCheckMiddleware
 from middlewares.new_day_check import NewDayCheckMiddleware
+from services.audit_writer import audit_writer
+from services.holiday_service import HolidayService
 from services.param_service import ParamService
 from services.queue_service import QueueService
+from services.render_service import render_service
+from services.weather_service import forecast_client
 from utils.new_day_checker import check_current_day, check_auto_karma_for_absent
 
+# Фоновые задачи (розыгрыш мест очереди, календарь праздников). Если бот запущен в нескольких процессах
+# на одной БД, включайте их только в одном (RUN_SCHEDULER=false в остальных): розыгрыш очереди не защищен
+# от параллельного запуска. Смена дня и авторозыгрыш кармы выполняются один раз в любом случае.
+RUN_SCHEDULER = os.getenv("RUN_SCHEDULER", "true").strip().lower() in ("yes", "true", "t", "1")
+
 
 async def main():
     # Устанавливаем локаль для русского языка
@@ -35,9 +46,16 @@ async def main():
     dp = Dispatcher()
 
     await create_database()
+    render_service.start()
+    audit_writer.start(db_pool)
+    await load_holidays_file()
 
     scheduler = AsyncIOScheduler()
-    scheduler.add_job(send_message_to_queue, "interval", seconds=1 * 60, args=(bot,))
+    if RUN_SCHEDULER:
+        scheduler.add_job(send_message_to_queue, "interval", seconds=1 * 60, args=(bot,))
+        scheduler.add_job(refresh_holidays, "interval", hours=12, next_run_time=datetime.now())
+    if is_production_sqlite:
+        scheduler.add_job(maintain_database, "interval", minutes=DB_MAINTENANCE_MINUTES)
     logging.getLogger('apscheduler.executors.default').setLevel(logging.WARNING)
     scheduler.start()
 
@@ -81,7 +99,12 @@ async def main():
     #     audit_service=audit_service
     # )
 
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        render_service.shutdown()
+        await audit_writer.shutdown()
+        await forecast_client.close()
 
 
 async def send_message_to_queue(bot: Bot):
@@ -99,5 +122,25 @@ async def send_message_to_queue(bot: Bot):
             await session.close()  # Закрываем сессию
 
 
+async def refresh_holidays():
+    async with db_pool() as session:
+        try:
+            await HolidayService(session).refresh()
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logging.getLogger(__name__).error(f"Не удалось обновить календарь праздников: {e}")
+
+
+async def load_holidays_file():
+    # Календарь можно загрузить из файла (например, для тестов без сети)
+    path = os.getenv("HOLIDAYS_FILE")
+    if not path:
+        return
+    async with db_pool() as session:
+        await HolidayService(session).load_from_file(path)
+        await session.commit()
+
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,115 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import Table, Column, String, DateTime, inspect, select, update, text, Connection, func, case
+
+from config import constants
+from config.database import Base
+from models.achievement_progress import AchievementProgress
+from models.driver import Driver
+from models.karma_daily import KarmaDaily, KARMA_ACTIONS
+from models.user_audit import UserAudit
+from services.achievement_service import TRACKED_ACTIONS, add_action, period_start
+
+logger = logging.getLogger(__name__)
+
+# Примененные миграции. create_all создает только новые таблицы, а изменения существующих делаются здесь
+schema_migrations = Table(
+    'schema_migrations', Base.metadata,
+    Column('id', String(64), primary_key=True),
+    Column('applied', DateTime, nullable=False, default=datetime.now),
+)
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str):
+    """Добавляет колонку, если ее еще нет (в новой БД ее уже создал create_all)."""
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def create_index(conn: Connection, table: str, name: str, columns: str):
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def driver_hot_columns(conn: Connection):
+    """Переносит karma, plus, car_index и wheels из drivers.attributes в отдельные колонки."""
+    add_column(conn, "drivers", "karma", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "drivers", "plus", "INTEGER")
+    add_column(conn, "drivers", "car_index", "INTEGER")
+    add_column(conn, "drivers", "wheels", "INTEGER NOT NULL DEFAULT 0")
+    create_index(conn, "drivers", "ix_drivers_karma", "karma")
+    create_index(conn, "drivers", "ix_drivers_plus", "plus")
+
+    table = Driver.__table__
+    keys = ("karma", "plus", "car_index", "wheels")
+    for driver_id, attributes in conn.execute(select(table.c.id, table.c.attributes)).all():
+        if not attributes or not any(key in attributes for key in keys):
+            continue
+        values = {key: int(attributes[key]) for key in keys if attributes.get(key) is not None}
+        rest = {key: value for key, value in attributes.items() if key not in keys}
+        conn.execute(update(table).where(table.c.id == driver_id).values(attributes=rest, **values))
+
+
+def rebuild_karma_daily(conn: Connection):
+    """Пересчитывает karma_daily по всей истории аудита."""
+    audit = UserAudit.__table__
+    daily = KarmaDaily.__table__
+    conn.execute(daily.delete())
+    conn.execute(daily.insert().from_select(
+        ["driver_id", "day", "action", "positive_sum", "negative_sum"],
+        select(audit.c.driver_id, audit.c.current_day, audit.c.action,
+               func.sum(case((audit.c.num > 0, audit.c.num), else_=0)),
+               func.sum(case((audit.c.num < 0, audit.c.num), else_=0)))
+        .where(audit.c.action.in_(KARMA_ACTIONS), audit.c.num.is_not(None))
+        .group_by(audit.c.driver_id, audit.c.current_day, audit.c.action)))
+
+
+def build_achievement_progress(conn: Connection):
+    """Заполняет achievement_progress по аудиту за период ачивок (как /rebuild_achievements)."""
+    audit = UserAudit.__table__
+    progress = defaultdict(dict)
+    # текущий день бота (с 19:00 уже следующий)
+    current_day = (datetime.now() + timedelta(hours=constants.new_day_offset)).date()
+    start = period_start(current_day)
+    rows = conn.execute(select(audit.c.driver_id, audit.c.current_day, audit.c.action, audit.c.num,
+                               audit.c.action_time)
+                        .where(audit.c.current_day >= start, audit.c.action.in_(TRACKED_ACTIONS))
+                        .order_by(audit.c.action_time, audit.c.id))
+    for driver_id, current_day, action, num, action_time in rows:
+        add_action(progress[driver_id], current_day, action, num, action_time)
+    table = AchievementProgress.__table__
+    conn.execute(table.delete())
+    if progress:
+        conn.execute(table.insert(), [{"driver_id": driver_id, "days": days, "updated": datetime.now()}
+                                      for driver_id, days in progress.items()])
+
+
+def composite_indexes(conn: Connection):
+    """Составные индексы под частые запросы (объявлены в __table_args__ моделей)."""
+    create_index(conn, "reservations", "ix_reservations_day_spot", "day_of_week, parking_spot_id")
+    create_index(conn, "drivers", "ix_drivers_enabled_absent", "enabled, absent_until")
+    create_index(conn, "user_audit", "ix_user_audit_driver_day", "driver_id, current_day")
+    create_index(conn, "user_audit", "ix_user_audit_day_action", "current_day, action")
+    create_index(conn, "queue", "ix_queue_created", "created")
+    create_index(conn, "parking_spot_driver", "ix_parking_spot_driver_spot", "parking_spot_id, driver_id")
+    create_index(conn, "parking_spot_driver", "ix_parking_spot_driver_driver", "driver_id, parking_spot_id")
+
+
+# Порядок важен: новые миграции добавляются только в конец
+MIGRATIONS = [
+    ("0001_driver_hot_columns", driver_hot_columns),
+    ("0002_karma_daily", rebuild_karma_daily),
+    ("0003_achievement_progress", build_achievement_progress),
+    ("0004_composite_indexes", composite_indexes),
+]
+
+
+def run_migrations(conn: Connection):
+    applied = set(conn.execute(select(schema_migrations.c.id)).scalars())
+    for migration_id, migration in MIGRATIONS:
+        if migration_id in applied:
+            continue
+        logger.info(f"Применяем миграцию {migration_id}")
+        migration(conn)
+        conn.execute(schema_migrations.insert().values(id=migration_id, applied=datetime.now()))
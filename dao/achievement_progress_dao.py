@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dao.upsert import insert
+from models.achievement_progress import AchievementProgress
+
+
+def select_days(driver_ids, for_update: bool = False):
+    """
+    for_update - заблокировать строки до конца транзакции (чтение перед слиянием и записью days):
+    иначе параллельные процессы (PostgreSQL) прочитают одни и те же данные и затрут изменения друг друга.
+    """
+    stmt = select(AchievementProgress.driver_id, AchievementProgress.days).where(
+        AchievementProgress.driver_id.in_(driver_ids))
+    if for_update:
+        stmt = stmt.order_by(AchievementProgress.driver_id).with_for_update()
+    return stmt
+
+
+def ensure_rows(driver_ids):
+    """
+    Запрос, создающий пустые строки водителей, у которых их еще нет: заблокировать можно только
+    существующую строку. Если строку одновременно создает другая транзакция, запрос ждет ее коммита.
+    """
+    now = datetime.now()
+    stmt = insert(AchievementProgress).values(
+        [{"driver_id": driver_id, "days": {}, "updated": now} for driver_id in sorted(driver_ids)])
+    return stmt.on_conflict_do_nothing(index_elements=[AchievementProgress.driver_id])
+
+
+def progress_upsert(progress: dict[int, dict]):
+    """Запрос, сохраняющий данные ачивок сразу для нескольких водителей: {driver_id: days}."""
+    now = datetime.now()
+    stmt = insert(AchievementProgress).values(
+        [{"driver_id": driver_id, "days": days, "updated": now} for driver_id, days in progress.items()])
+    return stmt.on_conflict_do_update(
+        index_elements=[AchievementProgress.driver_id],
+        set_={"days": stmt.excluded.days, "updated": stmt.excluded.updated})
+
+
+class AchievementProgressDAO:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_days(self, driver_id: int) -> dict:
+        result = await self.session.execute(select_days([driver_id]))
+        row = result.first()
+        return row.days if row else {}
+
+    async def save_days(self, driver_id: int, days: dict):
+        await self.session.execute(progress_upsert({driver_id: days}))
+
+    async def delete_all(self):
+        await self.session.execute(delete(AchievementProgress))
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dao.upsert import insert
+from models.chat_state import ChatGameState, ChatCounter
+
+
+class ChatStateDAO:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_state(self, chat_id: int, game: str) -> dict | None:
+        row = await self.session.get(ChatGameState, (chat_id, game), populate_existing=True)
+        return row.state if row else None
+
+    async def save_state(self, chat_id: int, game: str, state: dict):
+        stmt = insert(ChatGameState).values(chat_id=chat_id, game=game, state=state, updated=datetime.now())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ChatGameState.chat_id, ChatGameState.game],
+            set_={"state": stmt.excluded.state, "updated": stmt.excluded.updated})
+        await self.session.execute(stmt)
+
+    async def delete_state(self, chat_id: int, game: str):
+        await self.session.execute(
+            delete(ChatGameState).where(ChatGameState.chat_id == chat_id, ChatGameState.game == game))
+
+    async def increment_counter(self, chat_id: int, name: str) -> int:
+        """Увеличивает счетчик на 1 одним запросом и возвращает новое значение (первое значение - 0)."""
+        stmt = insert(ChatCounter).values(chat_id=chat_id, name=name, value=0)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ChatCounter.chat_id, ChatCounter.name],
+            set_={"value": ChatCounter.value + 1})
+        result = await self.session.execute(stmt.returning(ChatCounter.value))
+        return result.scalar_one()
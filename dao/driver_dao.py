@@ -1,11 +1,15 @@
 from datetime import date
 from typing import Optional, Sequence
 
-from sqlalchemy import select, update, delete, func, cast, Integer, and_, or_
+from sqlalchemy import select, update, delete, func, and_, or_, case
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.orm.attributes import set_committed_value
 
+from config.database import is_postgresql
 from models.driver import Driver
 from models.parking_spot import ParkingSpot
+from utils.driver_cache import driver_cache
 
 
 class DriverDAO:
@@ -19,12 +23,13 @@ class DriverDAO:
         driver = Driver(chat_id=chat_id, username=username, title=title, description=desc, enabled=enabled)
         self.session.add(driver)
         await self.session.commit()
+        driver_cache.invalidate(chat_id)
         return driver
 
     async def get_by_id(self, driver_id: int) -> Optional[Driver]:
         """Получение водителя по ID"""
         result = await self.session.execute(
-            select(Driver).where(Driver.id.is_(driver_id))
+            select(Driver).where(Driver.id == driver_id)
         )
         return result.scalar_one_or_none()
 
@@ -33,7 +38,7 @@ class DriverDAO:
         result = await self.session.execute(
             select(Driver)
             # .options(selectinload(Driver.parking_spots))
-            .where(Driver.chat_id.is_(chat_id))
+            .where(Driver.chat_id == chat_id)
         )
         return result.scalar_one_or_none()
 
@@ -65,45 +70,59 @@ class DriverDAO:
     async def delete(self, driver_id: int) -> None:
         """Удаление водителя"""
         await self.session.execute(
-            delete(Driver).where(Driver.id.is_(driver_id)))
+            delete(Driver).where(Driver.id == driver_id))
+        driver_cache.invalidate_driver(driver_id)
 
     async def driver_exists(self, chat_id: int) -> bool:
         """Проверка существования водителя"""
         result = await self.session.execute(
-            select(Driver.id).where(Driver.chat_id.is_(chat_id)))
+            select(Driver.id).where(Driver.chat_id == chat_id))
         return result.scalar() is not None
 
     async def remove_attribute_for_all(self, key: str) -> None:
         """Удаление атрибута у всех водителей"""
-        stmt = (
-            update(Driver)
-            .values(
-                attributes=func.json_remove(
-                    Driver.attributes,
-                    f'$.{key}'  # Путь к ключу
-                )
-            )
-        )
+        if is_postgresql:
+            attributes = Driver.attributes.op("-")(key)  # jsonb - 'key'
+        else:
+            attributes = func.json_remove(Driver.attributes, f'$.{key}')  # Путь к ключу
+        stmt = update(Driver).values(attributes=attributes)
 
         await self.session.execute(stmt)
 
+    async def add_karma(self, driver_id: int, delta: int, min_karma: int = None, floor: int = None) -> int | None:
+        """
+        Атомарно (одним UPDATE в БД) меняет карму на delta и возвращает новое значение.
+        min_karma - не менять, если карма станет меньше (тогда вернет None);
+        floor - после изменения карма не опускается ниже этого значения.
+        """
+        karma = Driver.karma + delta
+        if floor is not None:
+            karma = case((karma < floor, floor), else_=karma)
+        stmt = update(Driver).where(Driver.id == driver_id).values(karma=karma).returning(Driver.karma)
+        if min_karma is not None:
+            stmt = stmt.where(Driver.karma + delta >= min_karma)
+        result = await self.session.execute(stmt, execution_options={"synchronize_session": False})
+        karma = result.scalar_one_or_none()
+        # Загруженный в сессию водитель тоже получает новое значение (без повторного UPDATE при flush)
+        driver = self.session.identity_map.get(identity_key(Driver, driver_id))
+        if karma is not None and driver is not None:
+            set_committed_value(driver, "karma", karma)
+        return karma
+
     async def get_top_karma_drivers(self, limit: int) -> Sequence[Driver]:
         result = await self.session.execute(
             select(Driver)
-            .filter(func.json_extract(Driver.attributes, '$.karma').isnot(None))
-            # Извлекаем значение как число и сортируем по убыванию
-            .order_by(cast(func.json_extract(Driver.attributes, '$.karma'), Integer).desc())
+            .order_by(Driver.karma.desc())
             .limit(limit))
         return result.scalars().all()
 
     async def get_absent_drivers_for_auto_karma(self, is_working_day: bool) -> Sequence[Driver]:
         # Выбираем водителей, которые отсутствуют на текущую дату (или сегодня выходной)
         target_date = date.today()
-        # И у которых в атрибуте есть значение "plus" >= 0
+        # И у которых есть неразыгранный "plus" >= 0
         sql = (select(Driver)
-               .filter(Driver.enabled.is_(True))
-               .filter(func.json_extract(Driver.attributes, '$.plus').isnot(None))
-               .filter(func.json_extract(Driver.attributes, '$.plus') >= 0))
+               .filter(Driver.plus >= 0)
+               .filter(Driver.enabled.is_(True)))
         if is_working_day:
             sql = (sql
                    .filter(Driver.absent_until.is_not(None))
@@ -120,7 +139,7 @@ class DriverDAO:
         stmt = (
             select(ParkingSpot.id)
             .join(ParkingSpot.drivers)
-            .where(Driver.id.is_(driver_id))
+            .where(Driver.id == driver_id)
         )
         result = await self.session.execute(stmt)
         parking_spot_ids = [row[0] for row in result.all()]
@@ -0,0 +1,40 @@
+from datetime import date, datetime
+from typing import Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dao.upsert import insert
+from models.holiday import Holiday
+
+
+class HolidayDAO:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_by_day(self, day: date) -> Holiday | None:
+        return await self.session.get(Holiday, day)
+
+    async def get_fresh_days(self, start: date, end: date, updated_after: datetime) -> Sequence[date]:
+        """Дни из [start, end), данные о которых обновлялись не раньше updated_after."""
+        result = await self.session.execute(
+            select(Holiday.day).where(Holiday.day >= start,
+                                      Holiday.day < end,
+                                      Holiday.updated >= updated_after))
+        return result.scalars().all()
+
+    async def upsert_many(self, rows: list[dict]):
+        """
+        Вставляет или обновляет дни календаря одним запросом.
+        rows: [{"day": date, "is_working_day": bool, "name": str}, ...]
+        """
+        if not rows:
+            return
+        now = datetime.now()
+        stmt = insert(Holiday).values([{**row, "updated": now} for row in rows])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Holiday.day],
+            set_={"is_working_day": stmt.excluded.is_working_day,
+                  "name": stmt.excluded.name,
+                  "updated": stmt.excluded.updated})
+        await self.session.execute(stmt)
@@ -0,0 +1,52 @@
+from datetime import date
+from typing import Sequence
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dao.upsert import insert
+from models.driver import Driver
+from models.karma_daily import KarmaDaily
+from models.user_audit import UserActionType
+
+
+def karma_daily_upsert(rows: list[dict]):
+    """
+    Запрос, добавляющий изменения к дневным суммам.
+    rows: [{"driver_id", "day", "action", "positive_sum", "negative_sum"}, ...] - ключи не должны повторяться
+    """
+    stmt = insert(KarmaDaily).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[KarmaDaily.driver_id, KarmaDaily.day, KarmaDaily.action],
+        set_={"positive_sum": KarmaDaily.positive_sum + stmt.excluded.positive_sum,
+              "negative_sum": KarmaDaily.negative_sum + stmt.excluded.negative_sum})
+
+
+class KarmaDailyDAO:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_top(self, actions: Sequence[UserActionType], start: date, end: date, limit: int, sign: int = 0,
+                      excluded_id: int = None):
+        """
+        Сумма кармы по водителям за дни [start, end).
+        sign: 0 - все изменения, >0 - только начисления, <0 - только списания.
+        """
+        column = (KarmaDaily.positive_sum + KarmaDaily.negative_sum if sign == 0
+                  else KarmaDaily.positive_sum if sign > 0 else KarmaDaily.negative_sum)
+        total = func.sum(column).label("total")
+        stmt = (select(total, Driver.description)
+                .join(Driver, Driver.id == KarmaDaily.driver_id)
+                .where(KarmaDaily.action.in_(actions),
+                       KarmaDaily.day >= start,
+                       KarmaDaily.day < end)
+                .group_by(Driver.description)
+                .order_by(total.desc() if sign >= 0 else total, Driver.description)
+                .limit(limit))
+        if excluded_id is not None:
+            stmt = stmt.where(Driver.id != excluded_id)
+        if sign != 0:
+            # водители, у которых не было начислений (списаний) нужного знака, в топ не попадают
+            stmt = stmt.having(total != 0)
+        result = await self.session.execute(stmt)
+        return result.all()
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.media_file import MediaFile
+
+
+class MediaFileDAO:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_by_hash(self, content_hash: str) -> MediaFile | None:
+        result = await self.session.execute(
+            select(MediaFile).where(MediaFile.content_hash == content_hash))
+        return result.scalar_one_or_none()
+
+    async def touch(self, media: MediaFile):
+        media.last_used = datetime.now()
+
+    async def save(self, name: str, content_hash: str, file_id: str) -> MediaFile:
+        media = await self.get_by_hash(content_hash)
+        if media:
+            media.file_id = file_id
+            media.name = name
+            media.last_used = datetime.now()
+        else:
+            media = MediaFile(name=name, content_hash=content_hash, file_id=file_id, last_used=datetime.now())
+            self.session.add(media)
+        return media
+
+    async def delete_by_hash(self, content_hash: str):
+        await self.session.execute(delete(MediaFile).where(MediaFile.content_hash == content_hash))
+
+    async def delete_other_versions(self, name: str, content_hash: str):
+        """Удаляет записи с тем же именем, но другим содержимым (файл изменился)."""
+        await self.session.execute(
+            delete(MediaFile).where(MediaFile.name == name, MediaFile.content_hash != content_hash))
+
+    async def delete_unused(self, before: datetime) -> int:
+        result = await self.session.execute(delete(MediaFile).where(MediaFile.last_used < before))
+        return result.rowcount
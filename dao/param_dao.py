@@ -1,8 +1,9 @@
 from typing import Sequence
 
-from sqlalchemy import select, update
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from dao.upsert import insert
 from models.app_params import AppParam
 
 
@@ -16,28 +17,31 @@ class ParamDAO:
 
     async def get_param(self, key: str) -> AppParam | None:
         result = await self.session.execute(
-            select(AppParam).where(AppParam.key.is_(key)))
+            select(AppParam).where(AppParam.key == key))
         return result.scalar_one_or_none()
 
     async def set_param(self, key: str, value: str, description: str = None) -> AppParam:
-        # Try to update existing
-        stmt = (
-            update(AppParam)
-            .where(AppParam.key.is_(key))
-            .values(value=value, description=description)
-            .returning(AppParam)
-        )
-        result = await self.session.execute(stmt)
-        param = result.scalar_one_or_none()
-
-        # If not exists - create new
-        if not param:
-            param = AppParam(key=key, value=value, description=description)
-            self.session.add(param)
-            await self.session.commit()
-            await self.session.refresh(param)
-
-        return param
+        # Вставка или обновление одним запросом (ON CONFLICT по уникальному key)
+        stmt = insert(AppParam).values(key=key, value=value, description=description)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AppParam.key],
+            set_={"value": stmt.excluded.value, "description": stmt.excluded.description})
+        result = await self.session.execute(stmt.returning(AppParam),
+                                            execution_options={"populate_existing": True})
+        return result.scalar_one()
+
+    async def claim_param(self, key: str, value: str) -> bool:
+        """
+        Записывает значение, только если в БД сейчас другое (условный upsert).
+        Из нескольких процессов, одновременно записывающих одно значение, True вернется только одному.
+        """
+        stmt = insert(AppParam).values(key=key, value=value)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AppParam.key],
+            set_={"value": stmt.excluded.value},
+            where=AppParam.value.is_distinct_from(stmt.excluded.value))
+        result = await self.session.execute(stmt.returning(AppParam.key))
+        return result.first() is not None
 
     async def delete_param(self, key: str) -> bool:
         param = await self.get_param(key)
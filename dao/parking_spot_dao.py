@@ -2,8 +2,9 @@ from datetime import date
 
 from sqlalchemy import select, update, or_, exists, not_, and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, aliased
 
+from dao.reservation_dao import select_active
 from models.driver import Driver
 from models.parking_spot import ParkingSpot, SpotStatus
 from models.reservation import Reservation
@@ -15,28 +16,46 @@ class ParkingSpotDAO:
 
     async def get_by_id(self, spot_id: int) -> ParkingSpot | None:
         result = await self.session.execute(
-            select(ParkingSpot).where(ParkingSpot.id.is_(spot_id)))
+            select(ParkingSpot).where(ParkingSpot.id == spot_id))
         return result.scalar_one_or_none()
 
     async def get_all(self):
         result = await self.session.execute(
-            select(ParkingSpot).where(ParkingSpot.status.is_not(SpotStatus.HIDDEN)).order_by(ParkingSpot.id))
+            select(ParkingSpot).where(ParkingSpot.status.is_distinct_from(SpotStatus.HIDDEN)).order_by(ParkingSpot.id))
         return result.scalars().all()
 
+    async def get_lot_rows(self, day: date):
+        """
+        Видимые места с машинкой текущего водителя и действующими бронями на день
+        одним запросом (одна строка на бронь).
+        """
+        current = aliased(Driver)
+        reservations = select_active(day).subquery()
+        result = await self.session.execute(
+            select(ParkingSpot.id, ParkingSpot.x, ParkingSpot.y, ParkingSpot.width, ParkingSpot.height,
+                   ParkingSpot.status, ParkingSpot.current_driver_id,
+                   current.car_index.label("car_index"),
+                   reservations.c.driver_id.label("reserved_id"))
+            .outerjoin(current, current.id == ParkingSpot.current_driver_id)
+            .outerjoin(reservations, reservations.c.parking_spot_id == ParkingSpot.id)
+            .where(ParkingSpot.status.is_distinct_from(SpotStatus.HIDDEN))
+            .order_by(ParkingSpot.id, reservations.c.id))
+        return result.all()
+
     async def clear_statuses(self):
         await self.session.execute(update(ParkingSpot).
-                                   where(ParkingSpot.status.is_not(SpotStatus.HIDDEN)).
+                                   where(ParkingSpot.status.is_distinct_from(SpotStatus.HIDDEN)).
                                    values(status=None,
                                           current_driver_id=None))
 
     async def leave_spot(self, driver):
         await self.session.execute(update(ParkingSpot).
-                                   where(ParkingSpot.current_driver_id.is_(driver.id)).
+                                   where(ParkingSpot.current_driver_id == driver.id).
                                    values(status=SpotStatus.FREE))
 
     async def occupy_spot(self, driver, spot_id: int, without_demand=True):
         await self.session.execute(update(ParkingSpot).
-        where(ParkingSpot.id.is_(spot_id)).
+        where(ParkingSpot.id == spot_id).
         values(
             status=SpotStatus.OCCUPIED_WITHOUT_DEMAND if without_demand else SpotStatus.OCCUPIED,
             current_driver_id=driver.id))
@@ -45,8 +64,8 @@ class ParkingSpotDAO:
         result = await self.session.execute(
             select(Reservation).
             where(
-                Reservation.parking_spot_id.is_(spot_id),
-                Reservation.day_of_week.is_(day_of_week)
+                Reservation.parking_spot_id == spot_id,
+                Reservation.day_of_week == day_of_week
             ).
             order_by(Reservation.id)
         )
@@ -58,14 +77,14 @@ class ParkingSpotDAO:
         result = await self.session.execute(
             select(ParkingSpot)
             .options(selectinload(ParkingSpot.drivers))
-            .where(or_(ParkingSpot.status.is_(SpotStatus.FREE),
+            .where(or_(ParkingSpot.status == SpotStatus.FREE,
                        and_(
                            ParkingSpot.status.is_(None),
                            not_(exists(
                                select(Reservation)
                                .join(Driver)
-                               .where(and_(Reservation.day_of_week.is_(day_of_week),
-                                           Reservation.parking_spot_id.is_(ParkingSpot.id),
+                               .where(and_(Reservation.day_of_week == day_of_week,
+                                           Reservation.parking_spot_id == ParkingSpot.id,
                                            Driver.enabled == True,
                                            or_(Driver.absent_until.is_(None), Driver.absent_until <= day)
                                            )
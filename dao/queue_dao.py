@@ -33,16 +33,24 @@ class QueueDAO:
         result = await self.session.execute(select(Queue).order_by(Queue.created))
         return result.scalars().all()
 
+    async def get_entries(self):
+        """Очередь в виде строк (водитель, его описание, предложенное место) без загрузки ORM-объектов."""
+        result = await self.session.execute(
+            select(Queue.driver_id, Driver.description, Queue.spot_id, Queue.choose_before)
+            .join(Driver, Driver.id == Queue.driver_id)
+            .order_by(Queue.created))
+        return result.all()
+
     async def get_queue_by_driver(self, driver: Driver) -> Queue | None:
-        result = await self.session.execute(select(Queue).where(Queue.driver_id.is_(driver.id)))
+        result = await self.session.execute(select(Queue).where(Queue.driver_id == driver.id))
         return result.scalar_one_or_none()
 
     async def del_by_driver(self, driver: Driver):
-        await self.session.execute(delete(Queue).where(Queue.driver_id.is_(driver.id)))
+        await self.session.execute(delete(Queue).where(Queue.driver_id == driver.id))
 
     async def del_all(self):
         await self.session.execute(delete(Queue))
 
     async def is_driver_in_queue(self, driver: Driver) -> bool:
-        result = await self.session.execute(select(Queue).where(Queue.driver_id.is_(driver.id)))
+        result = await self.session.execute(select(Queue).where(Queue.driver_id == driver.id))
         return result.scalar_one_or_none() is not None
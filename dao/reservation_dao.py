@@ -7,6 +7,17 @@ from models.driver import Driver
 from models.reservation import Reservation
 
 
+def select_active(day: date):
+    """Действующие брони на день (водитель включен и не в отъезде): id, место, водитель и его имя."""
+    return (
+        select(Reservation.id, Reservation.parking_spot_id, Reservation.driver_id, Driver.title)
+        .join(Driver, Driver.id == Reservation.driver_id)
+        .where(Reservation.day_of_week == day.weekday(),
+               Driver.enabled == True,
+               or_(Driver.absent_until.is_(None), Driver.absent_until <= day))
+    )
+
+
 class ReservationDAO:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -21,8 +32,8 @@ class ReservationDAO:
         result = await self.session.execute(
             select(Reservation).
             where(
-                Reservation.parking_spot_id.is_(spot_id),
-                Reservation.day_of_week.is_(day_of_week)
+                Reservation.parking_spot_id == spot_id,
+                Reservation.day_of_week == day_of_week
             ).
             order_by(Reservation.id)
         )
@@ -34,7 +45,7 @@ class ReservationDAO:
         stmt = (
             select(Reservation)
             .join(Driver)
-            .where(and_(Reservation.day_of_week.is_(day_of_week),
+            .where(and_(Reservation.day_of_week == day_of_week,
                         Driver.enabled == True,
                         or_(Driver.absent_until.is_(None), Driver.absent_until <= day)
                         )
@@ -73,7 +84,7 @@ class ReservationDAO:
                 Reservation.parking_spot_id,
                 func.min(Reservation.id).label("min_id")
             )
-            .join(Driver, Driver.id.is_(Reservation.driver_id))
+            .join(Driver, Driver.id == Reservation.driver_id)
             .where(present_condition)
             .group_by(
                 Reservation.day_of_week,
@@ -90,8 +101,8 @@ class ReservationDAO:
                 Reservation.id >
                 select(min_ids_subq.c.min_id)
                 .where(
-                    Reservation.day_of_week.is_(min_ids_subq.c.day_of_week),
-                    Reservation.parking_spot_id.is_(min_ids_subq.c.parking_spot_id)
+                    Reservation.day_of_week == min_ids_subq.c.day_of_week,
+                    Reservation.parking_spot_id == min_ids_subq.c.parking_spot_id
                 )
                 .scalar_subquery()
             )
@@ -99,7 +110,7 @@ class ReservationDAO:
                 exists(
                     select(Driver.id)
                     .where(
-                        Driver.id.is_(Reservation.driver_id),
+                        Driver.id == Reservation.driver_id,
                         present_condition
                     )
                 )
@@ -0,0 +1,53 @@
+from datetime import date
+
+from sqlalchemy import select, exists, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from dao.reservation_dao import select_active
+from models.driver import Driver
+from models.parking_spot import ParkingSpot, parking_spot_driver_association
+from models.queue import Queue
+from models.reservation import Reservation
+
+
+class StatusDAO:
+    """
+    Запросы для экрана статуса водителя: возвращают простые строки, а не ORM-объекты,
+    поэтому не трогают водителей в identity map сессии.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_driver_row(self, driver_id: int, day: date):
+        """Водитель + признаки "в очереди" и "есть своя бронь на этот день недели"."""
+        in_queue = exists().where(Queue.driver_id == Driver.id)
+        has_reservation = exists().where(Reservation.driver_id == Driver.id,
+                                         Reservation.day_of_week == day.weekday())
+        result = await self.session.execute(
+            select(Driver.id, Driver.chat_id, Driver.title, Driver.description, Driver.enabled,
+                   Driver.absent_until, Driver.karma, Driver.plus,
+                   in_queue.label("in_queue"), has_reservation.label("has_reservation"))
+            .where(Driver.id == driver_id))
+        return result.one_or_none()
+
+    async def get_spot_rows(self, driver_id: int, day: date):
+        """
+        Закрепленные за водителем и занятые им места, с текущим водителем места
+        и действующими бронями на этот день (одна строка на бронь).
+        """
+        current = aliased(Driver)
+        is_mine = exists().where(parking_spot_driver_association.c.parking_spot_id == ParkingSpot.id,
+                                 parking_spot_driver_association.c.driver_id == driver_id)
+        reservations = select_active(day).subquery()
+        result = await self.session.execute(
+            select(ParkingSpot.id, ParkingSpot.status, ParkingSpot.current_driver_id,
+                   is_mine.label("is_mine"),
+                   current.title.label("current_title"), current.attributes.label("current_attributes"),
+                   reservations.c.driver_id.label("reserved_id"), reservations.c.title.label("reserved_title"))
+            .outerjoin(current, current.id == ParkingSpot.current_driver_id)
+            .outerjoin(reservations, reservations.c.parking_spot_id == ParkingSpot.id)
+            .where(or_(is_mine, ParkingSpot.current_driver_id == driver_id))
+            .order_by(ParkingSpot.id, reservations.c.id))
+        return result.all()
@@ -0,0 +1,11 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from config.database import is_postgresql
+
+
+def insert(table):
+    """
+    insert с ON CONFLICT для текущей БД: у SQLite и PostgreSQL одинаковые
+    on_conflict_do_update/on_conflict_do_nothing и excluded, отличается только класс запроса.
+    """
+    return postgresql.insert(table) if is_postgresql else sqlite.insert(table)
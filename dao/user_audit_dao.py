@@ -1,52 +1,16 @@
 from datetime import date, timedelta
 from typing import Sequence
 
-from sqlalchemy import text, select, and_
+from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from config import constants
-from models.user_audit import UserActionType, UserAudit
+from models.user_audit import UserAudit
 
 
 class UserAuditDAO:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def create(self, driver_id: int, action: UserActionType, current_day: date,
-                     num: int = None,
-                     description: str = None):
-        audit_record = UserAudit(
-            driver_id=driver_id,
-            action=action,
-            current_day=current_day,
-            num=num,
-            description=description
-        )
-        self.session.add(audit_record)
-        await self.session.commit()
-        return audit_record
-
-    async def get_weekly_karma(self, limit: int, sign: int = 0, act: str = ''):
-        if not act:
-            act_str = "'DRAW_KARMA','GAME_KARMA','GET_ADMIN_KARMA','SHOP_KARMA'"
-        else:
-            act_str = "'" + UserActionType[act].name + "'"
-        stmt = text(f"""
-                select sum(num) as total, d.description
-                from user_audit ua
-                join drivers d on d.id = ua.driver_id
-                where action in ({act_str})
-                  and current_day >= date('now','-7 days')
-                  and current_day < date('now','+{constants.new_day_offset} hour')
-                  and d.id != :excluded_id
-                  {'' if sign == 0 else (' and num>0 ' if sign > 0 else ' and num<0 ')}
-                group by d.description
-                order by total {'desc' if sign >= 0 else ''}, d.description
-                limit :limit
-            """)
-        result = await self.session.execute(stmt, {"excluded_id": 1, "limit": limit})
-        return result.all()
-
     # async def get_karma_statistics(self, driver_id: int, days: int = None):
     #     query = self.session.execute(Select(func.sum(UserAudit.num)).filter(
     #         UserAudit.driver_id == driver_id,
@@ -72,12 +36,20 @@ class UserAuditDAO:
     #         UserAudit.num == spot_number
     #     ).group_by(UserAudit.driver_id).all()
 
+    async def get_actions_since(self, start_day: date, actions) -> Sequence[UserAudit]:
+        """Действия всех водителей начиная с start_day в порядке записи."""
+        result = await self.session.execute(
+            select(UserAudit)
+            .where(UserAudit.current_day >= start_day, UserAudit.action.in_(actions))
+            .order_by(UserAudit.action_time, UserAudit.id))
+        return result.scalars().all()
+
     async def get_actions_by_period(self, driver_id: int, period_in_days: int, current_day: date) -> Sequence[
         UserAudit]:
         result = await self.session.execute(
             select(UserAudit)
             .where(and_(
-                UserAudit.driver_id.is_(driver_id),
+                UserAudit.driver_id == driver_id,
                 UserAudit.current_day >= current_day - timedelta(days=period_in_days),
                 UserAudit.current_day < current_day
             ))
@@ -10,12 +10,11 @@ from config import constants
 from handlers.driver_callback import add_button, MyCallback
 from models.driver import Driver
 from models.user_audit import UserActionType
+from services.achievement_service import AchievementService, PERIOD_IN_DAYS
 from services.audit_service import AuditService
 from services.driver_service import DriverService
 from services.notification_sender import send_reply
 
-PERIOD_IN_DAYS = 30
-
 router = Router()
 
 
@@ -29,45 +28,17 @@ async def show_achievements(event, session, driver: Driver, current_day):
     content += get_achievement_row("Магнат 💟", driver.get_karma(), 50, 100, 200)
     content += '\n'
 
-    actions = await AuditService(session).get_actions_by_period(driver.id, PERIOD_IN_DAYS, current_day)
-    last_actions = dict()
-    # список последних действий в каждом дне, если входит в список TAKE_SPOT, RELEASE_SPOT, JOIN_QUEUE, LEAVE_QUEUE
-    for a in actions:
-        if (a.action in [UserActionType.TAKE_SPOT, UserActionType.RELEASE_SPOT, UserActionType.JOIN_QUEUE,
-                         UserActionType.LEAVE_QUEUE]
-                and (a.action_time.hour >= constants.new_day_begin_hour or a.action_time.hour < 14)):
-            last_actions[a.current_day] = a
-
-    regular = len(set(a.current_day for a in last_actions.values() if a.action == UserActionType.TAKE_SPOT))
-    content += get_achievement_row("Завсегдатай 🍸", regular, 5, 10, 20)
-
-    generous_soul = len(set(a.current_day for a in last_actions.values() if a.action == UserActionType.RELEASE_SPOT))
-    content += get_achievement_row("Щедрая душа 💛", generous_soul, 2, 3, 5)
-
-    stoic = len(set(a.current_day for a in last_actions.values() if
-                    a.action in [UserActionType.JOIN_QUEUE, UserActionType.LEAVE_QUEUE]))
-    content += get_achievement_row("Стоик 🪨", stoic, 2, 3, 5)
-
-    racer = sum(1 for a in actions if a.action == UserActionType.GAME_KARMA and a.num == -5)
-    content += get_achievement_row("Гонщик 🏎️", racer, 3, 7, 15)
-
-    traveler = len(set(a.num for a in actions if a.action == UserActionType.TAKE_SPOT))
-    content += get_achievement_row("Путешественник 🌏", traveler, 2, 3, 5, 2)
-
-    rainbow_fortune = max_unique_length([a.num for a in actions if a.action == UserActionType.DRAW_KARMA])
-    content += get_achievement_row("Радуга фортуны 🌈", rainbow_fortune, 4, 5, 6, 3)
-
-    repeat_karma = max_consecutive_length([a.num for a in actions if a.action == UserActionType.DRAW_KARMA])
-    content += get_achievement_row("По колее 🚗", repeat_karma, 3, 4, 5, 2)
-
-    queue_expert = len(set(a.current_day for a in actions if a.action == UserActionType.LEAVE_QUEUE))
-    content += get_achievement_row("Очередной эксперт 🏃", queue_expert, 2, 5, 10)
-
-    expensive = sum(-a.num for a in actions if a.action == UserActionType.SHOP_KARMA and a.num < 0)
-    content += get_achievement_row("Дорогой клиент 🤑", expensive, 5, 20, 50)
-
-    shopaholic = sum(1 for a in actions if a.action == UserActionType.SHOP_KARMA and a.num < 0)
-    content += get_achievement_row("Шопоголик 🏷️", shopaholic, 2, 5, 10)
+    values = await AchievementService(session).get_values(driver.id, current_day)
+    content += get_achievement_row("Завсегдатай 🍸", values["regular"], 5, 10, 20)
+    content += get_achievement_row("Щедрая душа 💛", values["generous_soul"], 2, 3, 5)
+    content += get_achievement_row("Стоик 🪨", values["stoic"], 2, 3, 5)
+    content += get_achievement_row("Гонщик 🏎️", values["racer"], 3, 7, 15)
+    content += get_achievement_row("Путешественник 🌏", values["traveler"], 2, 3, 5, 2)
+    content += get_achievement_row("Радуга фортуны 🌈", values["rainbow_fortune"], 4, 5, 6, 3)
+    content += get_achievement_row("По колее 🚗", values["repeat_karma"], 3, 4, 5, 2)
+    content += get_achievement_row("Очередной эксперт 🏃", values["queue_expert"], 2, 5, 10)
+    content += get_achievement_row("Дорогой клиент 🤑", values["expensive"], 5, 20, 50)
+    content += get_achievement_row("Шопоголик 🏷️", values["shopaholic"], 2, 5, 10)
 
     # TODO: add achievements
 
@@ -180,38 +151,3 @@ def add_karma_button(builder, button_act, button_sign, limit, text, sign, act):
         add_button("✔️ " + text, "pass", 0, builder)
     else:
         add_button(text, "karma-week", 0, builder, spot_id=limit, day_num=button_sign, event_type=button_act)
-
-
-def max_unique_length(nums):
-    max_len = 0
-    current_set = set()
-    left = 0
-    right = 0
-    n = len(nums)
-    while right < n:
-        if nums[right] not in current_set:
-            current_set.add(nums[right])
-            right += 1
-            max_len = max(max_len, right - left)
-        else:
-            current_set.remove(nums[left])
-            left += 1
-    return max_len
-
-
-def max_consecutive_length(nums):
-    if not nums:
-        return 0
-
-    max_length = 1
-    current_length = 1
-
-    for i in range(1, len(nums)):
-        if nums[i] == nums[i - 1]:
-            current_length += 1
-            if current_length > max_length:
-                max_length = current_length
-        else:
-            current_length = 1
-
-    return max_length
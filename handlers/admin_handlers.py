@@ -10,11 +10,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from handlers.driver_callback import add_button, MyCallback
 from models.driver import Driver
 from models.user_audit import UserActionType
+from services.achievement_service import AchievementService
 from services.audit_service import AuditService
 from services.driver_service import DriverService
+from services.karma_service import KarmaService
 from services.notification_sender import EventType, NotificationSender, send_reply
 from services.param_service import ParamService
 from services.parking_service import ParkingService
+from services.status_service import StatusService
 from utils.cars_generator import cars_count
 
 router = Router()
@@ -47,6 +50,13 @@ async def list_params_handler(message: Message, param_service: ParamService):
     await message.answer(response)
 
 
+@router.message(Command("rebuild_achievements"), flags={"check_admin": True})
+async def rebuild_achievements_handler(message: Message, session: AsyncSession, current_day):
+    count = await AchievementService(session).rebuild(current_day)
+    await session.commit()
+    await message.answer(f"Достижения пересчитаны для {count} водителей")
+
+
 @router.message(
     F.text.regexp(r"(?i).*начислить.* ([+-]?\d+) .*кармы(.*)").as_("match"),
     flags={"check_admin": True, "check_driver": True})
@@ -63,13 +73,13 @@ async def plus_karma(message: Message, session: AsyncSession, driver: Driver, cu
     replied_user_id = message.reply_to_message.from_user.id
     driver_to = await DriverService(session).get_by_chat_id(replied_user_id)
     if driver_to:
-        driver_to.attributes["karma"] = driver_to.get_karma() + karma
+        await KarmaService(session).apply(
+            driver_to.id, karma, UserActionType.GET_ADMIN_KARMA, current_day,
+            lambda total: f"Админ {driver.title} изменил карму {driver_to.title} на {karma} и стало {total}")
         await message.answer(
             f"{'💖' if karma >= 0 else '💔'} {driver_to.description} получает {'+' if karma >= 0 else '-'}{karma} кармы.")
         await NotificationSender(message.bot).send_to_driver(EventType.KARMA_CHANGED, driver, driver_to,
                                                              add_message=match.group(2), karma_change=karma)
-        await AuditService(session).log_action(driver_to.id, UserActionType.GET_ADMIN_KARMA, current_day, karma,
-                                               f"Админ {driver.title} изменил карму {driver_to.title} на {karma} и стало {driver_to.get_karma()}")
     else:
         await message.answer("Пользователь не нашелся в базе данных.")
 
@@ -109,9 +119,10 @@ async def find_driver(message: Message, session: AsyncSession, current_day, matc
 async def enable_user(callback: CallbackQuery, callback_data: MyCallback, session, driver: Driver, current_day):
     user_id = callback_data.spot_id
     enabled = callback_data.day_num
-    user = await DriverService(session).get_by_id(user_id)
+    driver_service = DriverService(session)
+    user = await driver_service.get_by_id(user_id)
     if user:
-        user.enabled = enabled
+        await driver_service.set_enabled(user, enabled)
         await AuditService(session).log_action(user.id, UserActionType.ENABLED, current_day, num=enabled,
                                                description=f"Админ {driver.title} {'заблокировал' if enabled == 0 else 'разблокировал'} пользователя {user.title}")
         content, builder = await get_user_info(current_day, user, session)
@@ -128,11 +139,10 @@ async def extra_cars(callback: CallbackQuery, callback_data: MyCallback, session
         if user.attributes.get("extra_cars", 0) == extra_cars:
             return
         user.attributes["extra_cars"] = extra_cars
-        if extra_cars <= 0 and user.attributes.get("car_index", 0) > cars_count:
-            user.attributes["car_index"] = user.attributes.get("car_index_bkp",
-                                                               user.attributes.get("car_index", user.id))
+        if extra_cars <= 0 and user.get_car_index(0) > cars_count:
+            user.car_index = user.attributes.get("car_index_bkp", user.get_car_index(user.id))
         elif extra_cars > 0:
-            user.attributes["car_index_bkp"] = user.attributes.get("car_index", user.id)
+            user.attributes["car_index_bkp"] = user.get_car_index(user.id)
         content, builder = await get_user_info(current_day, user, session)
         await send_reply(callback, content, builder)
 
@@ -178,27 +188,27 @@ async def remove_spot(message: Message, session: AsyncSession, match: re.Match):
 
 
 async def get_user_info(current_day, user: Driver, session):
-    await session.refresh(user, ["reservations", "parking_spots", "current_spots"])
-    is_absent = user.is_absent(current_day)
-    occupied_spots = user.get_occupied_spots()
+    status = await StatusService(session).get_status(user.id, current_day)
+    is_absent = status.is_absent(current_day)
+    occupied_spots = status.occupied_spots
     builder = InlineKeyboardBuilder()
     content = Text('🪪 ', TextLink(user.title, url=f"tg://user?id={user.chat_id}"), "\n",
                    f"{user.id} - {user.description}", '\n\n')
 
-    if not user.enabled:
+    if not status.enabled:
         content += Bold("🚫 Пользователь заблокирован") + '\n\n'
         add_button("✅ Разблокировать", "enable-user", 0, builder, spot_id=user.id, day_num=1)
     else:
         add_button("🚫 Заблокировать!", "enable-user", 0, builder, spot_id=user.id, day_num=0)
 
     if is_absent:
-        content += Bold("Приедет не раньше: ") + user.absent_until.strftime('%a %d.%m.%Y') + '\n\n'
+        content += Bold("Приедет не раньше: ") + status.absent_until.strftime('%a %d.%m.%Y') + '\n\n'
     if occupied_spots:
         content += Bold("Стоит на: 🅿️ ") + ", ".join([str(spot.id) for spot in occupied_spots]) + '\n\n'
-    if user.my_spots():
+    if status.my_spots:
         content += as_marked_section(
             Bold(f"Закрепленные места:"),
-            *[f"{spot.id}" for spot in user.my_spots()],
+            *[f"{spot.id}" for spot in status.my_spots],
             marker="• ", )
     else:
         content += Bold("Нет закрепленных мест")
@@ -213,10 +223,10 @@ async def get_user_info(current_day, user: Driver, session):
                                          switch_inline_query_current_chat=f"Показать Доберись до парковки {user.id}"))
 
     content += '\n\n'
-    content += as_key_value("Машинка", user.attributes.get("car_index", user.id))
+    content += as_key_value("Машинка", user.get_car_index(user.id))
     content += '\n'
     content += as_key_value("Backup машинка",
-                            user.attributes.get("car_index_bkp", user.attributes.get("car_index", user.id)))
+                            user.attributes.get("car_index_bkp", user.get_car_index(user.id)))
     content += '\n'
     content += as_key_value("Доп. машинки", "выключены" if user.attributes.get("extra_cars", 0) <= 0 else "включены")
     if user.attributes.get("extra_cars", 0) <= 0:
@@ -13,6 +13,7 @@ from handlers.driver_callback import add_button, MyCallback
 from models.driver import Driver
 from models.user_audit import UserActionType
 from services.audit_service import AuditService
+from services.karma_service import KarmaService
 from services.driver_service import DriverService
 from services.notification_sender import send_alarm
 from utils.game_parking_utils import generate_map_with_constraints, STONE, FINISH, EMPTY, FUEL, CAR, TREASURE
@@ -54,9 +55,8 @@ async def game_parking(callback: CallbackQuery, session: AsyncSession, driver: D
     if game_state is None or game_state.is_end_game():
         game_state = generate_map_with_constraints(17, 13)
         save_state(driver, game_state)
-        driver.attributes["karma"] = max(0, driver.get_karma() - 1)
-        await AuditService(session).log_action(driver.id, UserActionType.GAME_KARMA, current_day, -1,
-                                               f"{driver.title} начал игру Доберись до парковки за -1 кармы")
+        await KarmaService(session).apply(driver.id, -1, UserActionType.GAME_KARMA, current_day,
+                                          f"{driver.title} начал игру Доберись до парковки за -1 кармы", floor=0)
 
     content = Text("E ", Italic(f"{'▓' * ceil(game_state.fuel / 10)}{'▒' * ceil((100 - game_state.fuel) / 10)}"),
                    f"  F ⛽️\n\n")
@@ -112,10 +112,9 @@ async def move_callback(callback: CallbackQuery, callback_data: MyCallback, sess
     item = game_state.move(callback_data.spot_id, callback_data.day_num)
     save_state(driver, game_state)
     if item is not None and item == TREASURE:
-        driver.attributes["karma"] = driver.get_karma() + 1
+        await KarmaService(session).apply(driver.id, 1, UserActionType.GAME_KARMA, current_day,
+                                          f"{driver.title} получил +1 к карме в игре Доберись до парковки")
         await send_alarm(callback, "🫶 +1 к Вашей карме!")
-        await AuditService(session).log_action(driver.id, UserActionType.GAME_KARMA, current_day, 1,
-                                               f"{driver.title} получил +1 к карме в игре Доберись до парковки")
 
     if not await check_end_game(callback, game_state, driver, session, current_day):
         content = Text("E ", Italic(f"{'▓' * ceil(game_state.fuel / 10)}{'▒' * (10 - ceil(game_state.fuel / 10))}"),
@@ -139,9 +138,9 @@ async def check_end_game(callback, game_state, driver, session, current_day):
             await send_alarm(callback, "🎉 Поздравляем! Вы победили!")
             await AuditService(session).log_action(driver.id, UserActionType.GAME, current_day, 1,
                                                    f"{driver.title} доехал до парковки в игре Доберись до парковки")
-            driver.attributes["karma"] = driver.get_karma() + 1
-            await AuditService(session).log_action(driver.id, UserActionType.GAME_KARMA, current_day, 1,
-                                                   f"{driver.title} успешно закончил игру Доберись до парковки и получил +1 кармы")
+            await KarmaService(session).apply(
+                driver.id, 1, UserActionType.GAME_KARMA, current_day,
+                f"{driver.title} успешно закончил игру Доберись до парковки и получил +1 кармы")
 
         else:
             await callback.message.edit_text(text=("😅 У вас закончилось топливо!\n\n"
@@ -155,9 +154,9 @@ async def check_end_game(callback, game_state, driver, session, current_day):
             await send_alarm(callback, "❌ Игра окончена")
             await AuditService(session).log_action(driver.id, UserActionType.GAME, current_day, -1,
                                                    f"У {driver.title} закончилось топливо в игре Доберись до парковки")
-            driver.attributes["karma"] = max(0, driver.get_karma() - 1)
-            await AuditService(session).log_action(driver.id, UserActionType.GAME_KARMA, current_day, -1,
-                                                   f"{driver.title} проиграл в игре Доберись до парковки и лишился -1 кармы")
+            await KarmaService(session).apply(
+                driver.id, -1, UserActionType.GAME_KARMA, current_day,
+                f"{driver.title} проиграл в игре Доберись до парковки и лишился -1 кармы", floor=0)
 
         return True
     return False
@@ -1,60 +1,63 @@
-import json
+import asyncio
+import logging
 import os
 import random
-from io import BytesIO
 
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, Message, FSInputFile, BufferedInputFile
+from aiogram.types import CallbackQuery, Message, BufferedInputFile
+from aiogram.utils.chat_action import ChatActionSender
 from aiogram.utils.formatting import Bold, Spoiler, as_key_value, Code, Text, HashTag
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from dao.chat_state_dao import ChatStateDAO
 from handlers.driver_callback import add_button, MyCallback
 from models.driver import Driver
 from models.user_audit import UserActionType
 from services.audit_service import AuditService
 from services.driver_service import DriverService
+from services.karma_service import KarmaService
+from services.media_service import MediaService
 from services.notification_sender import send_alarm
-from services.param_service import ParamService
-from utils.cars_generator import draw_start_race_track, create_race_gif
-from utils.game_race_utils import GameState, generate_game_with_weather_forecast
+from services.render_service import render_service
+from utils.game_race_utils import GameState, RaceResult, generate_game_with_weather_forecast, simulate_race
+from utils.render_snapshot import PlayerSnapshot
+
+logger = logging.getLogger(__name__)
 
 PLACE_PERCENT = {1: 35, 2: 25, 3: 17, 4: 12, 5: 8}
 
 MIN_PLAYERS = 7
 MAX_PLAYERS = 12
 FEE = 5
+RACE_FRAMES = 400
+RACE_GAME = "race"
 
 router = Router()
 
+# Фоновые задачи отправки видео (храним ссылки, чтобы задачи не собрал сборщик мусора)
+video_tasks = set()
+
 
 async def get_state(chat_id: int, session) -> GameState | None:
-    race_state = await ParamService(session).get_parameter('race_state', '{}')
-    states = json.loads(race_state)
-    state_dict = states.get(str(chat_id), None)
+    state_dict = await ChatStateDAO(session).get_state(chat_id, RACE_GAME)
     if state_dict is None:
         return None
-    state = GameState.from_dict(state_dict)
-    return state
+    return GameState.from_dict(state_dict)
 
 
 async def save_state(chat_id: int, game_state: GameState, session):
-    race_state = await ParamService(session).get_parameter('race_state', '{}')
-    states = json.loads(race_state)
-    states[str(chat_id)] = game_state.to_dict()
-    await ParamService(session).set_parameter('race_state', json.dumps(states, ensure_ascii=False))
+    await ChatStateDAO(session).save_state(chat_id, RACE_GAME, game_state.to_dict())
 
 
 async def remove_state(chat_id: int, session):
-    race_state = await ParamService(session).get_parameter('race_state', '{}')
-    states = json.loads(race_state)
-    states[str(chat_id)] = None
-    await ParamService(session).set_parameter('race_state', json.dumps(states))
+    await ChatStateDAO(session).delete_state(chat_id, RACE_GAME)
 
 
 @router.message(
     F.text.regexp(r"(?i).*да начнется гонка"),
-    flags={"lock_operation": "race", "long_operation": "upload_photo", "check_admin": True, "check_driver": True})
+    flags={"lock_operation": "race", "lock_per_chat": True,
+           "long_operation": "upload_photo", "check_admin": True, "check_driver": True})
 async def game_race(message: Message, session: AsyncSession, driver: Driver, current_day, is_private):
     if is_private:
         await message.answer("Команда недоступна в личных сообщениях.")
@@ -68,14 +71,14 @@ async def game_race(message: Message, session: AsyncSession, driver: Driver, cur
                                                f'{driver.title} Начинает игру "Гонки"')
     content, builder, players = await get_game_message(game_state, session)
     content += HashTag("#гонки")
-    await message.answer_photo(show_caption_above_media=False,
-                               photo=await get_media(players),
-                               reply_markup=builder.as_markup(),
-                               **content.as_kwargs(text_key="caption", entities_key="caption_entities"))
+    await answer_media(message, players, session,
+                       show_caption_above_media=False,
+                       reply_markup=builder.as_markup(),
+                       **content.as_kwargs(text_key="caption", entities_key="caption_entities"))
 
 
 @router.callback_query(MyCallback.filter(F.action == "join_race"),
-                       flags={"lock_operation": "race",
+                       flags={"lock_operation": "race", "lock_per_chat": True,
                               "long_operation": "upload_photo",
                               "check_driver": True})
 async def join_race_callback(callback: CallbackQuery, callback_data: MyCallback, session, driver: Driver, current_day):
@@ -92,24 +95,21 @@ async def join_race_callback(callback: CallbackQuery, callback_data: MyCallback,
         await send_alarm(callback, "⚠️ Вы уже участник заезда!")
         return
 
-    karma = driver.get_karma()
-    if karma < FEE:
+    karma = await KarmaService(session).spend(driver.id, FEE, UserActionType.GAME_KARMA, current_day,
+                                              f"{driver.title} Будет участвовать в заезде и заплатил -{FEE} кармы")
+    if karma is None:
         await send_alarm(callback, "⚠️ Недостаточно кармы!")
         return
 
-    driver.attributes["karma"] = karma - FEE
-    await AuditService(session).log_action(driver.id, UserActionType.GAME_KARMA, current_day, -FEE,
-                                           f"{driver.title} Будет участвовать в заезде и заплатил -{FEE} кармы")
-
     game_state.add_player(driver)
     await save_state(callback.message.chat.id, game_state, session)
 
     content, builder, players = await get_game_message(game_state, session)
     content += HashTag("#гонки")
-    await callback.message.answer_photo(show_caption_above_media=False,
-                                        photo=await get_media(players),
-                                        reply_markup=builder.as_markup(),
-                                        **content.as_kwargs(text_key="caption", entities_key="caption_entities"))
+    await answer_media(callback.message, players, session,
+                       show_caption_above_media=False,
+                       reply_markup=builder.as_markup(),
+                       **content.as_kwargs(text_key="caption", entities_key="caption_entities"))
     try:
         await callback.message.delete()
     except:
@@ -117,8 +117,8 @@ async def join_race_callback(callback: CallbackQuery, callback_data: MyCallback,
 
 
 @router.callback_query(MyCallback.filter(F.action == "start_race"),
-                       flags={"lock_operation": "race",
-                              "long_operation": "upload_video",
+                       flags={"lock_operation": "race", "lock_per_chat": True,
+                              "long_operation": "typing",
                               "check_admin": True,
                               "check_driver": True})
 async def start_race_callback(callback: CallbackQuery, callback_data: MyCallback, session, driver: Driver, current_day):
@@ -136,8 +136,10 @@ async def start_race_callback(callback: CallbackQuery, callback_data: MyCallback
                                            f'{driver.title} Начинает заезд в игре "Гонки"')
 
     content, _, players = await get_game_message(game_state, session)
-    winners = create_race_gif(game_state, players, chat_id=chat_id,
-                              output_path=f"race_{chat_id}.gif", frame_count=400, duration=2)
+    snapshots = [PlayerSnapshot.from_driver(p) for p in players]
+    race = simulate_race(game_state, snapshots, seed=random.randrange(2 ** 31), frame_count=RACE_FRAMES)
+    logger.info(f"Заезд в чате {chat_id}: seed={race.seed}, погода {race.type_segs}, финиш {race.winners}")
+    winners = race.winners
     medals = {1: "🥇", 2: "🥈", 3: "🥉", 4: "4️⃣", 5: "5️⃣", 6: "6️⃣", 7: "7️⃣", 8: "8️⃣", 9: "9️⃣", 10: "🔟"}
     count = len(game_state.player_ids)
     total = FEE * count
@@ -150,22 +152,36 @@ async def start_race_callback(callback: CallbackQuery, callback_data: MyCallback
         if place == len(winners) and prize < FEE:
             prize = FEE
         if prize != 0:
-            player.attributes["karma"] = player.get_karma() + prize
-            await AuditService(session).log_action(player.id, UserActionType.GAME_KARMA, current_day, prize,
-                                                   f"{player.title} За {place} место в заезде получил {prize:+d} кармы")
+            await KarmaService(session).apply(player.id, prize, UserActionType.GAME_KARMA, current_day,
+                                              f"{player.title} За {place} место в заезде получил {prize:+d} кармы")
 
         content += '\n'
     content += '\n'
     content += HashTag("#гонки")
-    await callback.message.answer_animation(animation=FSInputFile(f"race_{chat_id}.mp4"), supports_streaming=True)
     await callback.message.answer(**content.as_kwargs())
     await remove_state(chat_id, session)
 
+    # Результаты уже известны, видео заезда рисуется в фоне и приходит следом
+    task = asyncio.create_task(send_race_video(callback.message, race, snapshots))
+    video_tasks.add(task)
+    task.add_done_callback(video_tasks.discard)
+
+
+async def send_race_video(message: Message, race: RaceResult, players: list[PlayerSnapshot]):
+    chat_id = message.chat.id
+    try:
+        async with ChatActionSender.upload_video(chat_id=chat_id, bot=message.bot):
+            video = await render_service.race_video(race, players, chat_id=chat_id)
+            await message.answer_animation(animation=BufferedInputFile(video, filename=f"race_{chat_id}.mp4"),
+                                           supports_streaming=True)
+    except Exception as e:
+        logger.error(f"Не удалось отправить видео заезда в чат {chat_id}: {e}")
+
 
 @router.callback_query(MyCallback.filter(F.action == "check_wheels"),
                        flags={"check_driver": True})
 async def join_race_callback(callback: CallbackQuery, callback_data: MyCallback, session, driver: Driver, current_day):
-    wheels = driver.attributes.get("wheels", 0)
+    wheels = driver.wheels
     text = "дождевые шины (дают + к скорости во время дождя)" if wheels == 1 else "слики (лучшие на сухой трассе)" if wheels == 2 else "универсальные шины"
     await send_alarm(callback, f"🛞 Сейчас на машине установлены {text}")
 
@@ -174,22 +190,24 @@ async def join_race_callback(callback: CallbackQuery, callback_data: MyCallback,
                        flags={"check_driver": True})
 async def set_wheels_callback(callback: CallbackQuery, callback_data: MyCallback, session, driver: Driver, current_day):
     wheels = callback_data.spot_id
-    driver.attributes["wheels"] = wheels
+    driver.wheels = wheels
     text = "Дождевые шины (дают + к скорости во время дождя)" if wheels == 1 else "Слики (лучшие на сухой трассе)" if wheels == 2 else "Универсальные шины"
     await send_alarm(callback, f"🛞 {text} успешно установлены")
 
 
-async def get_media(players):
+async def answer_media(message: Message, players, session, **kwargs):
+    """
+    Отправляет картинку игры: пока гонщиков мало - случайную из ./pics/racing, потом - стартовую решетку.
+    """
+    media_service = MediaService(session)
+    send = lambda photo: message.answer_photo(photo=photo, **kwargs)
     if len(players) < MIN_PLAYERS:
         file = get_random_filename("./pics/racing")
-        if file:
-            return FSInputFile(os.path.join("./pics/racing", file))
-        return FSInputFile("./pics/racing.jpg")
-    track = draw_start_race_track(players, bg_color=(120, 120, 120), track_length=len(players) * 120)
-    img_buffer = BytesIO()
-    track.save(img_buffer, format="PNG")
-    img_buffer.seek(0)
-    return BufferedInputFile(img_buffer.getvalue(), filename="race.png")
+        path = os.path.join("./pics/racing", file) if file else "./pics/racing.jpg"
+        return await media_service.send(path, send, path=path)
+    track = await render_service.start_race_track([PlayerSnapshot.from_driver(p) for p in players],
+                                                  track_length=len(players) * 120)
+    return await media_service.send("race.png", send, data=track)
 
 
 def get_random_filename(directory_path):
@@ -23,7 +23,7 @@ async def get_hi_score(session):
     global hi_score
     if hi_score < 0:
         param_service = ParamService(session)
-        hi_score = int(await param_service.get_parameter("hi_score", "0"))
+        hi_score = await param_service.get_int("hi_score", 0)
     return hi_score
 
 
@@ -1,19 +1,19 @@
-import json
 from datetime import datetime, timedelta
-from io import BytesIO
 
 from aiogram import Router, F
 from aiogram.filters import Command, or_f
-from aiogram.types import Message, BufferedInputFile, CallbackQuery
+from aiogram.types import Message, CallbackQuery
 from aiogram.utils.formatting import Text, Bold, Code
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from dao.chat_state_dao import ChatStateDAO
 from handlers.driver_callback import add_button, MyCallback
 from models.driver import Driver
-from services.param_service import ParamService
+from services.media_service import MediaService
 from services.parking_service import ParkingService
-from services.queue_service import QueueService
-from utils.map_generator import generate_parking_map
+from services.render_service import render_service
+from services.weather_service import WeatherService
+from utils.render_snapshot import MapSnapshot
 
 router = Router()
 
@@ -24,89 +24,73 @@ async def map_tomorrow_command(message: Message, session, driver, current_day, i
     day = current_day + timedelta(days=1)
 
     # Получаем данные для карты
-    parking_service = ParkingService(session)
-    spots, reservations = await parking_service.get_spots_with_reservations(day)
+    lot = await ParkingService(session).get_lot_snapshot(day, with_current_driver=False, with_queue=False)
     frame_index = await get_frame_index(message, session)
+    temp, weather, _ = await WeatherService().get_weather_string(day)
 
     # Генерируем карту
-    img = await generate_parking_map(parking_spots=spots, reservations_data=reservations,
-                                     driver=driver if is_private else None,
-                                     use_spot_status=False, frame_index=frame_index,
-                                     day=day
-                                     )
-
-    img_buffer = BytesIO()
-    img.save(img_buffer, format="PNG")
-    img_buffer.seek(0)
+    img = await render_service.parking_map(MapSnapshot(
+        spots=lot.spots,
+        viewer_id=driver.id if is_private else None,
+        use_spot_status=False,
+        frame_index=frame_index,
+        temp=temp,
+        weather=weather
+    ))
 
     builder = InlineKeyboardBuilder()
     if is_private:
         add_button("📅 Расписание...", "edit-schedule", driver.chat_id, builder)
 
     # Отправка изображения
-    await message.answer_photo(
-        BufferedInputFile(img_buffer.getvalue(), filename="map.png"),
+    await MediaService(session).send("map.png", lambda photo: message.answer_photo(
+        photo,
         caption=f"Карта парковки на завтра {day.strftime('%a %d.%m.%Y')}\n\n"
                 f"🔴 - забронировано\n"
                 f"{'🟡 - забронировано Вами\n' if is_private else ''}"
                 f"🟢 - свободно",
         reply_markup=builder.as_markup()
-    )
+    ), data=img)
 
 
 @router.message(or_f(Command("map"), F.text.regexp(r"(?i)(.*пока.* (схем|карт)(а|у))|(.*(схем|карт)(а|у) парковки)")),
                 flags={"long_operation": "upload_photo", "check_driver": True})
 async def map_command(message: Message, session, driver, current_day, is_private):
     # Получаем данные для карты
-    parking_service = ParkingService(session)
-    spots, reservations = await parking_service.get_spots_with_reservations(current_day)
+    lot = await ParkingService(session).get_lot_snapshot(current_day)
     frame_index = await get_frame_index(message, session)
-    for spot in spots:
-        await session.refresh(spot, ["current_driver"])
+    temp, weather, _ = await WeatherService().get_weather_string(current_day)
+
     # Генерируем карту
-    img = await generate_parking_map(
-        parking_spots=spots,
-        reservations_data=reservations,
-        driver=driver if is_private else None,
+    img = await render_service.parking_map(MapSnapshot(
+        spots=lot.spots,
+        viewer_id=driver.id if is_private else None,
         frame_index=frame_index,
-        day=current_day
-    )
-
-    img_buffer = BytesIO()
-    img.save(img_buffer, format="PNG")
-    img_buffer.seek(0)
+        temp=temp,
+        weather=weather
+    ))
 
     builder = InlineKeyboardBuilder()
     if is_private:
         add_button("📅 Расписание...", "edit-schedule", driver.chat_id, builder)
 
-    queue_service = QueueService(session)
-    queue_all = await queue_service.get_all()
-
     # Отправка изображения
-    await message.answer_photo(
-        BufferedInputFile(img_buffer.getvalue(), filename="map.png"),
+    await MediaService(session).send("map.png", lambda photo: message.answer_photo(
+        photo,
         caption=f"Карта парковки на {current_day.strftime('%a %d.%m.%Y')}.\n"
                 f"(Обновлено {datetime.now().strftime('%d.%m.%Y %H:%M')})\n\n"
                 f"🔴 - забронировано\n"
                 f"{'🟡 - забронировано Вами\n' if is_private else ''}"
                 f"🟢 - свободно\n\n"
-                f"Всего в очереди: {len(queue_all)} человек(а)\n"
+                f"Всего в очереди: {len(lot.queue)} человек(а)\n"
         # Список позиций и водителей в очереди
-                f"{''.join(f'• {queue.driver.description}{(" ❗️🏆 ❗️ " + str(queue.spot_id) + " место до " + queue.choose_before.strftime('%H:%M')) if queue.spot_id else ''}\n' for queue in queue_all)}",
+                f"{''.join(f'• {queue.description}{(" ❗️🏆 ❗️ " + str(queue.spot_id) + " место до " + queue.choose_before.strftime('%H:%M')) if queue.spot_id else ''}\n' for queue in lot.queue)}",
         reply_markup=builder.as_markup()
-    )
+    ), data=img)
 
 
 async def get_frame_index(message, session):
-    param_service = ParamService(session)
-    chat_id = message.chat.id
-    frames_json = await param_service.get_parameter("map_frame_index", '{}')
-    frames = json.loads(frames_json)
-    frame_index = frames.get(str(chat_id), -1) + 1
-    frames[str(chat_id)] = frame_index
-    await param_service.set_parameter("map_frame_index", json.dumps(frames))
-    return frame_index
+    return await ChatStateDAO(session).increment_counter(message.chat.id, "map_frame_index")
 
 
 @router.callback_query(MyCallback.filter(F.action == "edit-schedule"),
@@ -1,5 +1,5 @@
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, BufferedInputFile, InputMediaPhoto
+from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 from aiogram.utils.formatting import Bold, as_key_value, as_list
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
@@ -7,8 +7,10 @@ from handlers.driver_callback import add_button, MyCallback
 from models.driver import Driver
 from models.user_audit import UserActionType
 from services.audit_service import AuditService
+from services.media_service import MediaService
 from services.notification_sender import send_reply, EventType, NotificationSender, send_alarm
-from utils.cars_generator import generate_carousel_image, cars_count, extra_cars_count
+from services.render_service import render_service
+from utils.cars_generator import cars_count, extra_cars_count
 
 router = Router()
 
@@ -85,20 +87,23 @@ async def test_alarms(event: CallbackQuery, callback_data: MyCallback, session,
 
 @router.callback_query(MyCallback.filter(F.action == "edit-avatar"),
                        flags={"check_driver": True, "check_callback": True})
-async def edit_avatar(event: CallbackQuery, driver: Driver):
-    current_index = driver.attributes.get("car_index", driver.id)
+async def edit_avatar(event: CallbackQuery, session, driver: Driver):
+    current_index = driver.get_car_index(driver.id)
     cars_count_for_driver = extra_cars_count if driver.attributes.get("extra_cars", 0) > 0 else cars_count
-    photo = generate_carousel_image(current_index, cars_count_for_driver)
-    await event.message.answer_photo(caption="🏎️ Выберите свой аватар:", show_caption_above_media=True,
-                                     photo=BufferedInputFile(photo.getvalue(), filename="carousel.png"),
-                                     reply_markup=get_carousel_keyboard(current_index, driver.chat_id))
+    photo = await render_service.carousel(current_index, cars_count_for_driver)
+    await MediaService(session).send(
+        "carousel.png",
+        lambda media: event.message.answer_photo(caption="🏎️ Выберите свой аватар:", show_caption_above_media=True,
+                                                 photo=media,
+                                                 reply_markup=get_carousel_keyboard(current_index, driver.chat_id)),
+        data=photo)
     await event.answer()
 
 
 @router.callback_query(MyCallback.filter(F.action == "set-avatar"),
                        flags={"check_driver": True, "check_callback": True})
 async def set_avatar(event: CallbackQuery, callback_data: MyCallback, session, driver: Driver, current_day):
-    driver.attributes["car_index"] = callback_data.spot_id
+    driver.car_index = callback_data.spot_id
     await send_alarm(event, "🏎️ Аватар успешно установлен")
     await AuditService(session).log_action(driver.id, UserActionType.CHOOSE_AVATAR, current_day,
                                            num=callback_data.spot_id,
@@ -106,7 +111,7 @@ async def set_avatar(event: CallbackQuery, callback_data: MyCallback, session, d
 
 
 @router.callback_query(F.data.startswith("carousel:"), flags={"check_driver": True})
-async def carousel_callback(event: CallbackQuery, driver: Driver):
+async def carousel_callback(event: CallbackQuery, session, driver: Driver):
     """
     Обрабатывает нажатия на кнопки "⬅️" и "➡️".
     Из callback data определяется направление и вычисляется новый индекс,
@@ -121,17 +126,24 @@ async def carousel_callback(event: CallbackQuery, driver: Driver):
     cars_count_for_driver = extra_cars_count if driver.attributes.get("extra_cars", 0) > 0 else cars_count
     new_index = (current_index + int(direction)) % cars_count_for_driver
 
-    photo = generate_carousel_image(new_index, cars_count_for_driver)
+    photo = await render_service.carousel(new_index, cars_count_for_driver)
+    media_service = MediaService(session)
     try:
-        await event.message.edit_media(
-            media=InputMediaPhoto(caption="🏎️ Выберите свой аватар:", show_caption_above_media=True,
-                                  media=BufferedInputFile(photo.getvalue(), filename="carousel.png")),
-            reply_markup=get_carousel_keyboard(new_index, driver.chat_id))
+        await media_service.send(
+            "carousel.png",
+            lambda media: event.message.edit_media(
+                media=InputMediaPhoto(caption="🏎️ Выберите свой аватар:", show_caption_above_media=True,
+                                      media=media),
+                reply_markup=get_carousel_keyboard(new_index, driver.chat_id)),
+            data=photo)
     except Exception as e:
         # Если редактирование сообщения не удалось, отправляем новое фото
-        await event.message.answer_photo(caption="🏎️ Выберите свой аватар:", show_caption_above_media=True,
-                                         photo=BufferedInputFile(photo.getvalue(), filename="carousel.png"),
-                                         reply_markup=get_carousel_keyboard(new_index, driver.chat_id))
+        await media_service.send(
+            "carousel.png",
+            lambda media: event.message.answer_photo(caption="🏎️ Выберите свой аватар:", show_caption_above_media=True,
+                                                     photo=media,
+                                                     reply_markup=get_carousel_keyboard(new_index, driver.chat_id)),
+            data=photo)
 
     await event.answer()
 
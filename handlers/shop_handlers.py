@@ -10,15 +10,22 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from handlers.driver_callback import add_button, MyCallback
+from middlewares.lock_operation import get_lock
 from models.driver import Driver
 from models.user_audit import UserActionType
 from services.audit_service import AuditService
 from services.driver_service import DriverService
+from services.karma_service import KarmaService
 from services.notification_sender import send_reply, send_alarm
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+
+def shop_lock_name(seller_chat_id: int) -> str:
+    return f"shop:{seller_chat_id}"
+
+
 def get_cost(price):
     vat = max(1, round(price * 0.1))
     return price + vat
@@ -26,18 +33,19 @@ def get_cost(price):
 
 @router.message(
     F.text.regexp(r"(?i).*новый магазин добрых дел.*"),
-    flags={"lock_operation": "shop", "check_driver": True})
+    flags={"check_driver": True})
 async def new_shop(message: Message, session: AsyncSession, driver: Driver, current_day, is_private):
     if not is_private:
         await message.answer("Команда недоступна в общих чатах.")
         return
 
     items = parse_items(message.text)
-    driver.attributes["shop_id"] = 1 + driver.attributes.get("shop_id", 0)
-    driver.attributes["shop_items"] = items
+    async with get_lock(shop_lock_name(driver.chat_id)):
+        driver.attributes["shop_id"] = 1 + driver.attributes.get("shop_id", 0)
+        driver.attributes["shop_items"] = items
 
-    await AuditService(session).log_action(driver.id, UserActionType.SHOP, current_day, len(items),
-                                           f'{driver.title} создает магазин добрых дел с {len(items)} предметами')
+        await AuditService(session).log_action(driver.id, UserActionType.SHOP, current_day, len(items),
+                                               f'{driver.title} создает магазин добрых дел с {len(items)} предметами')
 
     builder = await get_shop_keyboard(driver, items)
     content = Bold("Магазин добрых дел создан!")
@@ -62,7 +70,7 @@ async def new_shop(message: Message, session: AsyncSession, driver: Driver, curr
 
 @router.message(
     F.text.regexp(r"(?i).*открыть магазин"),
-    flags={"lock_operation": "shop", "check_driver": True})
+    flags={"check_driver": True})
 async def show_shop(message: Message, session: AsyncSession, driver: Driver, current_day, is_private):
     items = driver.attributes.get("shop_items", [])
     if not items:
@@ -77,20 +85,21 @@ async def show_shop(message: Message, session: AsyncSession, driver: Driver, cur
 
 @router.message(
     F.text.regexp(r"(?i).*закрыть магазин"),
-    flags={"lock_operation": "shop", "check_driver": True})
+    flags={"check_driver": True})
 async def close_shop(message: Message, session: AsyncSession, driver: Driver, current_day, is_private):
     items = []
-    driver.attributes["shop_id"] = 1 + driver.attributes.get("shop_id", 0)
-    driver.attributes["shop_items"] = items
+    async with get_lock(shop_lock_name(driver.chat_id)):
+        driver.attributes["shop_id"] = 1 + driver.attributes.get("shop_id", 0)
+        driver.attributes["shop_items"] = items
 
-    await AuditService(session).log_action(driver.id, UserActionType.SHOP, current_day, len(items),
-                                           f'{driver.title} закрывает магазин добрых дел')
+        await AuditService(session).log_action(driver.id, UserActionType.SHOP, current_day, len(items),
+                                               f'{driver.title} закрывает магазин добрых дел')
     builder = InlineKeyboardBuilder()
     await send_reply(message, Bold("✖️ Магазин закрыт!"), builder)
 
 
 @router.callback_query(MyCallback.filter(F.action == "hide-shop"),
-                       flags={"lock_operation": "shop", "check_driver": True, "check_callback": True})
+                       flags={"check_driver": True, "check_callback": True})
 async def hide_shop(callback, session, driver, current_day, is_private):
     try:
         await send_alarm(callback, "❎ Магазин скрыт!\n\nПокажите его снова с помощью команды 'Открыть магазин'")
@@ -105,8 +114,15 @@ async def hide_shop(callback, session, driver, current_day, is_private):
 
 
 @router.callback_query(MyCallback.filter(F.action == "buy-item"),
-                       flags={"lock_operation": "shop", "check_driver": True})
+                       flags={"check_driver": True})
 async def buy_item(callback, callback_data: MyCallback, session, driver, current_day, is_private):
+    # Карма списывается атомарно, а остатки товара хранятся у продавца в attributes,
+    # поэтому покупки у одного продавца идут по очереди, а у разных - параллельно
+    async with get_lock(shop_lock_name(callback_data.user_id)):
+        await sell_item(callback, callback_data, session, driver, current_day, is_private)
+
+
+async def sell_item(callback, callback_data: MyCallback, session, driver, current_day, is_private):
     seller = await DriverService(session).get_by_chat_id(callback_data.user_id)
     if not seller:
         await send_alarm(callback, "⚠️ Продавец не найден")
@@ -133,16 +149,14 @@ async def buy_item(callback, callback_data: MyCallback, session, driver, current
         await send_alarm(callback, "⚠️ Нельзя купить у себя")
         return
 
-    if get_cost(item["price"]) > driver.get_karma():
+    karma = await KarmaService(session).transfer(
+        driver.id, seller.id, get_cost(item["price"]), item["price"], UserActionType.SHOP_KARMA, current_day,
+        f'{driver.title} купил товар "{item["description"]}" у {seller.title}',
+        f'{seller.title} продал товар "{item["description"]}" {driver.title}')
+    if karma is None:
         await send_alarm(callback, "⚠️ У вас недостаточно кармы")
         return
 
-    driver.attributes["karma"] = driver.get_karma() - get_cost(item["price"])
-    seller.attributes["karma"] = seller.get_karma() + item["price"]
-    await AuditService(session).log_action(driver.id, UserActionType.SHOP_KARMA, current_day, -get_cost(item["price"]),
-                                           f'{driver.title} купил товар "{item["description"]}" у {seller.title}')
-    await AuditService(session).log_action(seller.id, UserActionType.SHOP_KARMA, current_day, item["price"],
-                                           f'{seller.title} продал товар "{item["description"]}" {driver.title}')
     item["sold"] = item.get("sold", 0) + 1
     seller.attributes["shop_items"] = items
     await AuditService(session).log_action(driver.id, UserActionType.SHOP, current_day, 1,
@@ -17,11 +17,13 @@ from models.parking_spot import SpotStatus
 from models.user_audit import UserActionType
 from services.audit_service import AuditService
 from services.driver_service import DriverService
+from services.karma_service import KarmaService
 from services.notification_sender import NotificationSender, EventType, send_alarm, send_reply
 from services.param_service import ParamService
 from services.parking_service import ParkingService
 from services.queue_service import QueueService
 from services.reservation_service import ReservationService
+from services.status_service import StatusService, spot_info_text
 
 router = Router()
 
@@ -42,21 +44,20 @@ async def show_status_callback(callback: CallbackQuery, session, driver, current
 
 async def get_status_message(driver: Driver, is_private, session, current_day):
     await session.commit()
-    await session.refresh(driver, ["reservations", "parking_spots", "current_spots"])
+    status = await StatusService(session).get_status(driver.id, current_day)
     if date.today() != current_day:
         ts = ' завтра'  # tomorrow suffix
         on_ts = ' на завтра'
     else:
         ts = ''
         on_ts = ''
-    is_absent = driver.is_absent(current_day)
-    occupied_spots = driver.get_occupied_spots()
-    spots, reservations = await ParkingService(session).get_spots_with_reservations(current_day)
-    in_queue = await QueueService(session).is_driver_in_queue(driver)
+    is_absent = status.is_absent(current_day)
+    occupied_spots = status.occupied_spots
+    in_queue = status.in_queue
 
     builder = InlineKeyboardBuilder()
     keyboard_sizes = []
-    if driver.attributes.get("plus", -1) > -1:
+    if status.plus > -1:
         add_button("🎲 Карма! 🆓", "plus-karma", driver.chat_id, builder)
         keyboard_sizes.append(1)
     if is_absent:
@@ -71,7 +72,7 @@ async def get_status_message(driver: Driver, is_private, session, current_day):
             add_button(f"🫶 Не приеду", "absent", driver.chat_id, builder)
             keyboard_sizes.append(2)
             if not in_queue:
-                if not any(res.day_of_week == current_day.weekday() for res in driver.reservations):
+                if not status.has_reservation:
                     add_button(f"🙋 Встать в очередь{on_ts}", "join-queue", driver.chat_id, builder)
                     keyboard_sizes.append(1)
 
@@ -83,8 +84,7 @@ async def get_status_message(driver: Driver, is_private, session, current_day):
         add_button("⚙️ Настройки...", "settings", driver.chat_id, builder)
         keyboard_sizes.append(1)
         # В Сб и Вс доберись до парковки
-        is_working_day = ((await ParamService(session).get_parameter("current_day_is_working_day", ""))
-                          .lower() in ("yes", "true", "t", "1"))
+        is_working_day = await ParamService(session).get_bool("current_day_is_working_day")
         if not is_working_day:
             builder.add(
                 InlineKeyboardButton(text="Игра «Доберись до 🅿️» (-1 💟)", callback_data=f"game_parking"))
@@ -94,28 +94,27 @@ async def get_status_message(driver: Driver, is_private, session, current_day):
     keyboard_sizes.append(1)
     builder.adjust(*keyboard_sizes)
 
-    content = Text('🪪 ', TextLink(driver.title, url=f"tg://user?id={driver.chat_id}"), "\n",
-                   f"{driver.description}", '\n\n')
+    content = Text('🪪 ', TextLink(status.title, url=f"tg://user?id={status.chat_id}"), "\n",
+                   f"{status.description}", '\n\n')
     if in_queue:
         content += Bold("Вы в очереди") + '\n\n'
 
     if is_absent:
-        content += Bold("Приеду не раньше: ") + driver.absent_until.strftime('%a %d.%m.%Y') + '\n\n'
+        content += Bold("Приеду не раньше: ") + status.absent_until.strftime('%a %d.%m.%Y') + '\n\n'
 
     if occupied_spots:
         content += Bold("Вы стоите на: 🅿️ ") + ", ".join([str(spot.id) for spot in occupied_spots]) + '\n\n'
 
-    if driver.my_spots():
+    if status.my_spots:
         content += as_marked_section(
             Bold(f"Закрепленные места на {current_day.strftime('%a %d.%m.%Y')}:"),
-            *[as_key_value(f"{spot.id}", f"{await get_spot_info(spot, reservations, session)}")
-              for spot in driver.my_spots()],
+            *[as_key_value(f"{spot.id}", spot.info()) for spot in status.my_spots],
             marker="• ", )
     else:
         content += Bold("Нет закрепленных мест")
 
     content += '\n\n'
-    content += as_key_value("Карма", f"{driver.get_karma()} 💟")
+    content += as_key_value("Карма", f"{status.karma} 💟")
 
     return content, builder
 
@@ -127,22 +126,10 @@ async def get_spot_info(spot, reservations, session):
     else:
         res_info = reservations.get(spot.id, [])
 
-    if len(res_info) < 1:
-        res = "Свободно"
-        res_old = "не было брони"
-    else:
-        res = "Бронь у " + ', '.join(res.driver.title for res in res_info)
-        res_old = "была бронь у " + ', '.join(res.driver.title for res in res_info)
-
     await session.refresh(spot, ["current_driver"])
     is_woman = spot.current_driver and spot.current_driver.attributes.get("gender", "M") == "F"
-    if spot.status == SpotStatus.OCCUPIED:
-        return f"Занял{'а' if is_woman else ''} {spot.current_driver.title} ({res_old})"
-    elif spot.status == SpotStatus.OCCUPIED_WITHOUT_DEMAND:
-        return f"Занял{'а' if is_woman else ''} {spot.current_driver.title}! ({res_old})"
-    elif spot.status == SpotStatus.FREE:
-        return f"Освободил{'а' if is_woman else ''} {spot.current_driver.title if spot.current_driver else ''} ({res_old})"
-    return res
+    return spot_info_text(spot.status, spot.current_driver.title if spot.current_driver else None, is_woman,
+                          [res.driver.title for res in res_info])
 
 
 @router.message(
@@ -262,8 +249,8 @@ async def comeback_driver(driver, event, session, current_day):
         reservation_service = ReservationService(session)
         await reservation_service.delete_duplicate_reservations(current_day)
 
-    await session.refresh(driver, ["reservations", "parking_spots", "current_spots"])
-    occupied_spots = driver.get_occupied_spots()
+    status = await StatusService(session).get_status(driver.id, current_day)
+    occupied_spots = status.occupied_spots
     builder = InlineKeyboardBuilder()
     content = Text(f"Вы хотите приехать в {current_day.strftime('%a %d.%m.%Y')}\n\n")
     sizes = [1]
@@ -272,36 +259,32 @@ async def comeback_driver(driver, event, session, current_day):
         content += f"Вы уже занимаете место: 🅿️ {', '.join(str(spot.id) for spot in occupied_spots)}"
     else:
         allow_queue = True
-        if driver.my_spots():
+        if status.my_spots:
             # потом в ваших местах
-            spots, reservations = await ParkingService(session).get_spots_with_reservations(current_day)
             content += as_marked_section(
                 Bold(f"Закрепленные места на {current_day.strftime('%a %d.%m.%Y')}:"),
-                *[as_key_value(f"{spot.id}", f"{await get_spot_info(spot, reservations, session)}")
-                  for spot in driver.my_spots()],
+                *[as_key_value(f"{spot.id}", spot.info()) for spot in status.my_spots],
                 marker="• ", ) + '\n\n'
-            for spot in driver.my_spots():
+            for spot in status.my_spots:
                 pref = "⚪"
-                if spot.status == SpotStatus.OCCUPIED or spot.status == SpotStatus.OCCUPIED_WITHOUT_DEMAND:
+                if spot.is_occupied():
                     pref = "🔴"
                 elif spot.status == SpotStatus.FREE:
                     pref = "⚪"
                 else:
-                    res_info = reservations.get(spot.id, [])
-                    if len(res_info) < 1:
+                    if len(spot.reserved_ids) < 1:
                         pref = "⚪"
-                    elif any(res.driver.id == driver.id for res in res_info):
+                    elif driver.id in spot.reserved_ids:
                         pref = "🟢"
                         allow_queue = False
                     else:
                         pref = "🔴"
                 add_button(f"Занять {pref} {spot.id}", "try-occupy-my-spot", driver.chat_id, builder, spot.id)
-            sizes = [len(driver.my_spots()), 1]
+            sizes = [len(status.my_spots), 1]
 
         # потом вступаем в очередь
         if allow_queue:
-            in_queue = await QueueService(session).is_driver_in_queue(driver)
-            if in_queue:
+            if status.in_queue:
                 add_button("✋ Покинуть очередь", "leave-queue", driver.chat_id, builder)
             else:
                 add_button("🙋 Встать в очередь", "join-queue", driver.chat_id, builder)
@@ -396,20 +379,19 @@ async def occupy_spot(callback, callback_data, current_day, driver, is_private,
 @router.callback_query(MyCallback.filter(F.action == "plus-karma"),
                        flags={"check_driver": True, "check_callback": True})
 async def plus_karma_callback(callback: CallbackQuery, session: AsyncSession, driver: Driver, current_day, is_private):
-    if driver.attributes.get("plus", -1) < 0:
+    if driver.get_plus() < 0:
         await callback.answer("❎ Вы не можете получить больше кармы.\n\nМожет завтра повезет.", show_alert=True)
     else:
-        driver.attributes["plus"] = -1
+        driver.plus = -1
         if not is_private:
             await callback.bot.send_message(chat_id=driver.chat_id, text="Розыгрыш кармы! /status")
         data = await callback.bot.send_dice(chat_id=driver.chat_id, emoji=random.choice(['🎲', '🎯', '🏀', '⚽', '🎳']))
         await session.commit()
         await show_status_callback(callback, session, driver, current_day, is_private)
         await asyncio.sleep(5 if is_private else 13)
-        driver.attributes["karma"] = driver.get_karma() + data.dice.value
-        await AuditService(session).log_action(driver.id, UserActionType.DRAW_KARMA, current_day, data.dice.value,
-                                               f"Розыгрыш кармы для {driver.description}: +{data.dice.value}; стало {driver.attributes["karma"]}")
-        await session.commit()
+        await KarmaService(session).apply(
+            driver.id, data.dice.value, UserActionType.DRAW_KARMA, current_day,
+            lambda karma: f"Розыгрыш кармы для {driver.description}: +{data.dice.value}; стало {karma}")
         await callback.answer(f"💟 Вы получили +{data.dice.value} в карму.\n\nЗавтра будет шанс получить еще.",
                               show_alert=True)
 
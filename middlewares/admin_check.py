@@ -32,9 +32,8 @@ class AdminCheckMiddleware(BaseMiddleware):
 
         # Получаем список администраторов
         user_id = event.from_user.id
-        admins_string = await param_service.get_parameter("admins", "")
-        admins = [item.strip() for item in admins_string.split(',')]
-        if not str(user_id) in admins:
+        admins = await param_service.get_admin_ids()
+        if user_id not in admins:
             await event.answer(
                 text="Функция только для администратора!",
                 show_alert=True
@@ -4,7 +4,9 @@ from aiogram import BaseMiddleware
 from aiogram.dispatcher.flags import get_flag
 from aiogram.types import TelegramObject, CallbackQuery
 
+from models.driver import Driver
 from services.driver_service import DriverService
+from utils.driver_cache import driver_cache
 
 
 class DriverCheckMiddleware(BaseMiddleware):
@@ -24,11 +26,16 @@ class DriverCheckMiddleware(BaseMiddleware):
         if not need_check_handler:
             return await handler(event, data)
         session = data["session"]
-        # Получаем данные пользователя
-        driver_service = DriverService(session)
-        driver = await driver_service.get_by_chat_id(event.from_user.id)
+        # Получаем данные пользователя (из кэша, если недавно проверяли)
+        identity, driver = await DriverService(session).get_identity(event.from_user.id)
+        if identity and identity.enabled and driver is None and self.need_driver(data):
+            # Сам водитель нужен только обработчикам, которые принимают параметр driver
+            driver = await session.get(Driver, identity.id)
+            if driver is None or not driver.enabled:
+                driver_cache.invalidate(event.from_user.id)
+                identity = None
 
-        if not driver or not driver.enabled:
+        if not identity or not identity.enabled:
             await event.answer(
                 text="Сначала зарегистрируйтесь или обратитесь к администратору! /start",
                 show_alert=True
@@ -40,3 +47,10 @@ class DriverCheckMiddleware(BaseMiddleware):
         data["is_private"] = event.message.chat.type == 'private' if is_callback \
             else event.chat.type == 'private'
         return await handler(event, data)
+
+    @staticmethod
+    def need_driver(data: Dict[str, Any]) -> bool:
+        handler_object = data.get("handler")
+        if handler_object is None:
+            return True
+        return handler_object.varkw or "driver" in handler_object.params
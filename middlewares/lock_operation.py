@@ -1,11 +1,20 @@
 import asyncio
+import weakref
 from typing import Callable, Dict, Any, Awaitable
 
 from aiogram import BaseMiddleware
 from aiogram.dispatcher.flags import get_flag
 from aiogram.types import TelegramObject
 
-shared_locks = dict()
+# Блокировка живет, пока ее кто-то держит или ждет, поэтому именные блокировки (на чат, на продавца) не копятся
+shared_locks = weakref.WeakValueDictionary()
+
+
+def get_lock(name: str) -> asyncio.Lock:
+    lock = shared_locks.get(name)
+    if lock is None:
+        lock = shared_locks[name] = asyncio.Lock()
+    return lock
 
 
 class LockOperationMiddleware(BaseMiddleware):
@@ -21,7 +30,11 @@ class LockOperationMiddleware(BaseMiddleware):
         if not lock_name:
             return await handler(event, data)
 
+        # Флаг lock_per_chat: операции в разных чатах не ждут друг друга
+        chat = data.get("event_chat")
+        if get_flag(data, "lock_per_chat") and chat:
+            lock_name = f"{lock_name}:{chat.id}"
+
         # Если флаг есть
-        shared_lock = shared_locks.setdefault(lock_name, asyncio.Lock())
-        async with shared_lock:
+        async with get_lock(lock_name):
             return await handler(event, data)
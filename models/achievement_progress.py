@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+
+from config.database import Base
+from models.types import JSON
+
+
+class AchievementProgress(Base):
+    """
+    Данные для ачивок водителя за последние дни (по дням: последнее действие, броски кармы, места, покупки).
+    Обновляется при записи аудита, чтобы экран достижений читал одну строку.
+    """
+    __tablename__ = 'achievement_progress'
+
+    driver_id = Column(Integer, ForeignKey('drivers.id'), primary_key=True)
+    days = Column(JSON, nullable=False, default={})
+    updated = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlalchemy import Column, BigInteger, String, Integer, DateTime
+
+from config.database import Base
+from models.types import JSON
+
+
+class ChatGameState(Base):
+    """
+    Состояние игры в конкретном чате (например, лобби гонки): одна строка на пару (чат, игра).
+    """
+    __tablename__ = 'chat_game_state'
+
+    chat_id = Column(BigInteger, primary_key=True)
+    game = Column(String(32), primary_key=True)
+    state = Column(JSON, nullable=False)
+    updated = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
+
+
+class ChatCounter(Base):
+    """
+    Счетчик в конкретном чате (например, номер кадра мусоровоза на карте).
+    """
+    __tablename__ = 'chat_counters'
+
+    chat_id = Column(BigInteger, primary_key=True)
+    name = Column(String(32), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
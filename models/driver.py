@@ -1,7 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Boolean, Date
-from sqlalchemy.dialects.sqlite.json import JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Date, Index
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.orm import relationship
 
@@ -9,19 +8,27 @@ from config.database import Base
 from models.parking_spot import parking_spot_driver_association, SpotStatus, ParkingSpot
 from models.queue import Queue
 from models.reservation import Reservation
+from models.types import JSON
 
 
 class Driver(Base):
     __tablename__ = 'drivers'
+    # фильтр "водитель включен и не в отъезде" в запросах броней и свободных мест
+    __table_args__ = (Index('ix_drivers_enabled_absent', 'enabled', 'absent_until'),)
 
     id = Column(Integer, primary_key=True, index=True)
-    chat_id = Column(Integer, unique=True, index=True)
+    chat_id = Column(BigInteger, unique=True, index=True)  # id пользователей Telegram не влезают в int4
     username = Column(String)
     title = Column(String)
     description = Column(String)
     absent_until = Column(Date, index=True)
     attributes = Column(MutableDict.as_mutable(JSON), default={})
     enabled = Column(Boolean)
+    # Часто меняющиеся значения вынесены из attributes в отдельные колонки
+    karma = Column(Integer, default=0, server_default="0", nullable=False, index=True)
+    plus = Column(Integer, index=True)  # результат утреннего розыгрыша кармы, -1 - уже получен
+    car_index = Column(Integer)  # выбранная машинка, None - по умолчанию
+    wheels = Column(Integer, default=0, server_default="0", nullable=False)  # шины для гонки
 
     parking_spots = relationship(ParkingSpot,
                                  secondary=parking_spot_driver_association,
@@ -32,7 +39,13 @@ class Driver(Base):
     current_spots = relationship(ParkingSpot, back_populates="current_driver")
 
     def get_karma(self) -> int:
-        return self.attributes.get("karma", 0)
+        return self.karma or 0
+
+    def get_plus(self) -> int:
+        return -1 if self.plus is None else self.plus
+
+    def get_car_index(self, default: int) -> int:
+        return default if self.car_index is None else self.car_index
 
     def is_absent(self, day: datetime) -> bool:
         return (self.absent_until is not None) and (self.absent_until > day)
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Date, Boolean, String, DateTime
+
+from config.database import Base
+
+
+class Holiday(Base):
+    """
+    Производственный календарь: рабочий ли день и название праздника.
+    """
+    __tablename__ = 'holidays'
+
+    day = Column(Date, primary_key=True)
+    is_working_day = Column(Boolean, nullable=False)
+    name = Column(String)
+    updated = Column(DateTime, default=datetime.now, nullable=False)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, Date, Enum as SQLEnum, ForeignKey
+
+from config.database import Base
+from models.user_audit import UserActionType
+
+# Действия, которые меняют карму (num в аудите - изменение кармы)
+KARMA_ACTIONS = (UserActionType.DRAW_KARMA, UserActionType.GAME_KARMA,
+                 UserActionType.GET_ADMIN_KARMA, UserActionType.SHOP_KARMA)
+
+
+class KarmaDaily(Base):
+    """
+    Сумма изменений кармы водителя за день по типу действия (отдельно начисления и списания).
+    Заполняется при записи аудита, по ней строится недельный топ.
+    """
+    __tablename__ = 'karma_daily'
+
+    driver_id = Column(Integer, ForeignKey('drivers.id'), primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    action = Column(SQLEnum(UserActionType), primary_key=True)
+    positive_sum = Column(Integer, default=0, nullable=False)
+    negative_sum = Column(Integer, default=0, nullable=False)
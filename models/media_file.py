@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime
+
+from config.database import Base
+
+
+class MediaFile(Base):
+    """
+    Файл, уже загруженный в Telegram: по хэшу содержимого храним полученный file_id,
+    чтобы повторно отправлять его без загрузки.
+    """
+    __tablename__ = 'media_files'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False, index=True)
+    content_hash = Column(String(64), nullable=False, unique=True)
+    file_id = Column(String(255), nullable=False)
+    last_used = Column(DateTime, default=datetime.now, nullable=False)
@@ -1,6 +1,6 @@
 from enum import Enum as PyEnum
 
-from sqlalchemy import Column, Integer, ForeignKey, Enum as SQLEnum, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Enum as SQLEnum, DateTime, Index
 from sqlalchemy import Table
 from sqlalchemy.orm import relationship
 
@@ -18,7 +18,10 @@ parking_spot_driver_association = Table(
     'parking_spot_driver',
     Base.metadata,
     Column('parking_spot_id', Integer, ForeignKey('parkingspots.id')),
-    Column('driver_id', Integer, ForeignKey('drivers.id'))
+    Column('driver_id', Integer, ForeignKey('drivers.id')),
+    # владельцы места и места водителя (экран статуса, партнеры, свободные места)
+    Index('ix_parking_spot_driver_spot', 'parking_spot_id', 'driver_id'),
+    Index('ix_parking_spot_driver_driver', 'driver_id', 'parking_spot_id'),
 )
 
 
@@ -35,7 +38,7 @@ class ParkingSpot(Base):
 
     for_queue_after = Column(DateTime)
 
-    drivers = relationship("Driver", secondary=parking_spot_driver_association, back_populates="parking_spots",
-                           lazy="selectin")
+    # Владельцы места загружаются только явно (selectinload/refresh), там где они нужны
+    drivers = relationship("Driver", secondary=parking_spot_driver_association, back_populates="parking_spots")
     current_driver = relationship("Driver", back_populates="current_spots")
     reservations = relationship("Reservation", back_populates="parking_spot")
@@ -8,7 +8,7 @@ class Queue(Base):
     __tablename__ = 'queue'
 
     id = Column(Integer, primary_key=True)
-    created = Column(DateTime)
+    created = Column(DateTime, index=True)
 
     driver_id = Column(Integer, ForeignKey('drivers.id'), index=True)
     driver = relationship("Driver", back_populates="queue", lazy="selectin")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 
 from config.database import Base
@@ -6,6 +6,8 @@ from config.database import Base
 
 class Reservation(Base):
     __tablename__ = 'reservations'
+    # брони на день по местам (get_by_day, get_free_spots)
+    __table_args__ = (Index('ix_reservations_day_spot', 'day_of_week', 'parking_spot_id'),)
 
     id = Column(Integer, primary_key=True, index=True)
     driver_id = Column(Integer, ForeignKey('drivers.id'), index=True)
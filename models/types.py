@@ -0,0 +1,5 @@
+from sqlalchemy import JSON as BaseJSON
+from sqlalchemy.dialects.postgresql import JSONB
+
+# JSON-колонка, переносимая между БД: в PostgreSQL хранится как JSONB (с его операторами), в SQLite - как JSON
+JSON = BaseJSON().with_variant(JSONB(), "postgresql")
@@ -1,7 +1,7 @@
 from datetime import datetime
 from enum import Enum as PyEnum
 
-from sqlalchemy import Column, Integer, DateTime, Date, String, Enum as SQLEnum, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, Date, String, Enum as SQLEnum, ForeignKey, Index
 
 from config.database import Base
 
@@ -24,6 +24,12 @@ class UserActionType(PyEnum):
 
 class UserAudit(Base):
     __tablename__ = 'user_audit'
+    __table_args__ = (
+        # действия водителя за период (get_actions_by_period)
+        Index('ix_user_audit_driver_day', 'driver_id', 'current_day'),
+        # действия всех водителей с даты (get_actions_since, пересчет karma_daily)
+        Index('ix_user_audit_day_action', 'current_day', 'action'),
+    )
 
     id = Column(Integer, primary_key=True)
     action_time = Column(DateTime, default=datetime.now, nullable=False)
@@ -0,0 +1,126 @@
+"""
+Замер задержки коммитов при параллельных callback-ах для профилей БД (DB_PROFILE).
+
+Каждый профиль запускается в отдельном процессе со своей свежей SQLite БД: движок
+настраивается при импорте config.database. Callback имитирует типичный обработчик:
+читает экран статуса водителя и меняет карму (UPDATE + аудит + коммит). Параллельно
+работает "писатель нового дня", который периодически держит длинную транзакцию.
+
+Запуск из корня проекта:
+    python -m scripts.bench_commit_latency [--callbacks 20] [--rounds 20] [--dir .]
+БД создается во временном каталоге внутри --dir: меряйте на том же диске, где живет боевая БД.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+PROFILES = ("default", "production")
+
+
+async def run_worker(callbacks: int, rounds: int) -> dict:
+    from sqlalchemy import insert, update, text
+
+    from config.database import create_database, db_pool, engine
+    from models.driver import Driver
+    from models.user_audit import UserActionType
+    from services.karma_service import KarmaService
+    from services.status_service import StatusService
+
+    await create_database()
+    async with db_pool() as session:
+        await session.execute(insert(Driver), [
+            {"id": i, "chat_id": -i, "title": f"Водитель {i}", "description": f"Водитель {i}",
+             "enabled": True, "attributes": {}} for i in range(1, callbacks + 1)])
+        await session.commit()
+
+    today = date.today()
+    latencies = []
+    errors = []
+    stop = asyncio.Event()
+
+    async def callback(driver_id: int):
+        start = time.perf_counter()
+        try:
+            async with db_pool() as session:
+                await StatusService(session).get_status(driver_id, today)
+                await KarmaService(session).apply(driver_id, 1, UserActionType.GAME_KARMA, today, "bench")
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(type(e).__name__)
+
+    async def new_day_writer():
+        # длинная транзакция, как у пересчета нового дня: обновляет всех водителей и держит блокировку
+        while not stop.is_set():
+            async with db_pool() as session:
+                await session.execute(update(Driver).values(plus=0))
+                await session.execute(text("SELECT count(*) FROM drivers"))
+                await asyncio.sleep(0.05)
+                await session.commit()
+            await asyncio.sleep(0.2)
+
+    writer = asyncio.create_task(new_day_writer())
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(callback(i) for i in range(1, callbacks + 1)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await writer
+    await engine.dispose()
+
+    latencies.sort()
+    return {
+        "ok": len(latencies),
+        "errors": len(errors),
+        "error_types": sorted(set(errors)),
+        "per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else None,
+        "max_ms": latencies[-1] * 1000 if latencies else None,
+    }
+
+
+def run_profile(profile: str, args) -> dict:
+    db_dir = tempfile.mkdtemp(prefix="bench_db_", dir=args.dir)
+    try:
+        env = dict(os.environ, DB_PROFILE=profile, AUDIT_MODE="request",
+                   DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(db_dir, 'bench.db')}")
+        output = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_commit_latency", "--worker",
+             "--callbacks", str(args.callbacks), "--rounds", str(args.rounds)],
+            env=env, check=True, capture_output=True, text=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callbacks", type=int, default=20, help="параллельных callback-ов в раунде")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--dir", default=".", help="где создавать временную БД")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(run_worker(args.callbacks, args.rounds))))
+        return
+
+    print(f"{args.callbacks} параллельных callback-ов x {args.rounds} раундов")
+    print(f"{'профиль':12} {'ok':>6} {'ошибок':>7} {'в сек':>8} {'p50, мс':>9} {'p95, мс':>9} {'max, мс':>9}")
+    for profile in PROFILES:
+        r = run_profile(profile, args)
+        print(f"{profile:12} {r['ok']:6} {r['errors']:7} {r['per_second']:8.1f} "
+              f"{r['p50_ms'] or 0:9.1f} {r['p95_ms'] or 0:9.1f} {r['max_ms'] or 0:9.1f}"
+              + (f"  {', '.join(r['error_types'])}" if r['error_types'] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Проверка планов частых запросов DAO (EXPLAIN QUERY PLAN).
+
+Создает временную SQLite БД со схемой и индексами приложения, заполняет ее данными
+в объеме, близком к боевому, вызывает методы DAO, перехватывает их SELECT-запросы
+и проверяет, что ни один из них не сканирует целиком таблицу, которую должен читать по индексу.
+
+Запуск из корня проекта:
+    python -m scripts.check_query_plans [-v]
+Код возврата 1, если хотя бы один запрос деградировал до полного сканирования таблицы.
+"""
+import asyncio
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+DB_FILE = os.path.join(tempfile.mkdtemp(), "query_plans.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_FILE}"
+
+from sqlalchemy import event, insert
+
+from config.database import engine, db_pool, create_database
+from dao.driver_dao import DriverDAO
+from dao.karma_daily_dao import KarmaDailyDAO
+from dao.parking_spot_dao import ParkingSpotDAO
+from dao.queue_dao import QueueDAO
+from dao.reservation_dao import ReservationDAO
+from dao.status_dao import StatusDAO
+from dao.user_audit_dao import UserAuditDAO
+from models.driver import Driver
+from models.karma_daily import KarmaDaily, KARMA_ACTIONS
+from models.parking_spot import ParkingSpot, parking_spot_driver_association
+from models.queue import Queue
+from models.reservation import Reservation
+from models.user_audit import UserAudit, UserActionType
+from services.achievement_service import PERIOD_IN_DAYS, TRACKED_ACTIONS, period_start
+
+SPOTS = 74
+DRIVERS = 200
+AUDIT_DAYS = 90
+AUDIT_PER_DAY = 300
+
+# "SCAN table" без индекса - полный проход по таблице (алиасы SQLAlchemy вида table_1 приводим к имени таблицы)
+FULL_SCAN = re.compile(r"^SCAN (\w+?)(?:_\d+)?(?: LEFT-JOIN)?$")
+# подзапросы, которые SQLite сам материализует во временную таблицу: их проход не считается
+MATERIALIZED = re.compile(r"^(?:MATERIALIZE|CO-ROUTINE) (\w+)$")
+
+
+async def seed():
+    random.seed(1)
+    today = date.today()
+    async with db_pool() as session:
+        await session.execute(insert(ParkingSpot), [
+            {"id": i, "x": i * 10, "y": 0, "width": 49, "height": 99} for i in range(1, SPOTS + 1)])
+        await session.execute(insert(Driver), [
+            {"id": i, "chat_id": -i, "title": f"Водитель {i}", "description": f"Водитель {i}",
+             "enabled": i % 10 != 0, "karma": random.randint(0, 100),
+             "absent_until": today + timedelta(days=random.randint(-30, 5)), "attributes": {}}
+            for i in range(1, DRIVERS + 1)])
+        await session.execute(parking_spot_driver_association.insert(), [
+            {"parking_spot_id": (i - 1) % SPOTS + 1, "driver_id": i} for i in range(1, DRIVERS + 1)])
+        await session.execute(insert(Reservation), [
+            {"driver_id": i, "day_of_week": day, "parking_spot_id": (i + day) % SPOTS + 1}
+            for i in range(1, DRIVERS + 1) for day in range(5) if random.random() < 0.3])
+        await session.execute(insert(Queue), [
+            {"driver_id": i, "created": datetime.now() - timedelta(minutes=i)} for i in range(1, 30)])
+        audit = []
+        for day in range(AUDIT_DAYS):
+            current_day = today - timedelta(days=day)
+            for _ in range(AUDIT_PER_DAY):
+                audit.append({"action_time": datetime.combine(current_day, datetime.min.time()),
+                              "current_day": current_day, "driver_id": random.randint(1, DRIVERS),
+                              "action": random.choice(list(UserActionType)), "num": random.randint(-5, 5)})
+        await session.execute(insert(UserAudit), audit)
+        await session.execute(insert(KarmaDaily), [
+            {"driver_id": i, "day": today - timedelta(days=day), "action": action,
+             "positive_sum": 1, "negative_sum": 0}
+            for i in range(1, DRIVERS + 1) for day in range(0, AUDIT_DAYS, 3) for action in KARMA_ACTIONS[:2]])
+        await session.commit()
+
+
+def checks(session):
+    """
+    Проверяемые запросы: (название, вызов DAO, таблицы, которые можно читать целиком).
+    Места (74 строки) - ведущая таблица большинства запросов по парковке, их полный проход допустим.
+    """
+    today = date.today()
+    return [
+        ("ParkingSpotDAO.get_free_spots",
+         lambda: ParkingSpotDAO(session).get_free_spots(today.weekday(), today), {"parkingspots"}),
+        ("ParkingSpotDAO.get_lot_rows", lambda: ParkingSpotDAO(session).get_lot_rows(today), {"parkingspots"}),
+        ("ParkingSpotDAO.get_all", lambda: ParkingSpotDAO(session).get_all(), {"parkingspots"}),
+        ("ReservationDAO.get_by_day", lambda: ReservationDAO(session).get_by_day(today), set()),
+        ("ReservationDAO.get_by_spot_and_day_of_week",
+         lambda: ReservationDAO(session).get_by_spot_and_day_of_week(5, today.weekday()), set()),
+        ("UserAuditDAO.get_actions_by_period",
+         lambda: UserAuditDAO(session).get_actions_by_period(7, PERIOD_IN_DAYS, today), set()),
+        ("UserAuditDAO.get_actions_since",
+         lambda: UserAuditDAO(session).get_actions_since(period_start(today), TRACKED_ACTIONS), set()),
+        ("QueueDAO.get_all", lambda: QueueDAO(session).get_all(), set()),
+        ("QueueDAO.get_entries", lambda: QueueDAO(session).get_entries(), set()),
+        ("StatusDAO.get_driver_row", lambda: StatusDAO(session).get_driver_row(7, today), set()),
+        ("StatusDAO.get_spot_rows", lambda: StatusDAO(session).get_spot_rows(7, today), {"parkingspots"}),
+        ("DriverDAO.get_active_partner_drivers",
+         lambda: DriverDAO(session).get_active_partner_drivers(7, today), set()),
+        ("DriverDAO.get_top_karma_drivers", lambda: DriverDAO(session).get_top_karma_drivers(10), set()),
+        ("KarmaDailyDAO.get_top",
+         lambda: KarmaDailyDAO(session).get_top(KARMA_ACTIONS, today - timedelta(days=7), today, 10), set()),
+    ]
+
+
+async def main(verbose: bool) -> int:
+    await create_database()
+    await seed()
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    failed = 0
+    async with db_pool() as session:
+        for name, call, allowed_scans in checks(session):
+            statements.clear()
+            await call()
+            captured = list(statements)
+            conn = await session.connection()
+            problems = []
+            plans = []
+            for statement, parameters in captured:
+                rows = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()
+                plans.append([row[3] for row in rows])
+                subqueries = {m.group(1) for m in map(MATERIALIZED.match, plans[-1]) if m}
+                for detail in plans[-1]:
+                    match = FULL_SCAN.match(detail)
+                    if match and match.group(1) not in allowed_scans and detail.split()[1] not in subqueries:
+                        problems.append(detail)
+            status = "FAIL" if problems else "ok"
+            print(f"{status:4} {name}" + (f": {'; '.join(problems)}" if problems else ""))
+            if verbose or problems:
+                for plan in plans:
+                    for detail in plan:
+                        print(f"       {detail}")
+            failed += bool(problems)
+    event.remove(engine.sync_engine, "before_cursor_execute", capture)
+    await engine.dispose()
+    return failed
+
+
+if __name__ == "__main__":
+    failed_count = asyncio.run(main("-v" in sys.argv))
+    sys.exit(1 if failed_count else 0)
@@ -0,0 +1,141 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import constants
+from dao.achievement_progress_dao import AchievementProgressDAO
+from dao.user_audit_dao import UserAuditDAO
+from models.user_audit import UserActionType
+
+PERIOD_IN_DAYS = 30
+
+# Действия за день, из которых берется последнее (занял/освободил место, встал/вышел из очереди)
+DAY_ACTIONS = (UserActionType.TAKE_SPOT, UserActionType.RELEASE_SPOT,
+               UserActionType.JOIN_QUEUE, UserActionType.LEAVE_QUEUE)
+TRACKED_ACTIONS = DAY_ACTIONS + (UserActionType.DRAW_KARMA, UserActionType.GAME_KARMA, UserActionType.SHOP_KARMA)
+RACE_FEE = 5
+
+
+def period_start(current_day: date) -> date:
+    """Первый день периода ачивок для current_day: более ранние дни не учитываются и не хранятся."""
+    return current_day - timedelta(days=PERIOD_IN_DAYS)
+
+
+def is_tracked(action: UserActionType, num: int | None) -> bool:
+    if action == UserActionType.GAME_KARMA:
+        return num == -RACE_FEE
+    if action == UserActionType.SHOP_KARMA:
+        return num is not None and num < 0
+    return action in TRACKED_ACTIONS
+
+
+def add_action(days: dict, current_day: date, action: UserActionType, num: int | None, action_time: datetime):
+    """Добавляет действие из аудита в данные ачивок (days: {"2025-05-01": {...}, ...})."""
+    if not is_tracked(action, num):
+        return
+    day = days.setdefault(current_day.isoformat(), {})
+    if action in DAY_ACTIONS and (action_time.hour >= constants.new_day_begin_hour or action_time.hour < 14):
+        day["last"] = action.name
+    if action == UserActionType.LEAVE_QUEUE:
+        day["leave_queue"] = 1
+    elif action == UserActionType.TAKE_SPOT and num is not None:
+        spots = day.setdefault("spots", [])
+        if num not in spots:
+            spots.append(num)
+    elif action == UserActionType.DRAW_KARMA and num is not None:
+        day.setdefault("draws", []).append(num)
+    elif action == UserActionType.GAME_KARMA:
+        day["races"] = day.get("races", 0) + 1
+    elif action == UserActionType.SHOP_KARMA:
+        day["spent"] = day.get("spent", 0) - num
+        day["purchases"] = day.get("purchases", 0) + 1
+
+
+def prune(days: dict, current_day: date):
+    """Удаляет дни, которые уже не попадают в период ачивок."""
+    start = period_start(current_day).isoformat()
+    for key in [key for key in days if key < start]:
+        del days[key]
+
+
+def get_values(days: dict, current_day: date) -> dict[str, int]:
+    """Значения ачивок за PERIOD_IN_DAYS дней до current_day (сам current_day не входит)."""
+    start = period_start(current_day).isoformat()
+    end = current_day.isoformat()
+    period = [days[key] for key in sorted(days) if start <= key < end]
+    last = [day.get("last") for day in period]
+    draws = [num for day in period for num in day.get("draws", [])]
+    return {
+        "regular": last.count(UserActionType.TAKE_SPOT.name),
+        "generous_soul": last.count(UserActionType.RELEASE_SPOT.name),
+        "stoic": sum(1 for action in last if action in (UserActionType.JOIN_QUEUE.name,
+                                                        UserActionType.LEAVE_QUEUE.name)),
+        "racer": sum(day.get("races", 0) for day in period),
+        "traveler": len(set(spot for day in period for spot in day.get("spots", []))),
+        "rainbow_fortune": max_unique_length(draws),
+        "repeat_karma": max_consecutive_length(draws),
+        "queue_expert": sum(day.get("leave_queue", 0) for day in period),
+        "expensive": sum(day.get("spent", 0) for day in period),
+        "shopaholic": sum(day.get("purchases", 0) for day in period),
+    }
+
+
+def max_unique_length(nums):
+    max_len = 0
+    current_set = set()
+    left = 0
+    right = 0
+    n = len(nums)
+    while right < n:
+        if nums[right] not in current_set:
+            current_set.add(nums[right])
+            right += 1
+            max_len = max(max_len, right - left)
+        else:
+            current_set.remove(nums[left])
+            left += 1
+    return max_len
+
+
+def max_consecutive_length(nums):
+    if not nums:
+        return 0
+
+    max_length = 1
+    current_length = 1
+
+    for i in range(1, len(nums)):
+        if nums[i] == nums[i - 1]:
+            current_length += 1
+            if current_length > max_length:
+                max_length = current_length
+        else:
+            current_length = 1
+
+    return max_length
+
+
+class AchievementService:
+    """
+    Ачивки считаются по таблице achievement_progress (одна строка на водителя),
+    которая дополняется при каждой записи аудита (см. audit_writer).
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.dao = AchievementProgressDAO(session)
+        self.audit_dao = UserAuditDAO(session)
+
+    async def get_values(self, driver_id: int, current_day: date) -> dict[str, int]:
+        return get_values(await self.dao.get_days(driver_id), current_day)
+
+    async def rebuild(self, current_day: date) -> int:
+        """Пересчитывает achievement_progress по аудиту за период. Возвращает количество водителей."""
+        actions = await self.audit_dao.get_actions_since(period_start(current_day), TRACKED_ACTIONS)
+        progress = defaultdict(dict)
+        for a in actions:
+            add_action(progress[a.driver_id], a.current_day, a.action, a.num, a.action_time)
+        await self.dao.delete_all()
+        for driver_id, days in progress.items():
+            await self.dao.save_days(driver_id, days)
+        return len(progress)
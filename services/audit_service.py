@@ -1,22 +1,37 @@
-from datetime import date
+from datetime import date, datetime, timedelta
 from typing import Sequence
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from config import constants
+from dao.karma_daily_dao import KarmaDailyDAO
 from dao.user_audit_dao import UserAuditDAO
+from models.karma_daily import KARMA_ACTIONS
 from models.user_audit import UserActionType, UserAudit
+from services.audit_writer import audit_writer
 
 
 class AuditService:
     def __init__(self, session: AsyncSession):
+        self.session = session
         self.dao = UserAuditDAO(session)
+        self.karma_daily_dao = KarmaDailyDAO(session)
 
     async def log_action(self, driver_id: int, action: UserActionType, current_day: date, num: int = None,
                          description: str = None):
-        return await self.dao.create(driver_id, action, current_day, num, description)
+        await audit_writer.add(self.session, {"driver_id": driver_id,
+                                              "action": action,
+                                              "current_day": current_day,
+                                              "num": num,
+                                              "description": description,
+                                              "action_time": datetime.now()})
 
     async def get_weekly_karma(self, limit: int, sign: int = 0, act: str = ''):
-        return await self.dao.get_weekly_karma(limit, sign, act)
+        actions = (UserActionType[act],) if act else KARMA_ACTIONS
+        # последние 7 дней без текущего (день меняется в new_day_begin_hour), как и раньше в SQL-запросе
+        start = date.today() - timedelta(days=7)
+        end = (datetime.now() + timedelta(hours=constants.new_day_offset)).date()
+        return await self.karma_daily_dao.get_top(actions, start, end, limit, sign, excluded_id=1)
 
     async def get_actions_by_period(self, driver_id: int, period_in_days: int, current_day: date) -> Sequence[
         UserAudit]:
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from dao.achievement_progress_dao import select_days, progress_upsert, ensure_rows
+from dao.karma_daily_dao import karma_daily_upsert
+from models.karma_daily import KARMA_ACTIONS
+from models.user_audit import UserAudit
+from services.achievement_service import add_action, prune, is_tracked
+
+logger = logging.getLogger(__name__)
+
+# request - пишем все записи запроса одним insert при коммите его сессии (по умолчанию);
+# queue - копим записи всех запросов и пишем пачкой раз в AUDIT_FLUSH_SECONDS;
+# sync - пишем и коммитим каждую запись сразу (для тестов и отладки)
+AUDIT_MODE = os.getenv("AUDIT_MODE", "request")
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "2"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+# Сколько раз подряд пробуем записать пачку, если БД недоступна, и сколько записей держим в очереди
+AUDIT_MAX_RETRIES = int(os.getenv("AUDIT_MAX_RETRIES", "5"))
+AUDIT_MAX_QUEUE = int(os.getenv("AUDIT_MAX_QUEUE", "10000"))
+PENDING_KEY = "audit_records"
+
+
+def write_records(session: Session, records: list[dict]):
+    """
+    Сохраняет пачку записей аудита: один insert в user_audit, дневные суммы кармы и данные ачивок.
+    Вызывается в синхронной сессии (run_sync или событие before_commit).
+    """
+    if not records:
+        return
+    session.execute(insert(UserAudit), records)
+
+    karma = defaultdict(lambda: [0, 0])
+    for r in records:
+        if r["action"] in KARMA_ACTIONS and r["num"] is not None:
+            sums = karma[(r["driver_id"], r["current_day"], r["action"])]
+            sums[0 if r["num"] > 0 else 1] += r["num"]
+    if karma:
+        session.execute(karma_daily_upsert([{"driver_id": driver_id, "day": day, "action": action,
+                                             "positive_sum": positive, "negative_sum": negative}
+                                            for (driver_id, day, action), (positive, negative) in karma.items()]))
+
+    tracked = [r for r in records if is_tracked(r["action"], r["num"])]
+    if tracked:
+        # читаем days под блокировкой строк: слияние идет в Python, и без нее параллельная запись
+        # аудита того же водителя из другого процесса потерялась бы при upsert
+        driver_ids = {r["driver_id"] for r in tracked}
+        session.execute(ensure_rows(driver_ids))
+        progress = {row.driver_id: row.days
+                    for row in session.execute(select_days(driver_ids, for_update=True))}
+        for r in tracked:
+            days = progress.setdefault(r["driver_id"], {})
+            add_action(days, r["current_day"], r["action"], r["num"], r["action_time"])
+            prune(days, r["current_day"])
+        session.execute(progress_upsert({r["driver_id"]: progress[r["driver_id"]] for r in tracked}))
+
+
+def _flush_pending(session: Session):
+    records = session.info.pop(PENDING_KEY, None)
+    if records:
+        write_records(session, records)
+
+
+def _drop_pending(session: Session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+
+
+class AuditWriter:
+    """
+    Буферизованная запись аудита. Режим задается AUDIT_MODE.
+    """
+
+    def __init__(self, mode: str = AUDIT_MODE, flush_seconds: float = AUDIT_FLUSH_SECONDS,
+                 batch_size: int = AUDIT_BATCH_SIZE):
+        self.mode = mode
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.queue: list[dict] = []
+        self.session_pool = None
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._stopping = False
+        self._failures = 0
+
+    async def add(self, session, record: dict):
+        if self.mode == "sync":
+            await session.run_sync(write_records, [record])
+            await session.commit()
+        elif self.mode == "queue" and self._task is not None:
+            if len(self.queue) >= AUDIT_MAX_QUEUE:
+                logger.error(f"Очередь аудита переполнена, запись отброшена: {self.queue.pop(0)}")
+            self.queue.append(record)
+            if len(self.queue) >= self.batch_size:
+                self._wakeup.set()
+        else:
+            # Запишется в той же транзакции при ближайшем коммите сессии (при откате - пропадет вместе с ней)
+            pending = session.info.get(PENDING_KEY)
+            if pending is None:
+                pending = session.info[PENDING_KEY] = []
+                if not event.contains(session.sync_session, "before_commit", _flush_pending):
+                    event.listen(session.sync_session, "before_commit", _flush_pending)
+                    event.listen(session.sync_session, "after_soft_rollback", _drop_pending)
+            pending.append(record)
+
+    def start(self, session_pool):
+        """Запускает фоновую запись для режима queue."""
+        self.session_pool = session_pool
+        if self.mode == "queue" and self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def _write(self, records: list[dict]) -> bool:
+        try:
+            async with self.session_pool() as session:
+                await session.run_sync(write_records, records)
+                await session.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"Не удалось записать {len(records)} записей аудита: {e}")
+            return False
+
+    async def flush(self):
+        while self.queue:
+            records, self.queue = self.queue[:self.batch_size], self.queue[self.batch_size:]
+            if await self._write(records):
+                self._failures = 0
+                continue
+            # Пачка не записалась: пишем по одной, чтобы одна плохая запись (например, удаленный водитель)
+            # не блокировала остальные
+            failed = [r for r in records if not await self._write([r])]
+            if len(failed) < len(records):
+                for r in failed:
+                    logger.error(f"Запись аудита отброшена: {r}")
+                self._failures = 0
+                continue
+            # Не записалась ни одна - скорее всего, недоступна БД: попробуем еще раз при следующей записи
+            self._failures += 1
+            if self._failures >= AUDIT_MAX_RETRIES:
+                logger.error(f"Отброшено {len(records)} записей аудита после {self._failures} попыток: {records}")
+                self._failures = 0
+                continue
+            self.queue[:0] = records
+            return
+
+    async def shutdown(self):
+        """Останавливает фоновую запись и сохраняет все, что накопилось."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        # flush либо продвигается, либо копит неудачные попытки, пока не отбросит пачку
+        while self.queue:
+            await self.flush()
+            if self.queue:
+                await asyncio.sleep(1)
+
+
+audit_writer = AuditWriter()
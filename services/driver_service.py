@@ -1,14 +1,16 @@
 from datetime import date
 
-from sqlalchemy import Sequence
+from sqlalchemy import Sequence, event
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from dao.driver_dao import DriverDAO
 from models.driver import Driver
+from utils.driver_cache import DriverIdentity, driver_cache
 
 
 class DriverService:
     def __init__(self, session: AsyncSession):
+        self.session = session
         self.dao = DriverDAO(session)
 
     async def register_driver(self, chat_id: int, username: str, title: str, desc: str) -> Driver:
@@ -25,6 +27,26 @@ class DriverService:
     async def get_by_chat_id(self, chat_id: int):
         return await self.dao.get_by_chat_id(chat_id)
 
+    async def get_identity(self, chat_id: int) -> (DriverIdentity | None, Driver | None):
+        """
+        Данные водителя для проверок: из кэша или из БД.
+        Если пришлось читать БД, вторым значением возвращается загруженный водитель.
+        """
+        found, identity = driver_cache.get(chat_id)
+        if found:
+            return identity, None
+        driver = await self.dao.get_by_chat_id(chat_id)
+        identity = DriverIdentity.from_driver(driver) if driver else None
+        driver_cache.put(chat_id, identity)
+        return identity, driver
+
+    async def set_enabled(self, driver: Driver, enabled: bool):
+        driver.enabled = enabled
+        chat_id = driver.chat_id
+        driver_cache.invalidate(chat_id)
+        # Пока изменение не закоммичено, другой запрос может снова положить в кэш старое значение
+        event.listen(self.session.sync_session, "after_commit", lambda _: driver_cache.invalidate(chat_id), once=True)
+
     async def get_by_id(self, id: int):
         return await self.dao.get_by_id(id)
 
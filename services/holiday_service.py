@@ -1,23 +1,92 @@
+import asyncio
+import json
 import logging
-from datetime import date
+import os
+from datetime import date, datetime, timedelta
 
-import requests
+import aiohttp
+
+from dao.holiday_dao import HolidayDAO
 
 logger = logging.getLogger(__name__)
-BASE_URL = "https://calendar.kuzyak.in/api/calendar/"  # 2025/05/02
+BASE_URL = os.getenv("HOLIDAYS_BASE_URL", "https://calendar.kuzyak.in/api/calendar/")  # 2025/05/02
+# На сколько дней вперед заполняем календарь и через сколько дней перепроверяем уже загруженные дни
+HOLIDAYS_DAYS_AHEAD = int(os.getenv("HOLIDAYS_DAYS_AHEAD", "365"))
+HOLIDAYS_REFRESH_DAYS = int(os.getenv("HOLIDAYS_REFRESH_DAYS", "30"))
+HOLIDAYS_TIMEOUT = float(os.getenv("HOLIDAYS_TIMEOUT", "10"))
+HOLIDAYS_CONCURRENCY = 4
+
+
+def weekday_rule(day: date) -> (bool, str):
+    """Если в календаре нет данных: будни - рабочие, суббота и воскресенье - выходные."""
+    is_working_day = day.weekday() < 5
+    return is_working_day, "Рабочий день" if is_working_day else "Выходной"
 
 
 class HolidayService:
-    def __init__(self):
-        pass
+    """
+    Производственный календарь хранится в таблице holidays и заполняется фоновой задачей,
+    поэтому смена дня не ждет ответа внешнего сервиса.
+    """
+
+    def __init__(self, session):
+        self.dao = HolidayDAO(session)
 
     async def get_day_info(self, day: date) -> (bool, str):
-        try:
-            response = requests.get(BASE_URL + day.strftime("%Y/%m/%d"))
-            data = response.json()
-            logger.debug(f"{data}")
-            is_working_day = data.get("isWorkingDay", True)  # вернет None, если ключа нет
-            holiday = data.get("holiday", "Рабочий день" if is_working_day else "Выходной")
-            return is_working_day, holiday
-        except:
-            return True, "Тяжелый день"
+        holiday = await self.dao.get_by_day(day)
+        if holiday is None:
+            logger.warning(f"Нет данных календаря на {day}, используем правило будни/выходные")
+            return weekday_rule(day)
+        return holiday.is_working_day, holiday.name
+
+    async def refresh(self, start: date = None, days_ahead: int = HOLIDAYS_DAYS_AHEAD) -> int:
+        """
+        Загружает из внешнего сервиса дни [start, start + days_ahead), которых нет в таблице или которые давно
+        не обновлялись. Возвращает количество сохраненных дней.
+        """
+        start = start or date.today()
+        end = start + timedelta(days=days_ahead)
+        fresh = set(await self.dao.get_fresh_days(start, end,
+                                                  datetime.now() - timedelta(days=HOLIDAYS_REFRESH_DAYS)))
+        days = [start + timedelta(days=i) for i in range(days_ahead) if start + timedelta(days=i) not in fresh]
+        if not days:
+            return 0
+
+        semaphore = asyncio.Semaphore(HOLIDAYS_CONCURRENCY)
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=HOLIDAYS_TIMEOUT)) as http:
+            async def fetch(day: date) -> dict | None:
+                async with semaphore:
+                    try:
+                        async with http.get(BASE_URL + day.strftime("%Y/%m/%d")) as response:
+                            response.raise_for_status()
+                            data = await response.json(content_type=None)
+                    except Exception as e:
+                        logger.warning(f"Не удалось получить данные календаря на {day}: {e!r}")
+                        return None
+                is_working_day = data.get("isWorkingDay", True)
+                return {"day": day,
+                        "is_working_day": is_working_day,
+                        "name": data.get("holiday", "Рабочий день" if is_working_day else "Выходной")}
+
+            rows = [row for row in await asyncio.gather(*(fetch(day) for day in days)) if row]
+
+        await self.dao.upsert_many(rows)
+        logger.info(f"Календарь обновлен: {len(rows)} из {len(days)} дней")
+        return len(rows)
+
+    async def load_from_file(self, path: str) -> int:
+        """
+        Загружает календарь из JSON-файла (например, для работы без сети):
+        [{"day": "2025-01-01", "is_working_day": false, "name": "Новый год"}, ...]
+        """
+        with open(path, encoding="utf-8") as f:
+            items = json.load(f)
+        rows = []
+        for item in items:
+            is_working_day = bool(item["is_working_day"])
+            rows.append({"day": date.fromisoformat(item["day"]),
+                         "is_working_day": is_working_day,
+                         "name": item.get("name") or ("Рабочий день" if is_working_day else "Выходной")})
+        await self.dao.upsert_many(rows)
+        logger.info(f"Календарь загружен из {path}: {len(rows)} дней")
+        return len(rows)
@@ -0,0 +1,57 @@
+from datetime import date
+from typing import Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dao.driver_dao import DriverDAO
+from models.user_audit import UserActionType
+from services.audit_service import AuditService
+
+
+class KarmaService:
+    """
+    Все изменения кармы: атомарный UPDATE в БД и запись в аудит в одной транзакции (коммитится сразу),
+    поэтому параллельные начисления и списания не теряются и не требуют общих блокировок.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.dao = DriverDAO(session)
+        self.audit_service = AuditService(session)
+
+    async def apply(self, driver_id: int, delta: int, action: UserActionType, current_day: date,
+                    description: str | Callable[[int], str] = None,
+                    min_karma: int = None, floor: int = None) -> int | None:
+        """
+        Меняет карму водителя на delta и пишет аудит.
+        description может быть функцией от новой кармы (чтобы написать "стало ...").
+        :return: новая карма или None, если списание не прошло проверку min_karma
+        """
+        karma = await self.dao.add_karma(driver_id, delta, min_karma, floor)
+        if karma is None:
+            return None
+        if callable(description):
+            description = description(karma)
+        await self.audit_service.log_action(driver_id, action, current_day, delta, description)
+        await self.session.commit()
+        return karma
+
+    async def spend(self, driver_id: int, amount: int, action: UserActionType, current_day: date,
+                    description: str | Callable[[int], str] = None) -> int | None:
+        """Списывает карму, только если ее хватает. Возвращает остаток или None."""
+        return await self.apply(driver_id, -amount, action, current_day, description, min_karma=0)
+
+    async def transfer(self, from_id: int, to_id: int, cost: int, price: int, action: UserActionType,
+                       current_day: date, from_description: str = None, to_description: str = None) -> int | None:
+        """
+        Списывает cost у покупателя и начисляет price продавцу в одной транзакции.
+        :return: остаток покупателя или None, если кармы не хватило
+        """
+        karma = await self.dao.add_karma(from_id, -cost, min_karma=0)
+        if karma is None:
+            return None
+        await self.dao.add_karma(to_id, price)
+        await self.audit_service.log_action(from_id, action, current_day, -cost, from_description)
+        await self.audit_service.log_action(to_id, action, current_day, price, to_description)
+        await self.session.commit()
+        return karma
@@ -0,0 +1,84 @@
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, FSInputFile, InputFile, Message
+
+from dao.media_file_dao import MediaFileDAO
+
+logger = logging.getLogger(__name__)
+
+# Хэши статических файлов: путь -> (mtime, размер, хэш), чтобы не перечитывать файл на каждую отправку
+_file_hashes: dict[str, tuple[float, int, str]] = {}
+
+
+def bytes_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    stat = os.stat(path)
+    cached = _file_hashes.get(path)
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
+    with open(path, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    _file_hashes[path] = (stat.st_mtime, stat.st_size, content_hash)
+    return content_hash
+
+
+def get_file_id(message: Message | bool) -> str | None:
+    """file_id отправленного медиа из ответа Telegram."""
+    if not isinstance(message, Message):
+        return None
+    if message.photo:
+        return message.photo[-1].file_id
+    media = message.animation or message.video or message.document
+    return media.file_id if media else None
+
+
+class MediaService:
+    """
+    Реестр загруженных в Telegram файлов: одинаковое содержимое загружается один раз,
+    дальше отправляется по сохраненному file_id.
+    """
+
+    def __init__(self, session):
+        self.dao = MediaFileDAO(session)
+
+    async def send(self, name: str, send: Callable[[str | InputFile], Awaitable[Message | bool]],
+                   data: bytes | None = None, path: str | None = None) -> Message | bool:
+        """
+        Отправляет медиа через send (получает file_id или файл для загрузки).
+        Содержимое передается либо байтами (data), либо путем к файлу (path).
+        """
+        if path is not None:
+            content_hash = file_hash(path)
+            # файл на диске мог измениться: старые file_id для этого пути больше не годятся
+            await self.dao.delete_other_versions(name, content_hash)
+        else:
+            content_hash = bytes_hash(data)
+
+        media = await self.dao.get_by_hash(content_hash)
+        if media:
+            try:
+                result = await send(media.file_id)
+                await self.dao.touch(media)
+                return result
+            except TelegramBadRequest as e:
+                if "file" not in e.message.lower():
+                    raise
+                logger.warning(f"file_id для {name} больше не действителен: {e}")
+                await self.dao.delete_by_hash(content_hash)
+
+        result = await send(FSInputFile(path) if path is not None else BufferedInputFile(data, filename=name))
+        file_id = get_file_id(result)
+        if file_id:
+            await self.dao.save(name, content_hash, file_id)
+        return result
+
+    async def delete_unused(self, days: int = 30) -> int:
+        return await self.dao.delete_unused(datetime.now() - timedelta(days=days))
@@ -1,23 +1,188 @@
+import logging
+import os
+import time
+import uuid
+
+from sqlalchemy import event
+
 from dao.param_dao import ParamDAO
 
+logger = logging.getLogger(__name__)
+
+# Если бот запущен в нескольких процессах, раз в столько секунд сверяем версию параметров в БД (0 - не сверяем).
+# Для нескольких процессов на одной БД обязательно > 0 (например, 30): иначе параметры, измененные
+# в другом процессе, не будут видны до его перезапуска
+PARAMS_CHECK_SECONDS = float(os.getenv("PARAMS_CHECK_SECONDS", "0"))
+VERSION_KEY = "_params_version"
+PENDING_KEY = "param_updates"
+
+
+def parse_int(value: str) -> int | None:
+    try:
+        return int(value.strip())
+    except ValueError:
+        logger.warning(f"Параметр '{value}' не является числом")
+        return None
+
+
+def parse_bool(value: str) -> bool:
+    return value.strip().lower() in ("yes", "true", "t", "1")
+
+
+def parse_id_set(value: str) -> frozenset[int]:
+    ids = set()
+    for item in value.split(','):
+        try:
+            ids.add(int(item.strip()))
+        except ValueError:
+            pass
+    return frozenset(ids)
+
+
+class ParamCache:
+    """
+    Все параметры app_params в памяти процесса и уже разобранные типизированные значения.
+    """
+
+    def __init__(self):
+        self.values: dict[str, str] | None = None
+        self.parsed: dict[tuple, object] = {}
+        self.version: str | None = None
+        self.checked_at = 0.0
+
+    def load(self, values: dict[str, str]):
+        self.values = values
+        self.parsed = {}
+        self.version = values.get(VERSION_KEY)
+        self.checked_at = time.monotonic()
+
+    def apply(self, updates: dict[str, str | None]):
+        if self.values is None:
+            return
+        for key, value in updates.items():
+            if value is None:
+                self.values.pop(key, None)
+            else:
+                self.values[key] = value
+            if key == VERSION_KEY:
+                self.version = value
+        self.parsed = {k: v for k, v in self.parsed.items() if k[0] not in updates}
+
+    def invalidate(self):
+        self.values = None
+        self.parsed = {}
+
+
+param_cache = ParamCache()
+
+
+def _apply_pending(session):
+    pending = session.info.get(PENDING_KEY)
+    if pending:
+        param_cache.apply(pending)
+        pending.clear()
+
+
+def _drop_pending(session):
+    pending = session.info.get(PENDING_KEY)
+    if pending:
+        pending.clear()
+
 
 class ParamService:
+    """
+    Параметры читаются из кэша (загружается целиком одним запросом).
+    Запись идет в БД, а в общий кэш попадает после коммита; до коммита изменения видны только в этой сессии.
+    """
+
     def __init__(self, session):
+        self.session = session
         self.param_dao = ParamDAO(session)
 
+    async def _values(self) -> dict[str, str]:
+        if param_cache.values is None or await self._version_changed():
+            params = await self.param_dao.get_all_params()
+            param_cache.load({p.key: p.value for p in params})
+        return param_cache.values
+
+    async def _version_changed(self) -> bool:
+        if PARAMS_CHECK_SECONDS <= 0 or time.monotonic() - param_cache.checked_at < PARAMS_CHECK_SECONDS:
+            return False
+        param_cache.checked_at = time.monotonic()
+        version = await self.param_dao.get_param(VERSION_KEY)
+        return (version.value if version else None) != param_cache.version
+
+    def _pending(self) -> dict[str, str | None]:
+        return self.session.info.get(PENDING_KEY, {})
+
+    def _stage(self, key: str, value: str | None):
+        pending = self.session.info.get(PENDING_KEY)
+        if pending is None:
+            pending = self.session.info[PENDING_KEY] = {}
+            event.listen(self.session.sync_session, "after_commit", _apply_pending)
+            event.listen(self.session.sync_session, "after_rollback", _drop_pending)
+        pending[key] = value
+
+    async def _bump_version(self):
+        if PARAMS_CHECK_SECONDS > 0:
+            version = uuid.uuid4().hex
+            await self.param_dao.set_param(VERSION_KEY, version)
+            self._stage(VERSION_KEY, version)
+
     async def get_parameter(self, key: str, default: str = None) -> str | None:
-        param = await self.param_dao.get_param(key)
-        return param.value if param else default
+        pending = self._pending()
+        value = pending[key] if key in pending else (await self._values()).get(key)
+        return default if value is None else value
+
+    async def _get_parsed(self, key: str, parser, default):
+        pending = self._pending()
+        if key in pending:
+            value = pending[key]
+            parsed = parser(value) if value is not None else None
+        else:
+            values = await self._values()
+            cache_key = (key, parser)
+            if cache_key not in param_cache.parsed:
+                value = values.get(key)
+                param_cache.parsed[cache_key] = parser(value) if value is not None else None
+            parsed = param_cache.parsed[cache_key]
+        return default if parsed is None else parsed
+
+    async def get_int(self, key: str, default: int = 0) -> int:
+        return await self._get_parsed(key, parse_int, default)
+
+    async def get_bool(self, key: str, default: bool = False) -> bool:
+        return await self._get_parsed(key, parse_bool, default)
+
+    async def get_admin_ids(self) -> frozenset[int]:
+        return await self._get_parsed("admins", parse_id_set, frozenset())
 
     async def set_parameter(self, key: str, value: str, description: str = None) -> str:
+        self._stage(key, value)
         await self.param_dao.set_param(key, value, description)
+        await self._bump_version()
         return f"Параметр {key} успешно обновлен"
 
+    async def claim_parameter(self, key: str, value: str) -> bool:
+        """
+        Меняет параметр, только если в БД другое значение. Из нескольких процессов бота True
+        получает только один: он и выполняет работу, связанную со сменой значения (например, смену дня).
+        """
+        if await self.param_dao.claim_param(key, value):
+            self._stage(key, value)
+            await self._bump_version()
+            return True
+        # значение уже записал другой процесс: перечитаем параметры из БД
+        param_cache.invalidate()
+        return False
+
     async def delete_parameter(self, key: str) -> str:
         if await self.param_dao.delete_param(key):
+            self._stage(key, None)
+            await self._bump_version()
             return f"Параметр {key} удален"
         return f"Параметр {key} не найден"
 
     async def list_parameters(self) -> dict:
-        params = await self.param_dao.get_all_params()
-        return {p.key: p.value for p in params}
+        values = {**(await self._values()), **self._pending()}
+        return {key: value for key, value in values.items() if value is not None and key != VERSION_KEY}
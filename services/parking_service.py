@@ -1,10 +1,13 @@
+from dataclasses import replace
 from datetime import date
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from dao.parking_spot_dao import ParkingSpotDAO
+from dao.queue_dao import QueueDAO
 from models.driver import Driver
-from services.reservation_service import ReservationService
+from utils.cars_generator import cars_count
+from utils.render_snapshot import LotSnapshot, SpotSnapshot, QueueEntrySnapshot
 
 
 class ParkingService:
@@ -15,16 +18,32 @@ class ParkingService:
     async def get_all_spots(self):
         return await self.dao.get_all()
 
-    async def get_spots_with_reservations(self, day: date):
-        spots = await self.dao.get_all()
-        reservations_data = dict()
-
-        reservations = await ReservationService(self.session).get_by_day(day)
-        if reservations:
-            for reservation in reservations:
-                reservations_data.setdefault(reservation.parking_spot_id, []).append(reservation)
-
-        return spots, reservations_data
+    async def get_lot_snapshot(self, day: date, with_current_driver: bool = True,
+                               with_queue: bool = True) -> LotSnapshot:
+        """
+        Места, машинки текущих водителей и брони на день одним запросом (плюс очередь вторым)
+        в виде неизменяемых записей, которые можно передать в процесс отрисовки.
+        """
+        spots = {}
+        for row in await self.dao.get_lot_rows(day):
+            spot = spots.get(row.id)
+            if spot is None:
+                car_index = None
+                if with_current_driver and row.current_driver_id is not None:
+                    car_index = row.current_driver_id % cars_count if row.car_index is None else row.car_index
+                spot = spots[row.id] = SpotSnapshot(id=row.id, x=row.x, y=row.y, width=row.width, height=row.height,
+                                                    status=row.status,
+                                                    current_driver_id=row.current_driver_id,
+                                                    car_index=car_index)
+            if row.reserved_id is not None:
+                spots[row.id] = replace(spot, reserved_by=spot.reserved_by + (row.reserved_id,))
+
+        queue = ()
+        if with_queue:
+            queue = tuple(QueueEntrySnapshot(driver_id=row.driver_id, description=row.description,
+                                             spot_id=row.spot_id, choose_before=row.choose_before)
+                          for row in await QueueDAO(self.session).get_entries())
+        return LotSnapshot(spots=tuple(spots.values()), queue=queue)
 
     async def clear_statuses(self):
         await self.dao.clear_statuses()
@@ -87,7 +87,7 @@ class QueueService:
             await self.raffle_off_spot_among_filtered_queue(bot, now, spot, queue, spots, queue)
 
     async def raffle_off_spot_among_filtered_queue(self, bot, now, spot, filtered_queue, spots, queue):
-        add_weight_karma = int(await ParamService(self.session).get_parameter("add_weight_karma", "0"))
+        add_weight_karma = await ParamService(self.session).get_int("add_weight_karma", 0)
         while spot in spots and filtered_queue:
             # Выбираем случайного человека из очереди и случайное свободное место
             q = random.choices(filtered_queue, weights=[
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.cars_generator import render_carousel, render_start_race_track, render_race_chunk, concat_race_chunks
+from utils.game_race_utils import RaceResult
+from utils.map_generator import render_parking_map, warm_up, choose_variant
+from utils.render_cache import map_cache
+from utils.render_snapshot import MapSnapshot, PlayerSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Количество процессов для отрисовки и таймауты (в секундах)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "3"))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", "30"))
+RENDER_VIDEO_TIMEOUT = float(os.getenv("RENDER_VIDEO_TIMEOUT", "600"))
+# Видео заезда делится на RENDER_VIDEO_WORKERS частей, и одновременно рисуется не больше RENDER_VIDEO_SLOTS частей
+# (всех заездов вместе). По умолчанию слотов на один меньше, чем процессов: карта и карусель не ждут за частями
+# видео и укладываются в RENDER_TIMEOUT. Поэтому процессов по умолчанию 3 (две части видео параллельно + один
+# свободный). При RENDER_WORKERS=2 части видео рисуются по очереди; RENDER_VIDEO_SLOTS=2 ускорит видео,
+# но на время заезда /map будет ждать
+RENDER_VIDEO_SLOTS = int(os.getenv("RENDER_VIDEO_SLOTS", str(max(1, RENDER_WORKERS - 1))))
+RENDER_VIDEO_WORKERS = int(os.getenv("RENDER_VIDEO_WORKERS", str(RENDER_VIDEO_SLOTS)))
+
+
+class RenderService:
+    """
+    Выполняет отрисовку картинок и видео (PIL, moviepy) в пуле процессов,
+    чтобы не блокировать event loop бота.
+    В процессы передаются только простые данные (снимки состояния), обратно возвращаются байты.
+    """
+
+    def __init__(self, max_workers: int = RENDER_WORKERS, timeout: float = RENDER_TIMEOUT,
+                 video_slots: int = RENDER_VIDEO_SLOTS):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = None
+        self._pending = 0
+        # сколько частей видео (всех заездов вместе) могут одновременно занимать процессы пула
+        self._video_slots = asyncio.Semaphore(max(1, video_slots))
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество задач, которые ждут или выполняются в пуле."""
+        return self._pending
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=warm_up)
+            logger.info(f"Пул отрисовки запущен: {self.max_workers} процесс(а)")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _job_done(self, loop: asyncio.AbstractEventLoop):
+        # колбэк future пула вызывается в его служебном потоке: счетчик меняем в потоке event loop
+        try:
+            loop.call_soon_threadsafe(self._decrement_pending)
+        except RuntimeError:  # event loop уже закрыт
+            pass
+
+    def _decrement_pending(self):
+        self._pending -= 1
+
+    async def _run(self, name: str, timeout: float | None, func, *args):
+        """
+        Выполняет func в пуле. Таймаут только перестает ждать результат: задача, которую процесс пула
+        уже начал, дорисовывается до конца и до этого момента учитывается в queue_depth.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        job = self._executor.submit(func, *args)
+        self._pending += 1
+        job.add_done_callback(lambda _: self._job_done(loop))
+        logger.debug(f"Отрисовка {name}: в очереди {self._pending}")
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job), timeout=timeout or self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Отрисовка {name} не уложилась в {timeout or self.timeout} сек. (в очереди {self._pending})")
+            raise
+
+    async def parking_map(self, snapshot: MapSnapshot) -> bytes:
+        """
+        Карта парковки. Если такая же картинка уже рисовалась (те же статусы, водители, брони,
+        зритель, погода, кадр мусоровоза и вариант случайных деталей), отдаем её из кэша.
+        """
+        snapshot = choose_variant(snapshot)
+        if snapshot.lightning:
+            # вспышка молнии - редкий кадр: в кэш его не кладем, иначе она застынет на всех следующих картах
+            return await self._run("parking_map", None, render_parking_map, snapshot)
+        key = map_cache.fingerprint(snapshot)
+        img = map_cache.get(key)
+        if img is None:
+            img = await self._run("parking_map", None, render_parking_map, snapshot)
+            map_cache.put(key, img)
+        return img
+
+    async def carousel(self, current_index: int, cars_count_for_driver: int) -> bytes:
+        return await self._run("carousel", None, render_carousel, current_index, cars_count_for_driver)
+
+    async def start_race_track(self, players: list[PlayerSnapshot], track_length: int) -> bytes:
+        return await self._run("start_race_track", None, render_start_race_track, players, track_length)
+
+    async def race_video(self, race: RaceResult, players: list[PlayerSnapshot], chat_id: int,
+                         video_workers: int = RENDER_VIDEO_WORKERS) -> bytes:
+        """
+        Видео заезда: кадры делятся на части, части рисуются параллельно и склеиваются по порядку.
+        """
+        chunks = split_frames(race.frame_count, video_workers)
+        parts = await asyncio.gather(*(
+            self._run_video(f"race_video [{start}, {end})", render_race_chunk, race, players, chat_id, start, end)
+            for start, end in chunks))
+        if len(parts) == 1:
+            return parts[0]
+        return await self._run_video("race_video concat", concat_race_chunks, parts)
+
+    async def _run_video(self, name: str, func, *args):
+        """Задача видео: ждет свободный слот, чтобы в пуле всегда оставался процесс для интерактивной отрисовки."""
+        async with self._video_slots:
+            return await self._run(name, RENDER_VIDEO_TIMEOUT, func, *args)
+
+
+def split_frames(frame_count: int, parts: int) -> list[tuple[int, int]]:
+    """
+    Делит кадры [0, frame_count) на parts почти равных непрерывных частей.
+    """
+    parts = max(1, min(parts, frame_count))
+    bounds = [frame_count * i // parts for i in range(parts + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(parts)]
+
+
+render_service = RenderService()
@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dao.status_dao import StatusDAO
+from models.parking_spot import SpotStatus
+
+
+def spot_info_text(status: SpotStatus | None, current_title: str | None, is_woman: bool,
+                   reserved_titles: tuple[str, ...] | list[str]) -> str:
+    """Описание состояния места: кто занял/освободил и чья была бронь."""
+    if len(reserved_titles) < 1:
+        res = "Свободно"
+        res_old = "не было брони"
+    else:
+        res = "Бронь у " + ', '.join(reserved_titles)
+        res_old = "была бронь у " + ', '.join(reserved_titles)
+
+    a = 'а' if is_woman else ''
+    if status == SpotStatus.OCCUPIED:
+        return f"Занял{a} {current_title} ({res_old})"
+    elif status == SpotStatus.OCCUPIED_WITHOUT_DEMAND:
+        return f"Занял{a} {current_title}! ({res_old})"
+    elif status == SpotStatus.FREE:
+        return f"Освободил{a} {current_title or ''} ({res_old})"
+    return res
+
+
+@dataclass(frozen=True)
+class SpotView:
+    """Место на экране статуса."""
+    id: int
+    status: SpotStatus | None
+    current_driver_id: int | None
+    current_title: str | None = None
+    current_is_woman: bool = False
+    reserved_ids: tuple[int, ...] = ()
+    reserved_titles: tuple[str, ...] = ()
+
+    def is_occupied(self) -> bool:
+        return self.status in (SpotStatus.OCCUPIED, SpotStatus.OCCUPIED_WITHOUT_DEMAND)
+
+    def info(self) -> str:
+        return spot_info_text(self.status, self.current_title, self.current_is_woman, self.reserved_titles)
+
+
+@dataclass(frozen=True)
+class StatusView:
+    """
+    Все данные экрана статуса водителя на день (без ORM), собранные двумя запросами.
+    """
+    id: int
+    chat_id: int
+    title: str
+    description: str
+    enabled: bool
+    absent_until: date | None
+    karma: int
+    plus: int
+    in_queue: bool
+    has_reservation: bool  # у водителя есть своя бронь на этот день недели
+    my_spots: tuple[SpotView, ...] = ()
+    occupied_spots: tuple[SpotView, ...] = ()
+
+    def is_absent(self, day: date) -> bool:
+        return (self.absent_until is not None) and (self.absent_until > day)
+
+
+class StatusService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.dao = StatusDAO(session)
+
+    async def get_status(self, driver_id: int, day: date) -> StatusView | None:
+        # autoflush выключен: несохраненные изменения водителя должны попасть в запросы
+        await self.session.flush()
+        row = await self.dao.get_driver_row(driver_id, day)
+        if row is None:
+            return None
+
+        # строки приходят по одной на бронь: собираем брони каждого места
+        spots = {}
+        for spot in await self.dao.get_spot_rows(driver_id, day):
+            _, reserved = spots.setdefault(spot.id, (spot, []))
+            if spot.reserved_id is not None:
+                reserved.append(spot)
+
+        views = []
+        for spot, reserved in spots.values():
+            attributes = spot.current_attributes or {}
+            views.append((spot.is_mine, SpotView(
+                id=spot.id, status=spot.status, current_driver_id=spot.current_driver_id,
+                current_title=spot.current_title,
+                current_is_woman=attributes.get("gender", "M") == "F",
+                reserved_ids=tuple(r.reserved_id for r in reserved),
+                reserved_titles=tuple(r.reserved_title for r in reserved))))
+        return StatusView(
+            id=row.id, chat_id=row.chat_id, title=row.title, description=row.description,
+            enabled=bool(row.enabled), absent_until=row.absent_until,
+            karma=row.karma or 0, plus=-1 if row.plus is None else row.plus,
+            in_queue=bool(row.in_queue), has_reservation=bool(row.has_reservation),
+            my_spots=tuple(spot for is_mine, spot in views if is_mine and spot.status != SpotStatus.HIDDEN),
+            occupied_spots=tuple(spot for is_mine, spot in views
+                                 if spot.current_driver_id == row.id and spot.is_occupied()))
@@ -1,15 +1,22 @@
+import asyncio
 import logging
 import os
+import time
 from datetime import date
 
-import requests
+import aiohttp
 from aiogram.utils.formatting import Bold, Italic, Code
 
 logger = logging.getLogger(__name__)
 
 API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
 CITY = "Saint Petersburg,RU"
-BASE_URL = "http://api.openweathermap.org/data/2.5/forecast"
+# Адрес можно подменить (например, на локальный тестовый сервер)
+BASE_URL = os.getenv("WEATHER_BASE_URL", "http://api.openweathermap.org/data/2.5/forecast")
+# Сколько секунд прогноз считается свежим, таймаут запроса и сколько ждать обновления устаревшего прогноза
+WEATHER_TTL = int(os.getenv("WEATHER_TTL", "1800"))
+WEATHER_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", "5"))
+WEATHER_STALE_WAIT = float(os.getenv("WEATHER_STALE_WAIT", "1"))
 params = {
     "q": CITY,
     "appid": API_KEY,
@@ -29,23 +36,94 @@ weather_map = {
 }
 
 
+class ForecastClient:
+    """
+    Клиент OpenWeatherMap: одна HTTP-сессия на всё приложение и кэш разобранного прогноза.
+    Свежий прогноз отдается из кэша, устаревший обновляется в фоне: если API отвечает медленно,
+    пользователь получает прошлый прогноз, а не ждет.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, ttl: float = WEATHER_TTL, timeout: float = WEATHER_TIMEOUT,
+                 stale_wait: float = WEATHER_STALE_WAIT):
+        self.base_url = base_url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.stale_wait = stale_wait
+        self._session: aiohttp.ClientSession | None = None
+        self._data: dict | None = None
+        self._fetched_at = 0.0
+        self._refresh_task: asyncio.Task | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                                  connector=aiohttp.TCPConnector(limit=4))
+        return self._session
+
+    async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _fetch(self):
+        try:
+            query = {key: value for key, value in params.items() if value is not None}
+            async with self._get_session().get(self.base_url, params=query) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+            if "list" not in data:
+                raise ValueError(f"неожиданный ответ: {data}")
+            logger.debug(f"{data}")
+            self._data = data
+            self._fetched_at = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Не удалось получить прогноз погоды: {e!r}")
+
+    def _refresh(self) -> asyncio.Task:
+        # Одновременно идет не больше одного запроса к API
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch())
+        return self._refresh_task
+
+    async def get_forecast(self) -> dict | None:
+        if self._data is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return self._data
+
+        task = self._refresh()
+        try:
+            # Без прогноза в кэше ждем ответа (не дольше таймаута сессии), с устаревшим - совсем недолго
+            await asyncio.wait_for(asyncio.shield(task), None if self._data is None else self.stale_wait)
+        except asyncio.TimeoutError:
+            logger.info("Сервис погоды отвечает медленно, используем прошлый прогноз")
+        return self._data
+
+
+forecast_client = ForecastClient()
+
+
 class WeatherService:
-    def __init__(self):
-        pass
+    def __init__(self, client: ForecastClient = forecast_client):
+        self.client = client
+
+    async def get_forecast_list(self) -> list:
+        data = await self.client.get_forecast()
+        if data is None:
+            raise ConnectionError("Сервис погоды недоступен")
+        return data["list"]
 
     async def get_weather_test(self, day: date) -> (str, dict, str):
         return "+25°", {"icon": "☀", "sun_alpha": 120}, "тест"
 
     async def get_weather_string(self, day: date) -> (str, dict, str):
         try:
-            response = requests.get(BASE_URL, params=params)
-            data = response.json()
-            logger.debug(f"{data}")
+            forecast_list = await self.get_forecast_list()
             day_request = day.strftime("%Y-%m-%d")
             temp = ""
             weather = dict()
             desc = ""
-            for forecast in data["list"]:
+            for forecast in forecast_list:
                 date = forecast["dt_txt"].split()[0]
                 if date == day_request:
                     time = forecast["dt_txt"].split()[1][:5]
@@ -64,12 +142,10 @@ class WeatherService:
         is_ok = False
         content = Bold(f"Погода на {day.strftime('%a %d.%m.%Y')}:")
         try:
-            response = requests.get(BASE_URL, params=params)
-            data = response.json()
-            logger.debug(f"{data}")
+            forecast_list = await self.get_forecast_list()
             day_request = day.strftime("%Y-%m-%d")
 
-            for forecast in data["list"]:
+            for forecast in forecast_list:
                 date = forecast["dt_txt"].split()[0]
                 if date == day_request:
                     is_ok = True
@@ -88,13 +164,11 @@ class WeatherService:
         is_ok = False
         content = Bold("Погода на неделю:\n\n")
         try:
-            response = requests.get(BASE_URL, params=params)
-            data = response.json()
-            logger.debug(f"Weekly data: {data}")
+            forecast_list = await self.get_forecast_list()
 
             # Группируем прогнозы по датам
             forecast_by_date = {}
-            for forecast in data["list"]:
+            for forecast in forecast_list:
                 day_str = forecast["dt_txt"].split()[0]
                 if day_str not in forecast_by_date:
                     forecast_by_date[day_str] = []
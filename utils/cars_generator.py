@@ -1,14 +1,19 @@
 import io
 import logging
+import os
 import random
-from collections import Counter
+import subprocess
+import tempfile
+from functools import lru_cache
 
 import numpy as np
 from PIL import Image, ImageDraw, ImageOps, ImageFilter, ImageFont
-from moviepy import ImageSequenceClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
 
-from utils.game_race_utils import GameState
-from utils.weather_generator import make_sun_glare_layer, get_clouds_layer, add_edge_fade_mask, make_rain_layer
+from utils.game_race_utils import RaceResult
+from utils.weather_generator import make_sun_glare_layer, add_edge_fade_mask, get_rain_layer, get_cloud_layer, \
+    make_lightning
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +23,11 @@ extra_cars_count = 29
 regular_font = ImageFont.truetype("ariali.ttf", 40)
 car_w, car_h = (100, 50)
 finish_block_size = 5
+race_track_length = 1800
+# Банк кадров дождя для участков трассы строится на высоту трассы с 12 полосами (максимум игроков),
+# участок вырезается из него: плотность дождя не зависит от числа игроков
+RACE_RAIN_BANK_HEIGHT = 12 * 70
+RACE_RAIN_DROPS = 1200
 
 
 def reduce_opacity(image: Image.Image, opacity: float) -> Image.Image:
@@ -108,12 +118,86 @@ def generate_carousel_image(current_index: int, cars_count_for_driver: int) -> i
     return bio
 
 
+def render_carousel(current_index: int, cars_count_for_driver: int) -> bytes:
+    """
+    Точка входа для процесса отрисовки: PNG карусели аватаров.
+    """
+    return generate_carousel_image(current_index, cars_count_for_driver).getvalue()
+
+
+def render_start_race_track(players, track_length: int) -> bytes:
+    """
+    Точка входа для процесса отрисовки: PNG трассы с машинами на старте.
+    """
+    track = draw_start_race_track(players, bg_color=(120, 120, 120), track_length=track_length)
+    img_buffer = io.BytesIO()
+    track.save(img_buffer, format="PNG")
+    return img_buffer.getvalue()
+
+
+def render_race_chunk(race: RaceResult, players, chat_id: int, start: int, end: int) -> bytes:
+    """
+    Точка входа для процесса отрисовки: MP4 с кадрами заезда [start, end).
+    """
+    with tempfile.NamedTemporaryFile(prefix=f"race_{chat_id}_{start}_", suffix=".mp4", delete=False) as f:
+        video_path = f.name
+    try:
+        create_race_video(race, players, output_path=video_path, start=start, end=end)
+        with open(video_path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(video_path)
+
+
+def concat_race_chunks(chunks: list[bytes]) -> bytes:
+    """
+    Точка входа для процесса отрисовки: склеивает части видео (по порядку) без перекодирования.
+    """
+    with tempfile.TemporaryDirectory(prefix="race_") as tmp_dir:
+        list_path = os.path.join(tmp_dir, "chunks.txt")
+        with open(list_path, "w") as list_file:
+            for idx, chunk in enumerate(chunks):
+                chunk_path = os.path.join(tmp_dir, f"chunk_{idx}.mp4")
+                with open(chunk_path, "wb") as f:
+                    f.write(chunk)
+                list_file.write(f"file '{chunk_path}'\n")
+        output_path = os.path.join(tmp_dir, "race.mp4")
+        subprocess.run([FFMPEG_BINARY, "-y", "-loglevel", "error",
+                        "-f", "concat", "-safe", "0", "-i", list_path,
+                        "-c", "copy", "-movflags", "faststart", output_path],
+                       check=True, capture_output=True)
+        with open(output_path, "rb") as f:
+            return f.read()
+
+
+@lru_cache(maxsize=None)
 def get_car(current_index):
-    current_index = current_index
+    """
+    Спрайт машины из cars3.png. Спрайт общий для всех вызовов - изменять его можно только в копии.
+    """
     return extract_sprite(cars3, (50 * (current_index % 12), 100 * (current_index // 12),
                                   50 * (1 + (current_index % 12)), 100 * (1 + (current_index // 12))))
 
 
+@lru_cache(maxsize=None)
+def get_car_sprite(car_index: int, scale: float = 1.0, rotation: int = 0):
+    """
+    Атлас машин: спрайт с нужным масштабом и поворотом и его размытая тень.
+    Строится при первом обращении, дальше машину остается только вставить в кадр.
+    """
+    car = get_car(car_index)
+    if scale != 1:
+        car = car.resize((int(car.width * scale), int(car.height * scale)))
+    if rotation:
+        car = car.rotate(rotation, expand=True)
+    return car, make_shadow(car)
+
+
+def paste_car(frame, car_index: int, car_x, car_y, scale: float = 1.0, rotation: int = 0):
+    car, shadow = get_car_sprite(car_index, scale, rotation)
+    draw_car_with_shadow(car, frame, car_x, car_y, shadow)
+
+
 def extract_sprite(sprite_sheet, sprite_rect):
     """
     Извлекает спрайт из спрайт-листа.
@@ -198,140 +282,90 @@ def draw_start_race_track(players, lane_height=70, track_length=800,
                           bg_color=bg_color)
     for idx, player in enumerate(players):
         y = idx * 70 + (70 - car_h) // 2
-        car = get_car(player.attributes.get("car_index", player.id % cars_count))
-        car = car.rotate(270, expand=True)
-        draw_car_with_shadow(car, img, 0, y)
+        paste_car(img, player.car_index, 0, y, rotation=270)
     return img
 
 
-def create_race_gif(game_state: GameState, players, chat_id: int, output_path='race.gif', frame_count=50, duration=100):
+def create_race_video(race: RaceResult, players, output_path='race.mp4', fps=60, start=0, end=None):
     """
-    Создаёт GIF с "гонкой" машин по нарисованной трассе.
-
-    :param output_path: куда сохранить итоговый GIF
-    :param frame_count: число кадров в анимации
-    :param duration: длительность одного кадра в миллисекундах
+    Создаёт MP4 с "гонкой" машин по нарисованной трассе по результатам simulate_race.
+    Кадры отдаются кодировщику сразу после отрисовки и в памяти не накапливаются.
+
+    :param race: результат симуляции заезда
+    :param output_path: куда сохранить итоговое видео
+    :param fps: частота кадров
+    :param start: первый кадр (для отрисовки заезда по частям)
+    :param end: кадр, на котором остановиться (по умолчанию - до конца заезда)
     """
-    # Загружаем изображения машин
-    lane_count = len(players)
+    if end is None:
+        end = race.frame_count
+    # Облака и молнии тоже зависят от seed заезда: видео можно воспроизвести повторно.
+    # Облака одинаковые во всех частях видео, молнии у каждой части свои
+    rain_rng = random.Random(f"{race.seed}:{start}")
 
     # Рисуем фон — трассу
     track = draw_race_track(players=players,
                             lane_height=70,
                             bg_color=(120, 120, 120),
-                            track_length=1800).convert('RGBA')
-    max_x = float(track.width - car_w)
-    # Различные базовые скорости для разнообразия гонки
-    speed_factors = [1.0 for _ in range(lane_count)]
-    base_speeds = [(max_x + car_w) / frame_count * f for f in speed_factors]
-    # погодный фактор скорости
-    weather_factor = [-1001.0 for _ in range(lane_count)]
-    positions = [0.0] * lane_count
-    np_frames = []
-    winners = list()
-    frames = []
-    seg_count = 3
-    type_segs = get_weather_for_segments(seg_count, game_state, players)
+                            track_length=race_track_length).convert('RGBA')
+    type_segs = race.type_segs
+    seg_count = len(type_segs)
     logger.info(f"Type segments: {type_segs}")
     sunny_segs = [idx for idx, t in enumerate(type_segs) if t == 2]
     sun_layer = make_sun_glare_layer((track.width, track.height), max_alpha=100)
     sun_layer = add_edge_fade_mask(sun_layer, sunny_segs, seg_count=seg_count)
     track = Image.alpha_composite(track, sun_layer)
-    cloud_layer = get_clouds_layer(track)
+    cloud_layer = get_cloud_layer(track.size, 15, race.seed)
     cloudy_segs = [idx for idx, t in enumerate(type_segs) if t != 2]
     cloud_layer = add_edge_fade_mask(cloud_layer, cloudy_segs, seg_count=seg_count)
-    for _ in range(frame_count):
-        frame = track.copy()
-        step_winners = []
-        for idx in range(0, lane_count):
-            car = get_car(players[idx].attributes.get("car_index", players[idx].id % cars_count))
-            car = car.rotate(270, expand=True)
-            part_before = int(seg_count * positions[idx] // max_x)
-            positions[idx] = positions[idx] + base_speeds[idx]
-            x = int(positions[idx])
-            part_after = int(seg_count * positions[idx] // max_x)
-            if part_before != part_after or weather_factor[idx] < -1000.0:
-                wheels = players[idx].attributes.get("wheels", 0)
-                seg = -1 if part_after >= len(type_segs) else type_segs[part_after]
-                min_w = 0
-                max_w = 0
-                if seg == 0:
-                    min_w, max_w = (0.15, 0.4) if wheels == 0 else (0.0, 0.1) if wheels == 1 else (0.05, 0.2)
-                elif seg == 1:
-                    min_w, max_w = (0.05, 0.2) if wheels == 0 else (0.4, 0.8) if wheels == 1 else (0.0, 0.05)
-                elif seg == 2:
-                    min_w, max_w = (0.05, 0.2) if wheels == 0 else (0.0, 0.05) if wheels == 1 else (0.3, 0.7)
-                weather_factor[idx] = random.uniform(min_w, max_w)
-                speed_factors[idx] += part_after * random.uniform(0.0, 0.02)
-                base_speeds[idx] = (max_x + car_w) * (speed_factors[idx] + weather_factor[idx]) / frame_count
-            # Вертикаль: центрируем машину в своей полосе
-            y = idx * 70 + (70 - car_h) // 2
-            draw_car_with_shadow(car, frame, x, y)
-            if positions[idx] >= max_x - finish_block_size * 2:
-                draw_car_with_shadow(car, frame, 0, y)
-                if idx not in winners:
-                    step_winners.append((idx, positions[idx]))
-
-        # Накладываем слои
-        for rainy_seg in [idx for idx, t in enumerate(type_segs) if t == 1]:
-            seg, seg_x = get_frame_segment(frame, rainy_seg, seg_count)
-            seg = make_rain_layer(seg)
-            frame.paste(seg, (seg_x, 0))
-
-        frame = Image.alpha_composite(frame, cloud_layer)
-
-        [winners.append(t[0]) for t in sorted(step_winners, key=lambda x: x[1], reverse=True)]
-        # Для GIF конвертируем в P-палитру
-        frames.append(frame.convert('P'))
-        np_frames.append(np.asarray(frame))
-
-    # Сохраняем в GIF
-    frames[0].save(
-        output_path,
-        save_all=True,
-        append_images=frames[1:],
-        duration=duration,
-        loop=0
-    )
-    clip = ImageSequenceClip(np_frames, fps=60)
-    clip.write_videofile(
-        f"race_{chat_id}.mp4",
-        codec="libx264",
-        ffmpeg_params=["-movflags", "faststart"],
-        audio=False
-    )
-    return winners
-
-
-def get_weather_for_segments(seg_count, game_state: GameState, players):
-    result = []
-    # цикл от 1 до 2 включительно
-    for i in range(1, 3):
-        # получаем погоду на i сегменте и добавляем в результат
-        result.append(random.choices([0, 1, 2], weights=game_state.weather.get(str(i)), k=1)[0])
-
-    # Для последнего сегмента выберем подходящую погоду для наименее популярных колес(шин)
-    lst = [p.attributes.get("wheels", 0) for p in players]
-    # Считаем частоту каждого числа
-    counts = Counter(lst)
-    # Находим минимальную частоту
-    min_freq = min(counts.values())
-    # Собираем все числа с этой частотой
-    least_common = [num for num, freq in counts.items() if freq == min_freq]
-    # Выбираем случайно одно из них
-    result.append(random.choice(least_common))
-
-    return result
-
-
-def draw_car_with_shadow(car_image, frame, car_x, car_y):
+    rainy_segs = [idx for idx, t in enumerate(type_segs) if t == 1]
+    writer = FFMPEG_VideoWriter(output_path, track.size, fps,
+                                codec="libx264",
+                                ffmpeg_params=["-movflags", "faststart"])
+    try:
+        for frame_index in range(start, end):
+            positions = race.positions[frame_index]
+            frame = track.copy()
+            for idx, x in enumerate(positions):
+                car, shadow = get_car_sprite(players[idx].car_index, 1.0, 270)
+                # Вертикаль: центрируем машину в своей полосе
+                y = idx * 70 + (70 - car_h) // 2
+                draw_car_with_shadow(car, frame, x, y, shadow)
+                finish_frame = race.finish_frames[idx]
+                if finish_frame is not None and frame_index >= finish_frame:
+                    draw_car_with_shadow(car, frame, 0, y, shadow)
+
+            # Накладываем слои
+            for rainy_seg in rainy_segs:
+                seg_size, seg_x = get_segment_box(frame, rainy_seg, seg_count)
+                # кадры дождя из банка крутятся по кругу, у соседних участков - со сдвигом
+                frame.alpha_composite(get_rain_layer(seg_size, RACE_RAIN_DROPS, frame_index + rainy_seg * 3,
+                                                     bank_height=RACE_RAIN_BANK_HEIGHT), (seg_x, 0))
+                # Молния с небольшой вероятностью
+                if rain_rng.random() < 0.01:
+                    frame.alpha_composite(make_lightning(seg_size, rain_rng), (seg_x, 0))
+
+            frame = Image.alpha_composite(frame, cloud_layer)
+
+            # Кадр сразу уходит в кодировщик
+            writer.write_frame(np.asarray(frame.convert('RGB')))
+    finally:
+        writer.close()
+
+
+def make_shadow(car_image):
     # Создаем тень
     shadow = Image.new("RGBA", car_image.size, (0, 0, 0, 0))
     shadow.putalpha(car_image.split()[3])
     shadow = ImageOps.colorize(shadow.convert("L"), black="black", white="black")
     shadow.putalpha(car_image.split()[3])
     blur_radius = 10  # радиус размытия тени
-    shadow = shadow.filter(ImageFilter.GaussianBlur(blur_radius))
+    return shadow.filter(ImageFilter.GaussianBlur(blur_radius))
+
+
+def draw_car_with_shadow(car_image, frame, car_x, car_y, shadow=None):
+    if shadow is None:
+        shadow = make_shadow(car_image)
 
     # Смещаем тень относительно машины
     shadow_position = (car_x + 5, car_y + 5)
@@ -341,11 +375,11 @@ def draw_car_with_shadow(car_image, frame, car_x, car_y):
     frame.paste(car_image, (car_x, car_y), car_image)
 
 
-def get_frame_segment(frame, segment_index, seg_count):
+def get_segment_box(frame, segment_index, seg_count):
+    """Размер участка трассы и его смещение по x."""
     w, h = frame.size
     seg_w = w // seg_count
-    seg_x = seg_w * segment_index
-    return frame.crop((seg_x, 0, seg_x + seg_w, h)), seg_x
+    return (seg_w, h), seg_w * segment_index
 
 
 if __name__ == "__main__":
@@ -360,14 +394,14 @@ if __name__ == "__main__":
     )
 
 
+    from utils.game_race_utils import GameState, simulate_race
+    from utils.render_snapshot import PlayerSnapshot
+
+
     # Пример: 5 полос
-    class Player:
-        def __init__(self, title, wheels: int):
-            self.title = title
-            self.id = random.randint(1, 24)
-            self.attributes = dict()
-            self.attributes["wheels"] = wheels
-            self.attributes["car_index"] = self.id
+    def Player(title, wheels: int):
+        player_id = random.randint(1, 24)
+        return PlayerSnapshot(id=player_id, title=title, car_index=player_id, wheels=wheels)
 
 
     players = [Player("Alice", 0), Player("Bob", 0), Player("Charlie", 0),
@@ -377,10 +411,10 @@ if __name__ == "__main__":
     game_state = GameState({"1": [10, 0, 0], "2": [0, 10, 0]})
     for p in players:
         game_state.add_player(p)
-    winners = create_race_gif(game_state, players, 3, frame_count=400, duration=2)
-    print(winners)
+    race = simulate_race(game_state, players, seed=random.randrange(2 ** 31),
+                         track_length=race_track_length, car_width=car_w, finish_width=finish_block_size * 2)
+    create_race_video(race, players, output_path="race_3.mp4")
+    print(race.winners)
     # track = draw_start_race_track(players, bg_color=(120, 120, 120))
-    # # rain = make_rain_layer(track)
-    # # track = Image.alpha_composite(track, rain)
     # track.save("race_track2.png")
     # track.show()
@@ -0,0 +1,70 @@
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from models.driver import Driver
+
+# Сколько секунд и для скольких пользователей помним, кто зарегистрирован и активен
+DRIVER_CACHE_TTL = float(os.getenv("DRIVER_CACHE_TTL", "60"))
+DRIVER_CACHE_SIZE = int(os.getenv("DRIVER_CACHE_SIZE", "1000"))
+
+
+@dataclass(frozen=True)
+class DriverIdentity:
+    """
+    Минимум данных о водителе для проверок в middleware (без загрузки связей).
+    """
+    id: int
+    chat_id: int
+    enabled: bool
+    title: str | None
+
+    @classmethod
+    def from_driver(cls, driver: Driver) -> "DriverIdentity":
+        return cls(id=driver.id, chat_id=driver.chat_id, enabled=bool(driver.enabled), title=driver.title)
+
+
+class DriverCache:
+    """
+    LRU-кэш chat_id -> DriverIdentity (или None, если пользователь не зарегистрирован) с ограниченным временем жизни.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: OrderedDict[int, tuple[float, DriverIdentity | None]] = OrderedDict()
+
+    def get(self, chat_id: int) -> (bool, DriverIdentity | None):
+        """Возвращает (найдено ли в кэше, данные водителя)."""
+        item = self._items.get(chat_id)
+        if item is None:
+            return False, None
+        expires, identity = item
+        if expires < time.monotonic():
+            del self._items[chat_id]
+            return False, None
+        self._items.move_to_end(chat_id)
+        return True, identity
+
+    def put(self, chat_id: int, identity: DriverIdentity | None):
+        if self.ttl <= 0:
+            return
+        self._items[chat_id] = (time.monotonic() + self.ttl, identity)
+        self._items.move_to_end(chat_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def invalidate(self, chat_id: int):
+        self._items.pop(chat_id, None)
+
+    def invalidate_driver(self, driver_id: int):
+        for chat_id, (_, identity) in list(self._items.items()):
+            if identity is not None and identity.id == driver_id:
+                del self._items[chat_id]
+
+    def clear(self):
+        self._items.clear()
+
+
+driver_cache = DriverCache(DRIVER_CACHE_TTL, DRIVER_CACHE_SIZE)
@@ -1,4 +1,6 @@
 import random
+from collections import Counter
+from dataclasses import dataclass
 
 from models.driver import Driver
 
@@ -46,6 +48,102 @@ class GameState:
         self.wheels[player.id] = wheels
 
 
+@dataclass(frozen=True)
+class RaceResult:
+    """
+    Результат симуляции заезда: по нему рисуется видео и начисляются призы.
+    """
+    seed: int
+    type_segs: tuple[int, ...]  # погода на участках трассы: 0 - облачно, 1 - дождь, 2 - солнце
+    positions: tuple[tuple[int, ...], ...]  # координата x каждой машины на каждом кадре
+    finish_frames: tuple[int | None, ...]  # кадр, на котором машина пересекла финиш
+    winners: tuple[int, ...]  # индексы игроков в порядке финиша
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.positions)
+
+
+def simulate_race(game_state: GameState, players, seed: int, frame_count: int = 400,
+                  track_length: int = 1800, car_width: int = 100, finish_width: int = 10,
+                  seg_count: int = 3) -> RaceResult:
+    """
+    Проводит заезд без отрисовки. При одинаковых seed и участниках результат всегда одинаковый.
+
+    :param players: участники (нужны поля wheels), порядок задает полосы
+    :param seed: зерно генератора случайных чисел
+    """
+    rng = random.Random(seed)
+    lane_count = len(players)
+    max_x = float(track_length - car_width)
+    # Различные базовые скорости для разнообразия гонки
+    speed_factors = [1.0 for _ in range(lane_count)]
+    base_speeds = [(max_x + car_width) / frame_count * f for f in speed_factors]
+    # погодный фактор скорости
+    weather_factor = [-1001.0 for _ in range(lane_count)]
+    positions = [0.0] * lane_count
+    type_segs = get_weather_for_segments(seg_count, game_state, players, rng)
+
+    frames = []
+    finish_frames = [None] * lane_count
+    winners = []
+    for frame_index in range(frame_count):
+        step_winners = []
+        for idx in range(lane_count):
+            part_before = int(seg_count * positions[idx] // max_x)
+            positions[idx] = positions[idx] + base_speeds[idx]
+            part_after = int(seg_count * positions[idx] // max_x)
+            if part_before != part_after or weather_factor[idx] < -1000.0:
+                wheels = players[idx].wheels
+                seg = -1 if part_after >= len(type_segs) else type_segs[part_after]
+                min_w = 0
+                max_w = 0
+                if seg == 0:
+                    min_w, max_w = (0.15, 0.4) if wheels == 0 else (0.0, 0.1) if wheels == 1 else (0.05, 0.2)
+                elif seg == 1:
+                    min_w, max_w = (0.05, 0.2) if wheels == 0 else (0.4, 0.8) if wheels == 1 else (0.0, 0.05)
+                elif seg == 2:
+                    min_w, max_w = (0.05, 0.2) if wheels == 0 else (0.0, 0.05) if wheels == 1 else (0.3, 0.7)
+                weather_factor[idx] = rng.uniform(min_w, max_w)
+                speed_factors[idx] += part_after * rng.uniform(0.0, 0.02)
+                base_speeds[idx] = (max_x + car_width) * (speed_factors[idx] + weather_factor[idx]) / frame_count
+            if positions[idx] >= max_x - finish_width:
+                if finish_frames[idx] is None:
+                    finish_frames[idx] = frame_index
+                if idx not in winners:
+                    step_winners.append((idx, positions[idx]))
+
+        winners.extend(t[0] for t in sorted(step_winners, key=lambda x: x[1], reverse=True))
+        frames.append(tuple(int(p) for p in positions))
+
+    return RaceResult(seed=seed,
+                      type_segs=tuple(type_segs),
+                      positions=tuple(frames),
+                      finish_frames=tuple(finish_frames),
+                      winners=tuple(winners))
+
+
+def get_weather_for_segments(seg_count, game_state: GameState, players, rng=random):
+    result = []
+    # цикл от 1 до 2 включительно
+    for i in range(1, 3):
+        # получаем погоду на i сегменте и добавляем в результат
+        result.append(rng.choices([0, 1, 2], weights=game_state.weather.get(str(i)), k=1)[0])
+
+    # Для последнего сегмента выберем подходящую погоду для наименее популярных колес(шин)
+    lst = [p.wheels for p in players]
+    # Считаем частоту каждого числа
+    counts = Counter(lst)
+    # Находим минимальную частоту
+    min_freq = min(counts.values())
+    # Собираем все числа с этой частотой
+    least_common = [num for num, freq in counts.items() if freq == min_freq]
+    # Выбираем случайно одно из них
+    result.append(rng.choice(least_common))
+
+    return result
+
+
 def generate_game_with_weather_forecast():
     """
     Для двух сегментов генерируем случайный прогноз погоды и создаем новое состояние игры "Гонки"
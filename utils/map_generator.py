@@ -1,13 +1,16 @@
+import io
+import os
 import random
-from datetime import date
+from dataclasses import replace
+from functools import lru_cache
 
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
 
-from models.driver import Driver
-from models.parking_spot import ParkingSpot, SpotStatus
-from services.weather_service import WeatherService
-from utils.cars_generator import get_car, draw_car_with_shadow, cars_count
-from utils.weather_generator import make_sun_glare_layer, make_rain_layer, get_clouds_layer
+from models.parking_spot import SpotStatus
+from utils.cars_generator import paste_car, get_car_sprite, cars_count, extra_cars_count
+from utils.render_snapshot import MapSnapshot, SpotSnapshot
+from utils.weather_generator import make_sun_glare_layer, make_lightning, get_rain_layer, get_cloud_layer, \
+    RAIN_FRAMES, CLOUD_VARIANTS
 
 # Цвета для разных статусов
 COLORS = {
@@ -40,8 +43,14 @@ dx = 0
 dy = 0
 d_width = -1
 
+# Сколько вариантов случайных деталей у карты с одним и тем же состоянием и шанс вспышки молнии в дождь
+MAP_VARIANTS = int(os.getenv("MAP_VARIANTS", "4"))
+LIGHTNING_CHANCE = 0.01
+
 cars = Image.open("./pics/cars.png").convert("RGBA")
-parking_img = Image.open("./pics/parking_r.png")
+parking_img = Image.open("./pics/parking_r.png").convert("RGBA")
+# Пустой слой под размер схемы: копируем его вместо создания нового на каждую карту
+empty_overlay = Image.new("RGBA", parking_img.size, (0, 0, 0, 0))
 
 regular_font = ImageFont.load_default(60)
 try:
@@ -51,97 +60,72 @@ except Exception as e:
     print("Ошибка загрузки шрифта NotoColorEmoji.ttf", e)
 
 
-async def generate_parking_map(parking_spots,
-                               reservations_data,
-                               driver: Driver,
-                               use_spot_status: bool = True,
-                               frame_index: int = None,
-                               day: date = None):
-    overlay = Image.new("RGBA", parking_img.size, (0, 0, 0, 0))
-    temp, weather, desc = await WeatherService().get_weather_string(day)
-    # temp, weather, desc = await WeatherService().get_weather_test(day)
+def render_parking_map(snapshot: MapSnapshot) -> bytes:
+    """
+    Точка входа для процесса отрисовки: рисует карту и возвращает PNG.
+    """
+    img = generate_parking_map(snapshot)
+    img_buffer = io.BytesIO()
+    img.save(img_buffer, format="PNG")
+    return img_buffer.getvalue()
+
+
+def normalize_frame_index(frame_index: int | None) -> int | None:
+    """
+    Приводит номер кадра мусоровоза к одному из различимых на карте:
+    кадры, где мусоровоз за пределами схемы, неотличимы от кадра без него.
+    """
+    if not frame_index:
+        return None
+    frame_index %= len(garbage_truck_frames)
+    if garbage_truck_frames[frame_index][0] < 0:
+        return None
+    return frame_index
+
+
+def choose_variant(snapshot: MapSnapshot) -> MapSnapshot:
+    """
+    Выбирает случайные детали карты заранее и записывает их в снимок: карта рисуется только по полям снимка,
+    поэтому ее можно брать из кэша по отпечатку снимка.
+    """
+    rainy = snapshot.weather.get("rain_drop_count", 0) > 0
+    return replace(snapshot, frame_index=normalize_frame_index(snapshot.frame_index),
+                   variant=random.randrange(MAP_VARIANTS),
+                   lightning=rainy and random.random() < LIGHTNING_CHANCE)
+
+
+def generate_parking_map(snapshot: MapSnapshot):
+    weather = snapshot.weather
+    # случайные детали зависят только от снимка (см. choose_variant)
+    rng = random.Random(f"map:{snapshot.variant}:{snapshot.frame_index}")
     # солнце рисуем вначале, дождь и облака в конце
     if weather.get("sun_alpha", 0) > 0:
-        sun_layer = make_sun_glare_layer((overlay.width, overlay.height), max_alpha=weather.get("sun_alpha", 0))
-        overlay = Image.alpha_composite(overlay, sun_layer)
+        overlay = make_sun_glare_layer(parking_img.size, max_alpha=weather.get("sun_alpha", 0)).copy()
+    else:
+        overlay = empty_overlay.copy()
 
     # Отрисовка всех мест с учетом статусов
-    for spot in parking_spots:
-        status = get_status(driver, reservations_data, spot, use_spot_status)
+    for spot in snapshot.spots:
+        status = get_status(snapshot.viewer_id, spot, snapshot.use_spot_status)
+        x, y, car_x, car_y, car_rotate = get_spot_geometry(spot.id, spot.x, spot.y)
 
-        x = spot.x
-        y = spot.y
-        car_x = -1000
-        car_y = -1000
-        car_rotate = 0
-        if 1 <= spot.id <= 17:
-            x = 120 + int((spot.id - 1) * 51)
-            y = 520
-            car_x = x + 2
-            car_y = y + 14
-            car_rotate = 0
-        elif 18 <= spot.id <= 34:
-            x = 171 + int((spot.id - 18) * 51)
-            y = 371
-            car_x = x + 2
-            car_y = y + 3
-            car_rotate = 180
-        elif 35 <= spot.id <= 51:
-            x = 171 + int((spot.id - 35) * 51)
-            y = 270
-            car_x = x + 2
-            car_y = y + 14
-            car_rotate = 0
-        elif spot.id == 74:
-            x = 17
-            y = 220
-            car_x = x + 2
-            car_y = y + 2
-            car_rotate = -90
-
-        if (use_spot_status
+        if (snapshot.use_spot_status
                 and spot.current_driver_id is not None
                 and spot.status is not None
                 and spot.status in (SpotStatus.OCCUPIED, SpotStatus.OCCUPIED_WITHOUT_DEMAND)):
-            if spot.current_driver:
-                car_index = spot.current_driver.attributes.get("car_index", spot.current_driver_id % cars_count)
-            else:
-                car_index = spot.current_driver_id % cars_count
-
-            car_image = get_car(car_index)
-
-            scale = 0.8
-            if scale != 1:
-                new_size = (int(car_image.width * scale), int(car_image.height * scale))
-                car_image = car_image.resize(new_size)
-            car_image = car_image.rotate(car_rotate, expand=True)
-            draw_car_with_shadow(car_image, overlay, dx + car_x, dy + car_y)
+            car_index = spot.car_index if spot.car_index is not None else spot.current_driver_id % cars_count
+            paste_car(overlay, car_index, dx + car_x, dy + car_y, scale=0.8, rotation=car_rotate)
         else:
-            # Создаем паттерн с диагональными полосами
-            pattern = create_diagonal_pattern(spot.width + d_width, spot.height,
-                                              stripe_width=4,
-                                              color2=COLORS[status],
-                                              color1=(0, 0, 0, 0))
+            # Паттерн с диагональными полосами (из кэша)
+            pattern = get_spot_tile(spot.width, spot.height, status)
             # Вставляем паттерн в прямоугольник
             overlay.paste(pattern, (dx + x, dy + y), pattern)
 
-    if frame_index:
+    if snapshot.frame_index:
         # Рисуем мусорку
-        garbage_truck = extract_sprite(cars, (0, 130, 55, 255))
-        scale = 0.8
-        if scale != 1:
-            new_size = (int(garbage_truck.width * scale), int(garbage_truck.height * scale))
-            garbage_truck = garbage_truck.resize(new_size)
-        frame = garbage_truck_frames[frame_index % len(garbage_truck_frames)]
-        garbage_truck = garbage_truck.rotate(frame[2], expand=True)
-        pos = (dx + frame[0] + random.randint(-5, 5), dy + frame[1] + random.randint(0, 5))
-        # Создаем тень
-        shadow = Image.new("RGBA", garbage_truck.size, (0, 0, 0, 0))
-        shadow.putalpha(garbage_truck.split()[3])
-        shadow = ImageOps.colorize(shadow.convert("L"), black="black", white="black")
-        shadow.putalpha(garbage_truck.split()[3])
-        blur_radius = 10  # радиус размытия тени
-        shadow = shadow.filter(ImageFilter.GaussianBlur(blur_radius))
+        frame = garbage_truck_frames[snapshot.frame_index % len(garbage_truck_frames)]
+        garbage_truck, shadow = get_garbage_truck(frame[2])
+        pos = (dx + frame[0] + rng.randint(-5, 5), dy + frame[1] + rng.randint(0, 5))
 
         # Смещаем тень относительно машины
         shadow_position = (pos[0] + 8, pos[1] + 8)
@@ -151,16 +135,21 @@ async def generate_parking_map(parking_spots,
         overlay.paste(garbage_truck, pos, mask=garbage_truck)
 
     # Рисуем дождь и облака
+    # (слои берем из банка погодных слоев)
     if weather.get("rain_drop_count", 0) > 0:
-        overlay = make_rain_layer(overlay, drop_count=weather.get("rain_drop_count", 0))
+        overlay.alpha_composite(get_rain_layer(overlay.size, weather.get("rain_drop_count", 0),
+                                               rng.randrange(RAIN_FRAMES)))
+        # Молния с небольшой вероятностью
+        if snapshot.lightning:
+            overlay.alpha_composite(make_lightning(overlay.size, rng))
 
     if weather.get("num_clouds", 0) > 0:
-        cloud_layer = get_clouds_layer(overlay, num_clouds=weather.get("num_clouds", 0))
-        overlay = Image.alpha_composite(overlay, cloud_layer)
+        overlay.alpha_composite(get_cloud_layer(overlay.size, weather.get("num_clouds", 0),
+                                                rng.randrange(CLOUD_VARIANTS)))
 
     # Добавляем текст
     draw = ImageDraw.Draw(overlay)
-    draw.text((17, 80), text=temp, font=regular_font, fill=COLORS['text'])
+    draw.text((17, 80), text=snapshot.temp, font=regular_font, fill=COLORS['text'])
     draw.text((140, 57), text=weather.get("icon", ''), font=emoji_font, embedded_color=True)
 
     result = Image.alpha_composite(parking_img, overlay)
@@ -168,13 +157,98 @@ async def generate_parking_map(parking_spots,
     return result
 
 
-def get_status(driver: Driver, reservations_data, spot: ParkingSpot, use_spot_status: bool):
+@lru_cache(maxsize=None)
+def get_spot_geometry(spot_id: int, x: int, y: int) -> tuple[int, int, int, int, int]:
+    """
+    Координаты места на схеме, координаты машины и её поворот: (x, y, car_x, car_y, car_rotate).
+    """
+    car_x = -1000
+    car_y = -1000
+    car_rotate = 0
+    if 1 <= spot_id <= 17:
+        x = 120 + int((spot_id - 1) * 51)
+        y = 520
+        car_x = x + 2
+        car_y = y + 14
+        car_rotate = 0
+    elif 18 <= spot_id <= 34:
+        x = 171 + int((spot_id - 18) * 51)
+        y = 371
+        car_x = x + 2
+        car_y = y + 3
+        car_rotate = 180
+    elif 35 <= spot_id <= 51:
+        x = 171 + int((spot_id - 35) * 51)
+        y = 270
+        car_x = x + 2
+        car_y = y + 14
+        car_rotate = 0
+    elif spot_id == 74:
+        x = 17
+        y = 220
+        car_x = x + 2
+        car_y = y + 2
+        car_rotate = -90
+    return x, y, car_x, car_y, car_rotate
+
+
+@lru_cache(maxsize=None)
+def get_spot_tile(width: int, height: int, status: str):
+    """
+    Паттерн с диагональными полосами для места заданного размера и статуса.
+    Различных сочетаний немного, поэтому строим каждый один раз.
+    """
+    return create_diagonal_pattern(width + d_width, height,
+                                   stripe_width=4,
+                                   color2=COLORS[status],
+                                   color1=(0, 0, 0, 0))
+
+
+@lru_cache(maxsize=None)
+def get_garbage_truck(rotation: int):
+    """
+    Спрайт мусоровоза с заданным поворотом и его размытая тень.
+    """
+    garbage_truck = extract_sprite(cars, (0, 130, 55, 255))
+    scale = 0.8
+    if scale != 1:
+        new_size = (int(garbage_truck.width * scale), int(garbage_truck.height * scale))
+        garbage_truck = garbage_truck.resize(new_size)
+    garbage_truck = garbage_truck.rotate(rotation, expand=True)
+    # Создаем тень
+    shadow = Image.new("RGBA", garbage_truck.size, (0, 0, 0, 0))
+    shadow.putalpha(garbage_truck.split()[3])
+    shadow = ImageOps.colorize(shadow.convert("L"), black="black", white="black")
+    shadow.putalpha(garbage_truck.split()[3])
+    blur_radius = 10  # радиус размытия тени
+    shadow = shadow.filter(ImageFilter.GaussianBlur(blur_radius))
+    return garbage_truck, shadow
+
+
+def warm_up(spot_sizes=((49, 99), (101, 48))):
+    """
+    Заранее строит кэшируемые слои карты (вызывается при старте процесса отрисовки).
+    """
+    for width, height in spot_sizes:
+        for status in COLORS:
+            if status != 'text':
+                get_spot_tile(width, height, status)
+    for frame in garbage_truck_frames:
+        get_garbage_truck(frame[2])
+    for car_index in range(extra_cars_count):
+        for rotation in (0, 180, -90):
+            get_car_sprite(car_index, 0.8, rotation)
+    for sun_alpha in (70, 80, 100, 110, 120):
+        make_sun_glare_layer(parking_img.size, max_alpha=sun_alpha)
+
+
+def get_status(viewer_id: int | None, spot: SpotSnapshot, use_spot_status: bool):
     if use_spot_status and spot.status is not None:
-        return str(spot.status) + ("_me" if driver is not None and spot.current_driver_id == driver.id else "")
+        return str(spot.status) + ("_me" if viewer_id is not None and spot.current_driver_id == viewer_id else "")
 
     # Проверка резерваций для текущего места
-    me = any(res.driver == driver for res in reservations_data.get(spot.id, []))
-    other = any(res.driver != driver for res in reservations_data.get(spot.id, []))
+    me = viewer_id is not None and viewer_id in spot.reserved_by
+    other = any(driver_id != viewer_id for driver_id in spot.reserved_by)
     if other and not me:
         return 'reserved'
     elif me:
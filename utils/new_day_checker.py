@@ -6,9 +6,10 @@ from datetime import datetime, timedelta
 from config import constants
 from handlers.user_handlers import get_status_message
 from models.user_audit import UserActionType
-from services.audit_service import AuditService
 from services.driver_service import DriverService
+from services.karma_service import KarmaService
 from services.holiday_service import HolidayService
+from services.media_service import MediaService
 from services.notification_sender import NotificationSender, EventType
 from services.parking_service import ParkingService
 from services.queue_service import QueueService
@@ -28,7 +29,10 @@ async def check_current_day(bot, session, param_service):
     if old_day and old_day == current_day_str:
         return current_day
 
-    # смена дня
+    # смену дня выполняет только тот процесс, который первым записал новый current_day
+    if not await param_service.claim_parameter("current_day", current_day_str):
+        return current_day
+
     logger.info(f"Наступил новый день: {current_day_str}")
 
     # очищаем очереди и состояние парковки
@@ -41,16 +45,17 @@ async def check_current_day(bot, session, param_service):
     reservation_service = ReservationService(session)
     await reservation_service.delete_duplicate_reservations(current_day)
 
+    # забываем file_id картинок, которые давно не отправлялись
+    await MediaService(session).delete_unused(days=30)
+
     driver_service = DriverService(session)
     # await driver_service.remove_attribute_for_all("test")
 
     drivers = await driver_service.get_all()
     for driver in drivers:
-        driver.attributes["plus"] = random.randint(1, 100)
+        driver.plus = random.randint(1, 100)
 
-    # устанавливаем текущий день
-    await param_service.set_parameter("current_day", current_day_str)
-    is_working_day, holiday = await HolidayService().get_day_info(current_day)
+    is_working_day, holiday = await HolidayService(session).get_day_info(current_day)
     await param_service.set_parameter("current_day_is_working_day", str(is_working_day))
     await param_service.set_parameter("current_day_holiday", holiday)
     await session.commit()
@@ -82,10 +87,10 @@ async def check_auto_karma_for_absent(bot, session, param_service, current_day):
     if old_day and old_day == current_day_str:
         return
 
-    await param_service.set_parameter("current_day_auto_karma", current_day_str)
+    if not await param_service.claim_parameter("current_day_auto_karma", current_day_str):
+        return
     await session.commit()
-    is_working_day = ((await param_service.get_parameter("current_day_is_working_day", ""))
-                      .lower() in ("yes", "true", "t", "1"))
+    is_working_day = await param_service.get_bool("current_day_is_working_day")
     logger.debug(f"is_working_day = {is_working_day}")
 
     driver_service = DriverService(session)
@@ -97,14 +102,14 @@ async def check_auto_karma_for_absent(bot, session, param_service, current_day):
                                                                 f"{'Вы уехали' if is_working_day else 'сегодня выходной'}"
                                                                 ", мы сделаем это за Вас!")
             data = await bot.send_dice(chat_id=driver.chat_id, emoji=random.choice(['🎲', '🎯', '🏀', '⚽', '🎳']))
-            driver.attributes["plus"] = -1
-            driver.attributes["karma"] = driver.get_karma() + data.dice.value
+            driver.plus = -1
+            await KarmaService(session).apply(
+                driver.id, data.dice.value, UserActionType.DRAW_KARMA, current_day,
+                lambda karma: f"Авторозыгрыш кармы для {driver.description}: +{data.dice.value}; стало {karma}")
             await bot.send_message(chat_id=driver.chat_id,
                                    text=f"💟 Вы получили +{data.dice.value} в карму. /status"
                                         f"\n\nЗавтра будет шанс получить еще.")
             logger.info(f"Авторозыгрыш кармы для {driver.description}: +{data.dice.value}")
-            await AuditService(session).log_action(driver.id, UserActionType.DRAW_KARMA, current_day, data.dice.value,
-                                                   f"Авторозыгрыш кармы для {driver.description}: +{data.dice.value}; стало {driver.attributes["karma"]}")
 
             await session.commit()
         except Exception as e:
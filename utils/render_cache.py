@@ -0,0 +1,54 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+RENDER_CACHE_MB = int(os.getenv("RENDER_CACHE_MB", "32"))
+
+
+class RenderCache:
+    """
+    LRU-кэш готовых картинок (байты PNG), ограниченный суммарным размером.
+    Ключ - отпечаток содержимого снимка, по которому рисовалась картинка, поэтому при изменении
+    парковки кэш не сбрасывается: новое состояние дает новый ключ, а старые картинки вытесняются по LRU.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(*parts) -> str:
+        return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        data = self._items.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        if key in self._items:
+            self._size -= len(self._items.pop(key))
+        self._items[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._size -= len(evicted)
+
+    def clear(self):
+        self._items.clear()
+        self._size = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+map_cache = RenderCache(RENDER_CACHE_MB * 1024 * 1024)
@@ -0,0 +1,76 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from models.parking_spot import SpotStatus
+from utils.cars_generator import cars_count
+
+
+@dataclass(frozen=True)
+class SpotSnapshot:
+    """
+    Состояние одного парковочного места в виде простых данных (без ORM),
+    которые можно передать в процесс отрисовки.
+    """
+    id: int
+    x: int
+    y: int
+    width: int
+    height: int
+    status: SpotStatus | None
+    current_driver_id: int | None
+    car_index: int | None = None
+    reserved_by: tuple[int, ...] = ()
+
+
+@dataclass(frozen=True)
+class QueueEntrySnapshot:
+    """
+    Водитель в очереди: для подписи к карте.
+    """
+    driver_id: int
+    description: str
+    spot_id: int | None = None
+    choose_before: datetime | None = None
+
+
+@dataclass(frozen=True)
+class LotSnapshot:
+    """
+    Состояние парковки на день: места с бронями и очередь.
+    """
+    spots: tuple[SpotSnapshot, ...]
+    queue: tuple[QueueEntrySnapshot, ...] = ()
+
+
+@dataclass(frozen=True)
+class MapSnapshot:
+    """
+    Всё, что нужно для отрисовки карты парковки.
+    """
+    spots: tuple[SpotSnapshot, ...]
+    viewer_id: int | None = None
+    use_spot_status: bool = True
+    frame_index: int | None = None
+    temp: str = ""
+    weather: dict = field(default_factory=dict)
+    # случайные детали карты (кадр дождя, облака, покачивание мусоровоза, молния) выбираются заранее
+    # и входят в снимок: одинаковый снимок всегда дает одинаковую картинку (см. map_generator.choose_variant)
+    variant: int = 0
+    lightning: bool = False
+
+
+@dataclass(frozen=True)
+class PlayerSnapshot:
+    """
+    Участник гонки: только те поля водителя, которые нужны для отрисовки.
+    """
+    id: int
+    title: str
+    car_index: int
+    wheels: int = 0
+
+    @classmethod
+    def from_driver(cls, driver) -> "PlayerSnapshot":
+        return cls(id=driver.id, title=driver.title,
+                   car_index=driver.get_car_index(driver.id % cars_count),
+                   wheels=driver.wheels)
@@ -1,135 +1,175 @@
+import os
 import random
+from functools import lru_cache
 
+import numpy as np
 from PIL import Image, ImageDraw, ImageFilter, ImageChops
 
 
+@lru_cache(maxsize=16)
 def make_sun_glare_layer(size, center=None, max_alpha=120, radius=None):
     """
     Создаёт слой «солнечного» градиента на весь кадр.
+    Слой кэшируется и общий для всех вызовов - изменять его можно только в копии.
     """
     w, h = size
     if center is None:
         center = (w * 0.3, h * 0.2)  # сверху слева
     if radius is None:
         radius = int(max(w, h) * 1.05)
-    layer = Image.new('RGBA', size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(layer)
-    # концентрические круги
-    for r in range(radius, 0, -1):
-        alpha = int(max_alpha * (1 - r / radius))
-        color = (255, 255, 200, alpha)
-        bbox = [
-            (center[0] - r, center[1] - r),
-            (center[0] + r, center[1] + r),
-        ]
-        draw.ellipse(bbox, fill=color)
-    return layer.filter(ImageFilter.GaussianBlur(radius * 0.02))
-
-
-def add_edge_fade_mask(layer, sunny_segs, seg_count=3):
+    # концентрические круги: пиксель получает яркость ближайшего круга, в который попадает
+    ys, xs = np.ogrid[:h, :w]
+    dist = np.sqrt((xs + 0.5 - center[0]) ** 2 + (ys + 0.5 - center[1]) ** 2)
+    r = np.maximum(np.ceil(dist - 0.5), 1)
+    inside = r <= radius
+    layer = np.zeros((h, w, 4), dtype=np.uint8)
+    layer[inside] = (255, 255, 200, 0)
+    layer[..., 3] = np.where(inside, (max_alpha * (1 - r / radius)).astype(np.int32), 0)
+    return Image.fromarray(layer, 'RGBA').filter(ImageFilter.GaussianBlur(radius * 0.02))
+
+
+@lru_cache(maxsize=32)
+def make_edge_fade_mask(size, sunny_segs: tuple, seg_count=3):
     """
     Возвращает маску освещённости:
     - Солнечные сегменты: полностью α=255.
     - Несолнечные: затухание с той стороны, где есть соседний солнечный сегмент.
     """
-    w, h = (layer.width, layer.height)
+    w, h = size
     seg_w = w // seg_count
-    mask = Image.new('L', (w, h), 0)
-    pixels = mask.load()
+    rel_x = np.arange(seg_w)
+    left_half = rel_x < seg_w // 2
+    columns = np.zeros(w, dtype=np.uint8)
 
     for seg in range(seg_count):
-        x_start = seg * seg_w
-        x_end = x_start + seg_w
-
+        alpha = np.zeros(seg_w, dtype=np.int32)
         if seg in sunny_segs:
             # Солнечный сегмент — полностью залить
-            for x in range(x_start, x_end):
-                for y in range(h):
-                    pixels[x, y] = 255
+            alpha[:] = 255
         else:
             # Не солнечный — определяем соседей
-            left_sunny = (seg - 1) in sunny_segs
-            right_sunny = (seg + 1) in sunny_segs
-            for x in range(x_start, x_end):
-                rel_x = x - x_start
-                alpha = 0
-
-                if left_sunny and rel_x < seg_w // 2:
-                    # Затухание от левого солнечного сегмента
-                    alpha = int(255 * (1 - rel_x / (seg_w / 2)))
-
-                elif right_sunny and rel_x >= seg_w // 2:
-                    # Затухание от правого солнечного сегмента
-                    dx = seg_w - rel_x
-                    alpha = int(255 * (1 - dx / (seg_w / 2)))
-
-                for y in range(h):
-                    pixels[x, y] = max(pixels[x, y], alpha)
-
-    orig_alpha = layer.getchannel('A')
-    combined_alpha = ImageChops.multiply(orig_alpha, mask)
+            if (seg - 1) in sunny_segs:
+                # Затухание от левого солнечного сегмента
+                alpha[left_half] = (255 * (1 - rel_x[left_half] / (seg_w / 2))).astype(np.int32)
+            if (seg + 1) in sunny_segs:
+                # Затухание от правого солнечного сегмента
+                dx = seg_w - rel_x[~left_half]
+                alpha[~left_half] = (255 * (1 - dx / (seg_w / 2))).astype(np.int32)
+        columns[seg * seg_w:(seg + 1) * seg_w] = alpha
+
+    return Image.fromarray(np.ascontiguousarray(np.broadcast_to(columns, (h, w))), 'L')
+
+
+def add_edge_fade_mask(layer, sunny_segs, seg_count=3):
+    """
+    Возвращает копию слоя, прозрачность которой умножена на маску освещённости сегментов.
+    """
+    mask = make_edge_fade_mask(layer.size, tuple(sunny_segs), seg_count)
+    combined_alpha = ImageChops.multiply(layer.getchannel('A'), mask)
+    layer = layer.copy()
     layer.putalpha(combined_alpha)
     return layer
 
 
-def make_rain_layer(seg, drop_count=400):
-    layer = Image.new('RGBA', seg.size, (0, 0, 0, 0))
+# Банк погодных слоев: сколько разных кадров дождя крутится по кругу и сколько вариантов облаков
+RAIN_FRAMES = int(os.getenv("RAIN_FRAMES", "8"))
+CLOUD_VARIANTS = int(os.getenv("CLOUD_VARIANTS", "4"))
+
+
+def make_rain_drops(size, drop_count=400, rng=random):
+    layer = Image.new('RGBA', size, (0, 0, 0, 0))
     draw = ImageDraw.Draw(layer)
-    w, h = seg.size
+    w, h = size
     for _ in range(drop_count):
-        x = random.randint(0, w)
-        y = random.randint(0, h)
-        length = random.randint(10, 20)
+        x = rng.randint(0, w)
+        y = rng.randint(0, h)
+        length = rng.randint(10, 20)
         # угол падения ~70° (около 1.2 радиан)
         dx = -int(length * 0.34)
         dy = int(length * 0.94)
-        draw.line((x, y, x + dx, y + dy), fill=(66, 170, 255, random.randint(200, 255)), width=2)
-    rain = layer.filter(ImageFilter.GaussianBlur(1))
-
-    # Молния с небольшой вероятностью
-    if random.random() < 0.01:
-        bolt = Image.new('RGBA', seg.size, (0, 0, 0, 0))
-        ldraw = ImageDraw.Draw(bolt)
-
-        def draw_branch(x0, y0, length, thickness, segments, branch_chance):
-            """Рекурсивно рисует ветку молнии."""
-            if segments <= 0 or thickness < 1:
-                return
-            # координата следующей точки
-            x1 = x0 + random.randint(-w // 10, w // 10)
-            y1 = y0 + length + random.randint(-h // 20, h // 20)
-            ldraw.line((x0, y0, x1, y1), fill=(255, 255, 220, 200), width=thickness)
-
-            # шанс ветвления
-            if random.random() < branch_chance:
-                # боковая ветка
-                draw_branch(x1, y1,
-                            length // 2,
-                            max(1, thickness - 2),
-                            segments - 1,
-                            branch_chance * 0.6)
-            # продолжение ствола
+        draw.line((x, y, x + dx, y + dy), fill=(66, 170, 255, rng.randint(200, 255)), width=2)
+    return layer.filter(ImageFilter.GaussianBlur(1))
+
+
+def make_lightning(size, rng=random):
+    w, h = size
+    bolt = Image.new('RGBA', size, (0, 0, 0, 0))
+    ldraw = ImageDraw.Draw(bolt)
+
+    def draw_branch(x0, y0, length, thickness, segments, branch_chance):
+        """Рекурсивно рисует ветку молнии."""
+        if segments <= 0 or thickness < 1:
+            return
+        # координата следующей точки
+        x1 = x0 + rng.randint(-w // 10, w // 10)
+        y1 = y0 + length + rng.randint(-h // 20, h // 20)
+        ldraw.line((x0, y0, x1, y1), fill=(255, 255, 220, 200), width=thickness)
+
+        # шанс ветвления
+        if rng.random() < branch_chance:
+            # боковая ветка
             draw_branch(x1, y1,
-                        length,
-                        thickness,
+                        length // 2,
+                        max(1, thickness - 2),
                         segments - 1,
-                        branch_chance)
+                        branch_chance * 0.6)
+        # продолжение ствола
+        draw_branch(x1, y1,
+                    length,
+                    thickness,
+                    segments - 1,
+                    branch_chance)
+
+    # параметры молнии
+    start_x = rng.randint(int(w * 0.2), int(w * 0.8))
+    start_y = 0
+    main_length = h // rng.randint(5, 6)
+    main_thickness = rng.randint(4, 6)
+    draw_branch(start_x, start_y,
+                length=main_length,
+                thickness=main_thickness,
+                segments=6,  # глубина рекурсии
+                branch_chance=0.7)  # начальный шанс ветвления
+
+    return bolt.filter(ImageFilter.GaussianBlur(1))
+
+
+# Ключи банка: карта (один размер, плотность по погоде - до 3 вариантов) и участок трассы заезда
+# (ширина одна, высота приводится к bank_height), поэтому банков не больше 4
+@lru_cache(maxsize=4)
+def get_rain_frames(size, drop_count=400):
+    """
+    Кадры дождя для слоя заданного размера и плотности. Строятся один раз, дальше крутятся по кругу.
+    """
+    rng = random.Random(f"rain:{size}:{drop_count}")
+    return tuple(make_rain_drops(size, drop_count, rng) for _ in range(RAIN_FRAMES))
+
+
+def get_rain_layer(size, drop_count, frame_index, bank_height=None):
+    """
+    Кадр дождя из банка (общий для всех вызовов - изменять только в копии).
+    bank_height - для слоев переменной высоты: банк строится с этой высотой (drop_count капель на кадр банка),
+    а слой вырезается из его верхней части. Так все высоты одной ширины используют один банк.
+    """
+    w, h = size
+    bank_h = max(h, bank_height or h)
+    frames = get_rain_frames((w, bank_h), drop_count)
+    frame = frames[frame_index % len(frames)]
+    return frame if bank_h == h else frame.crop((0, 0, w, h))
+
+
+def get_cloud_layer(size, num_clouds, variant):
+    """
+    Один из CLOUD_VARIANTS заранее нарисованных слоев облаков (общий для всех вызовов - изменять только в копии).
+    variant может быть любым числом (например, seed заезда): в кэш попадает только номер варианта.
+    """
+    return make_cloud_layer(tuple(size), num_clouds, variant % CLOUD_VARIANTS)
 
-        # параметры молнии
-        start_x = random.randint(int(w * 0.2), int(w * 0.8))
-        start_y = 0
-        main_length = h // random.randint(segments := 5, 6)
-        main_thickness = random.randint(4, 6)
-        draw_branch(start_x, start_y,
-                    length=main_length,
-                    thickness=main_thickness,
-                    segments=6,  # глубина рекурсии
-                    branch_chance=0.7)  # начальный шанс ветвления
 
-        bolt = bolt.filter(ImageFilter.GaussianBlur(1))
-        # Объединяем дождь и молнию
-        rain = Image.alpha_composite(rain, bolt)
-    return Image.alpha_composite(seg, rain)
+@lru_cache(maxsize=32)
+def make_cloud_layer(size, num_clouds, variant):
+    rng = random.Random(f"clouds:{size}:{num_clouds}:{variant}")
+    return get_clouds_layer(Image.new('RGBA', size), num_clouds=num_clouds, rng=rng)
 
 
 def get_clouds_layer(
@@ -137,7 +177,8 @@ def get_clouds_layer(
         num_clouds: int = 15,
         cloud_size_range: tuple = (100, 200),
         opacity: int = 100,
-        blur_radius: int = 15
+        blur_radius: int = 15,
+        rng=random
 ):
     """
     Draw random cloud shapes on an image using Pillow.
@@ -147,6 +188,7 @@ def get_clouds_layer(
     :param cloud_size_range: Tuple (min_size, max_size) for cloud diameter
     :param opacity: Opacity of cloud fill (0-255)
     :param blur_radius: Gaussian blur radius to soften clouds
+    :param rng: Random number generator (random module by default)
     """
     width, height = base.size
 
@@ -156,19 +198,19 @@ def get_clouds_layer(
 
     for _ in range(num_clouds):
         # Random center position for the cloud (y limited to sky region)
-        cx = random.randint(0, width)
-        cy = random.randint(0, height)
+        cx = rng.randint(0, width)
+        cy = rng.randint(0, height)
 
         # Random overall size of the cloud
-        w = random.randint(*cloud_size_range)
+        w = rng.randint(*cloud_size_range)
         h = w // 2
 
         # Draw overlapping ellipses to form a cloud
-        for _ in range(random.randint(3, 6)):
-            ex = cx + random.randint(-w // 2, w // 2)
-            ey = cy + random.randint(-h // 2, h // 2)
-            ew = random.randint(w // 2, w)
-            eh = random.randint(h // 2, h)
+        for _ in range(rng.randint(3, 6)):
+            ex = cx + rng.randint(-w // 2, w // 2)
+            ey = cy + rng.randint(-h // 2, h // 2)
+            ew = rng.randint(w // 2, w)
+            eh = rng.randint(h // 2, h)
             draw.ellipse([ex, ey, ex + ew, ey + eh], fill=(255, 255, 255, opacity))
 
     # Apply a Gaussian blur to soften the cloud edges